@@ -11,6 +11,7 @@ from django.db.models import Q
 import json
 from .models import Drawing, DrawingSession
 from .forms import DrawingForm
+from apps.sync.idempotency import idempotent
 from django.db import models
 from django.utils import timezone
 
@@ -141,9 +142,33 @@ class DrawingUpdateView(UpdateView):
         return response
 
 
+def apply_drawing_data(drawing, data):
+    """Store canvas data sent by the drawing page and update the open session"""
+    # Update canvas data
+    drawing.set_canvas_data(data.get('canvas_data', {}))
+    drawing.canvas_width = data.get('width', 800)
+    drawing.canvas_height = data.get('height', 600)
+    drawing.is_completed = data.get('is_completed', False)
+    drawing.save()
+    
+    # Update or create session
+    session, created = DrawingSession.objects.get_or_create(
+        drawing=drawing,
+        child=drawing.child,
+        ended_at__isnull=True
+    )
+    
+    # Update session analytics
+    session.strokes_count = data.get('strokes_count', 0)
+    session.colors_used = data.get('colors_used', [])
+    session.tools_used = data.get('tools_used', [])
+    session.save()
+
+
 @login_required
 @require_http_methods(["POST"])
 @csrf_exempt
+@idempotent
 def save_drawing_data(request, drawing_id):
     """Save canvas data via AJAX"""
     if request.user.role != 'child':
@@ -152,26 +177,7 @@ def save_drawing_data(request, drawing_id):
     try:
         drawing = get_object_or_404(Drawing, id=drawing_id, child=request.user)
         data = json.loads(request.body)
-        
-        # Update canvas data
-        drawing.set_canvas_data(data.get('canvas_data', {}))
-        drawing.canvas_width = data.get('width', 800)
-        drawing.canvas_height = data.get('height', 600)
-        drawing.is_completed = data.get('is_completed', False)
-        drawing.save()
-        
-        # Update or create session
-        session, created = DrawingSession.objects.get_or_create(
-            drawing=drawing,
-            child=request.user,
-            ended_at__isnull=True
-        )
-        
-        # Update session analytics
-        session.strokes_count = data.get('strokes_count', 0)
-        session.colors_used = data.get('colors_used', [])
-        session.tools_used = data.get('tools_used', [])
-        session.save()
+        apply_drawing_data(drawing, data)
         
         return JsonResponse({'success': True, 'message': 'Drawing saved successfully'})
     
@@ -300,6 +306,7 @@ def drawing_analytics(request):
 
 @csrf_exempt
 @login_required
+@idempotent
 def api_create_drawing(request):
     """API endpoint to create a new drawing via JSON POST and return the new drawing's ID."""
     if request.method != 'POST':
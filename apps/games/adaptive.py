@@ -0,0 +1,190 @@
+"""
+Adaptive difficulty.
+
+Each child keeps a rolling window of their last few results in a game in the
+cache: level played, accuracy, share of the time limit used, and whether the
+level was completed. The window is updated when a result is saved and keeps
+running totals, so recommending a level or tuning one never reads more than
+the window. If the window has been evicted it is rebuilt from the child's
+latest sessions with one bounded query.
+
+What a window means for a game is up to its ``DifficultyPolicy``, set as the
+``difficulty`` of the game's type in the registry; games without one keep
+their static levels.
+"""
+from collections import deque, namedtuple
+
+from django.core.cache import cache
+
+from .models import GameSession
+from .registry import type_for
+
+WINDOW_KEY = 'games:adaptive:{game_id}:{child_id}'
+WINDOW_TIMEOUT = 60 * 60 * 24 * 30
+WINDOW_SIZE = 5
+MIN_RESULTS = 3
+
+Result = namedtuple('Result', ['level', 'accuracy', 'time_ratio', 'completed'])
+Tuning = namedtuple('Tuning', ['grid_size', 'time_limit'])
+
+
+class Window:
+    """The last ``WINDOW_SIZE`` results with running totals"""
+    __slots__ = ('results', 'accuracy_total', 'time_ratio_total', 'completed_total')
+
+    def __init__(self, size=WINDOW_SIZE):
+        self.results = deque(maxlen=size)
+        self.accuracy_total = 0.0
+        self.time_ratio_total = 0.0
+        self.completed_total = 0
+
+    def __len__(self):
+        return len(self.results)
+
+    def push(self, result):
+        if len(self.results) == self.results.maxlen:
+            self._add(self.results[0], -1)
+        self.results.append(result)
+        self._add(result, 1)
+
+    def _add(self, result, sign):
+        self.accuracy_total += sign * result.accuracy
+        self.time_ratio_total += sign * result.time_ratio
+        self.completed_total += sign * int(result.completed)
+
+    @property
+    def accuracy(self):
+        return self.accuracy_total / len(self) if self.results else 0.0
+
+    @property
+    def time_ratio(self):
+        return self.time_ratio_total / len(self) if self.results else 0.0
+
+    @property
+    def completion_rate(self):
+        return self.completed_total / len(self) if self.results else 0.0
+
+    @property
+    def last_level(self):
+        return self.results[-1].level if self.results else None
+
+    def at_level(self, level):
+        """Results on one level, oldest first"""
+        return [result for result in self.results if result.level == level]
+
+
+class DifficultyPolicy:
+    """Keeps a child on the level they played last, with the level's own settings"""
+
+    def recommend_level(self, window, levels):
+        """The level to offer next, from the game's ordered ``levels``"""
+        if window.last_level in levels:
+            return window.last_level
+        return levels[0] if levels else None
+
+    def tune(self, window, level, grid_size, time_limit):
+        return Tuning(grid_size, time_limit)
+
+
+class ColorMatchingPolicy(DifficultyPolicy):
+    """Moves children up when they are accurate, quick and finishing, and down when they struggle"""
+    ADVANCE_ACCURACY = 80
+    ADVANCE_TIME_RATIO = 0.75
+    ADVANCE_COMPLETION = 0.8
+    RETREAT_ACCURACY = 45
+    RETREAT_COMPLETION = 0.4
+    MIN_GRID_SIZE = 2
+
+    def recommend_level(self, window, levels):
+        current = super().recommend_level(window, levels)
+        if len(window) < MIN_RESULTS or current is None:
+            return current
+        index = levels.index(current)
+        if (window.accuracy >= self.ADVANCE_ACCURACY and window.completion_rate >= self.ADVANCE_COMPLETION
+                and window.time_ratio <= self.ADVANCE_TIME_RATIO):
+            return levels[min(index + 1, len(levels) - 1)]
+        if window.accuracy < self.RETREAT_ACCURACY or window.completion_rate < self.RETREAT_COMPLETION:
+            return levels[max(index - 1, 0)]
+        return current
+
+    def tune(self, window, level, grid_size, time_limit):
+        """More time and a smaller grid while a level is too hard, less time once it is easy"""
+        results = window.at_level(level)
+        if len(results) < MIN_RESULTS:
+            return Tuning(grid_size, time_limit)
+        accuracy = sum(result.accuracy for result in results) / len(results)
+        completion = sum(result.completed for result in results) / len(results)
+        time_ratio = sum(result.time_ratio for result in results) / len(results)
+
+        if accuracy < self.RETREAT_ACCURACY or completion < self.RETREAT_COMPLETION:
+            if accuracy < self.RETREAT_ACCURACY and grid_size > self.MIN_GRID_SIZE:
+                grid_size -= 1
+            return Tuning(grid_size, round(time_limit * 1.25))
+        if accuracy >= self.ADVANCE_ACCURACY and completion == 1 and time_ratio <= 0.5:
+            return Tuning(grid_size, max(round(time_limit * 0.85), 10))
+        return Tuning(grid_size, time_limit)
+
+
+def policy_for(game):
+    """The difficulty policy of the game's registered type, or None"""
+    game_type = type_for(game)
+    return game_type.difficulty if game_type is not None else None
+
+
+def _key(game_id, child_id):
+    return WINDOW_KEY.format(game_id=game_id, child_id=child_id)
+
+
+def session_result(session, accuracy):
+    time_limit = session.time_limit or 0
+    return Result(
+        level=session.level,
+        accuracy=accuracy,
+        time_ratio=min(session.time_taken / time_limit, 1.0) if time_limit > 0 else 1.0,
+        completed=session.completed
+    )
+
+
+def load_window(game, child):
+    """The child's window for ``game``, rebuilt from their latest sessions if it was evicted"""
+    window = cache.get(_key(game.id, child.id))
+    if window is None:
+        window = Window()
+        sessions = GameSession.objects.filter(
+            child=child,
+            game=game,
+            status=GameSession.Status.FINISHED
+        ).select_related('color_matching_data').order_by('-started_at', '-id')[:WINDOW_SIZE]
+        for session in reversed(list(sessions)):
+            details = getattr(session, 'color_matching_data', None)
+            window.push(session_result(session, details.accuracy if details is not None else 0.0))
+        cache.set(_key(game.id, child.id), window, WINDOW_TIMEOUT)
+    return window
+
+
+def record_result(session, accuracy):
+    """Add a saved result to its child's window"""
+    if policy_for(session.game) is None:
+        return
+    key = _key(session.game_id, session.child_id)
+    window = cache.get(key)
+    if window is None:
+        # Rebuilt from the sessions, which already include this one
+        load_window(session.game, session.child)
+        return
+    window.push(session_result(session, accuracy))
+    cache.set(key, window, WINDOW_TIMEOUT)
+
+
+def recommend_level(game, child, levels):
+    """The level ``child`` should play next, from the game's ordered ``levels``"""
+    policy = policy_for(game) or DifficultyPolicy()
+    return policy.recommend_level(load_window(game, child), list(levels))
+
+
+def tune_level(game, child, level, grid_size, time_limit):
+    """Grid size and time limit for the child's next play of ``level``"""
+    policy = policy_for(game)
+    if policy is None:
+        return Tuning(grid_size, time_limit)
+    return policy.tune(load_window(game, child), level, grid_size, time_limit)
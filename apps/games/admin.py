@@ -1,7 +1,7 @@
 from django.contrib import admin
 from .models import (
     Game, ColorMatchingGame, Color, ColorMatchingLevel, 
-    GameSession, ColorMatchingSession, GameProgress
+    GameSession, ColorMatchingSession, GameProgress, LeaderboardEntry
 )
 
 @admin.register(Game)
@@ -53,3 +53,10 @@ class GameProgressAdmin(admin.ModelAdmin):
     list_filter = ['game', 'highest_level_completed', 'last_played']
     search_fields = ['child__username', 'child__email']
     readonly_fields = ['updated_at']
+
+@admin.register(LeaderboardEntry)
+class LeaderboardEntryAdmin(admin.ModelAdmin):
+    list_display = ['child', 'game', 'level', 'best_score', 'best_time', 'sessions_played', 'updated_at']
+    list_filter = ['game', 'level']
+    search_fields = ['child__username', 'child__email']
+    readonly_fields = ['best_session', 'updated_at']
@@ -5,3 +5,6 @@ class GamesConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'apps.games'
     verbose_name = 'Games'
+
+    def ready(self):
+        from . import color_matching  # noqa: F401
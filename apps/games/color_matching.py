@@ -0,0 +1,99 @@
+"""
+The color matching game's entry in the game registry.
+"""
+from collections import namedtuple
+
+from django.shortcuts import get_object_or_404
+from django.utils import timezone
+
+from .adaptive import ColorMatchingPolicy, tune_level
+from .engine import board_pool, build_board, load_board, save_board, discard_board
+from .lifecycle import HEARTBEAT_INTERVAL
+from .models import ColorMatchingGame, ColorMatchingLevel, ColorMatchingSession, GameSession
+from .registry import GameType, LevelUnavailable, ResultUnavailable, register
+
+ColorMatchingPlay = namedtuple('ColorMatchingPlay', ['level', 'config', 'colors'])
+
+
+@register
+class ColorMatching(GameType):
+    slug = 'color-matching'
+    name = 'Color Matching Game'
+    levels_template = 'games/color_matching_levels.html'
+    play_template = 'games/color_matching.html'
+    difficulty = ColorMatchingPolicy()
+
+    def active_levels(self):
+        return ColorMatchingGame.objects.filter(is_active=True).order_by('level')
+
+    def levels(self):
+        return list(self.active_levels().values_list('level', flat=True))
+
+    def load_level(self, level):
+        """The level, its grid configuration and its colors in a stable order"""
+        level_obj = get_object_or_404(ColorMatchingGame, level=level, is_active=True)
+        config = get_object_or_404(ColorMatchingLevel, game=level_obj)
+        return ColorMatchingPlay(level_obj, config, list(config.colors.order_by('id')))
+
+    def start(self, child, game, level):
+        """Deal a board for ``level`` and open its session.
+
+        Every play gets its own session, dealt from the layout pool for the
+        grid tuned to the child; the board's colors stay on the server until
+        cards are flipped.
+        """
+        level_obj, level_config, colors = self.load_level(level)
+        if not colors:
+            raise LevelUnavailable('No colors configured for this level')
+
+        tuning = tune_level(game, child, level, level_config.grid_size, level_obj.time_limit)
+        seed, chosen, cards = board_pool(tuning.grid_size, len(colors)).pick()
+        session = GameSession.objects.create(
+            child=child,
+            game=game,
+            level=level,
+            seed=seed,
+            grid_size=tuning.grid_size,
+            time_limit=tuning.time_limit,
+            last_seen_at=timezone.now()
+        )
+        board = build_board(session, level_obj, level_config, colors, chosen, cards)
+        save_board(board)
+        return {
+            'level': level_obj,
+            'session': session,
+            'grid': board.grid(),
+            'grid_size': board.grid_size,
+            'time_limit': board.time_limit,
+            'required_matches': board.required_matches,
+            'heartbeat_interval': int(HEARTBEAT_INTERVAL.total_seconds()),
+        }
+
+    def final_result(self, session, data):
+        """Games played on a server-side board are scored by the board, never the client.
+
+        A session dealt a board (it has a seed) whose board has expired or
+        was lost with the cache has no result that can be trusted.
+        """
+        board = load_board(session.id)
+        if board is not None and board.child_id == session.child_id:
+            return dict(data, **board.result())
+        if session.seed is not None:
+            raise ResultUnavailable('This game has expired, please start the level again')
+        return data
+
+    def record_details(self, session, data):
+        matches_found = data.get('matches_found', 0)
+        total_attempts = data.get('total_attempts', 0)
+        details, created = ColorMatchingSession.objects.update_or_create(
+            game_session=session,
+            defaults={
+                'matches_found': matches_found,
+                'total_attempts': total_attempts,
+                'accuracy': (matches_found / total_attempts * 100) if total_attempts > 0 else 0
+            }
+        )
+        return details.accuracy
+
+    def finished(self, session):
+        discard_board(session.id)
@@ -0,0 +1,251 @@
+"""
+Server-side state for color matching games.
+
+Each GameSession played on the color matching page gets a ``Board`` kept in
+the cache. The board knows where every color is; the page only learns a
+card's color when it flips it through the move endpoint, and the final
+score, matches, attempts and time come from the board rather than from the
+client.
+
+Boards are small: cards are one byte each (the index of their color in the
+board's palette), matched cards are bits in one integer, and the class uses
+``__slots__``. Each move is a couple of indexing and bit operations.
+
+Layouts are generated from a seed, which is stored on the GameSession so any
+board can be dealt again for replays and audits. Every level configuration
+keeps a pool of pre-generated layouts in memory, so starting a level picks
+one from a dictionary instead of sampling and shuffling.
+"""
+from functools import lru_cache
+import random
+import secrets
+import threading
+import time
+
+from django.core.cache import cache
+
+BOARD_KEY = 'games:board:{session_id}'
+BOARD_TIMEOUT = 60 * 60 * 2
+POOL_SIZE = 256
+MAX_POOLS = 64
+SEED_LIMIT = 2 ** 31
+
+# Moves on one board are applied one at a time; boards share a small pool of
+# locks so memory does not grow with the number of games
+_LOCKS = [threading.Lock() for _ in range(64)]
+
+
+class MoveError(Exception):
+    """A flip that the board does not allow"""
+
+
+class Board:
+    __slots__ = (
+        'session_id', 'child_id', 'grid_size', 'cards', 'palette', 'matched', 'face_up',
+        'matches', 'attempts', 'points_per_match', 'required_matches', 'time_limit',
+        'started_at', 'finished_at'
+    )
+
+    def __init__(self, session_id, child_id, grid_size, cards, palette,
+                 points_per_match, required_matches, time_limit):
+        self.session_id = session_id
+        self.child_id = child_id
+        self.grid_size = grid_size
+        self.cards = bytes(cards)
+        self.palette = tuple(palette)
+        self.matched = 0
+        self.face_up = -1
+        self.matches = 0
+        self.attempts = 0
+        self.points_per_match = points_per_match
+        self.required_matches = min(required_matches, len(self.cards) // 2)
+        self.time_limit = time_limit
+        self.started_at = None
+        self.finished_at = None
+
+    @property
+    def completed(self):
+        return self.matches >= self.required_matches
+
+    @property
+    def score(self):
+        return self.matches * self.points_per_match
+
+    def card(self, position):
+        hex_code, name = self.palette[self.cards[position]]
+        return {'position': position, 'color': hex_code, 'name': name}
+
+    def grid(self):
+        """Card positions by row, without their colors"""
+        return grid_positions(self.grid_size, len(self.cards))
+
+    def flip(self, position):
+        """Turn a card over; the second card of a pair counts as an attempt"""
+        if self.finished_at is not None:
+            raise MoveError('The game is over')
+        if not isinstance(position, int) or isinstance(position, bool) or not 0 <= position < len(self.cards):
+            raise MoveError('No card at that position')
+        if self.matched >> position & 1:
+            raise MoveError('That card is already matched')
+        if position == self.face_up:
+            raise MoveError('That card is already face up')
+
+        now = time.time()
+        if self.started_at is None:
+            self.started_at = now
+        move = self.card(position)
+        if self.face_up < 0:
+            self.face_up = position
+            move['result'] = 'first'
+        else:
+            other, self.face_up = self.face_up, -1
+            self.attempts += 1
+            move['pair'] = other
+            if self.cards[other] == self.cards[position]:
+                self.matched |= 1 << other | 1 << position
+                self.matches += 1
+                move['result'] = 'match'
+            else:
+                move['result'] = 'miss'
+            if self.completed:
+                self.finished_at = now
+        move.update(self.stats())
+        return move
+
+    def elapsed(self):
+        if self.started_at is None:
+            return 0
+        end = self.finished_at or time.time()
+        return min(int(end - self.started_at), self.time_limit)
+
+    def stats(self):
+        return {
+            'matches': self.matches,
+            'attempts': self.attempts,
+            'score': self.score,
+            'completed': self.completed,
+        }
+
+    def result(self):
+        """Final values for record_game_result"""
+        return {
+            'score': self.score,
+            'time_taken': self.elapsed(),
+            'matches_found': self.matches,
+            'total_attempts': self.attempts,
+            'completed': self.completed,
+        }
+
+
+@lru_cache(maxsize=None)
+def grid_positions(size, card_count):
+    """Rows of card positions for a grid; shared by every board of that shape"""
+    return tuple(
+        tuple({'id': row * size + col, 'row': row, 'col': col} for col in range(size) if row * size + col < card_count)
+        for row in range(size)
+    )
+
+
+def generate_layout(seed, grid_size, color_count):
+    """Deal a layout from ``seed``: the colors used (as indexes into the level's
+    colors) and the cards (as indexes into the colors used)"""
+    rng = random.Random(seed)
+    chosen = rng.sample(range(color_count), min((grid_size * grid_size) // 2, color_count))
+    cards = bytearray(index for index in range(len(chosen)) for _ in range(2))
+    rng.shuffle(cards)
+    return tuple(chosen), bytes(cards)
+
+
+class BoardPool:
+    """Pre-generated layouts for one level configuration"""
+    __slots__ = ('grid_size', 'color_count', 'layouts')
+
+    def __init__(self, grid_size, color_count, size=POOL_SIZE):
+        self.grid_size = grid_size
+        self.color_count = color_count
+        self.layouts = []
+        for _ in range(size):
+            seed = secrets.randbelow(SEED_LIMIT)
+            self.layouts.append((seed,) + generate_layout(seed, grid_size, color_count))
+
+    def pick(self):
+        return self.layouts[secrets.randbelow(len(self.layouts))]
+
+
+_pools = {}
+
+
+def board_pool(grid_size, color_count):
+    """The pool for a level shape, generated the first time it is needed"""
+    key = (grid_size, color_count)
+    pool = _pools.get(key)
+    if pool is None:
+        if len(_pools) >= MAX_POOLS:
+            _pools.clear()
+        pool = _pools[key] = BoardPool(grid_size, color_count)
+    return pool
+
+
+def build_board(session, level, level_config, colors, chosen, cards):
+    """The board for ``session`` from a layout of ``colors``.
+
+    ``colors`` must be in a stable order (by id) so the session's seed deals
+    the same board again. A grid size or time limit tuned for the session
+    replaces the level's own.
+    """
+    return Board(
+        session_id=session.id,
+        child_id=session.child_id,
+        grid_size=session.grid_size or level_config.grid_size,
+        cards=cards,
+        palette=[(colors[index].hex_code, colors[index].name) for index in chosen],
+        points_per_match=level.points_per_match,
+        required_matches=level.required_matches,
+        time_limit=session.time_limit or level.time_limit,
+    )
+
+
+def replay_board(session, level, level_config, colors):
+    """The board ``session`` was dealt, rebuilt from its seed"""
+    chosen, cards = generate_layout(session.seed, session.grid_size or level_config.grid_size, len(colors))
+    return build_board(session, level, level_config, colors, chosen, cards)
+
+
+def _key(session_id):
+    return BOARD_KEY.format(session_id=session_id)
+
+
+def save_board(board):
+    cache.set(_key(board.session_id), board, BOARD_TIMEOUT)
+
+
+def load_board(session_id):
+    return cache.get(_key(session_id))
+
+
+def discard_board(session_id):
+    cache.delete(_key(session_id))
+
+
+def close_board(session_id):
+    """Stop a board taking moves but keep it, so a result that arrives late is scored by it"""
+    with _LOCKS[session_id % len(_LOCKS)]:
+        board = load_board(session_id)
+        if board is not None and board.finished_at is None:
+            board.finished_at = time.time()
+            save_board(board)
+
+
+def flip_card(session_id, child_id, position):
+    """Apply a flip to the child's board and return what it revealed.
+
+    Raises LookupError if the board has expired or is not the child's, and
+    MoveError for moves the board refuses.
+    """
+    with _LOCKS[session_id % len(_LOCKS)]:
+        board = load_board(session_id)
+        if board is None or board.child_id != child_id:
+            raise LookupError(session_id)
+        move = board.flip(position)
+        save_board(board)
+    return move
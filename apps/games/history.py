@@ -0,0 +1,94 @@
+"""
+Game history pages.
+
+History is paged with a cursor rather than page numbers: each page continues
+after the (started_at, id) of the last session shown, which the index on
+(child, -started_at, -id) answers directly however many sessions a child has
+played. Each page is a single query that joins the game and the color
+matching data.
+"""
+from collections import namedtuple
+import base64
+import binascii
+from datetime import datetime
+
+from django.db.models import Count, Max, Q
+
+from .models import GameSession
+
+PAGE_SIZE = 25
+MAX_PAGE_SIZE = 100
+STATUS_FILTERS = {
+    'completed': Q(completed=True),
+    'incomplete': Q(completed=False),
+}
+
+HistoryPage = namedtuple('HistoryPage', ['sessions', 'next_cursor'])
+
+
+class InvalidCursor(ValueError):
+    """A cursor that was not made by ``encode_cursor``"""
+
+
+def encode_cursor(session):
+    value = f'{session.started_at.isoformat()}|{session.id}'
+    return base64.urlsafe_b64encode(value.encode()).decode().rstrip('=')
+
+
+def decode_cursor(cursor):
+    try:
+        value = base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4)).decode()
+        started_at, session_id = value.split('|')
+        return datetime.fromisoformat(started_at), int(session_id)
+    except (binascii.Error, UnicodeDecodeError, ValueError) as e:
+        raise InvalidCursor(cursor) from e
+
+
+def history_page(child, cursor=None, status=None, page_size=PAGE_SIZE):
+    """The child's sessions, newest first, after ``cursor``.
+
+    Raises InvalidCursor for a cursor that cannot be decoded.
+    """
+    sessions = GameSession.objects.filter(child=child).select_related(
+        'game', 'color_matching_data'
+    ).order_by('-started_at', '-id')
+    if status in STATUS_FILTERS:
+        sessions = sessions.filter(STATUS_FILTERS[status])
+    if cursor:
+        started_at, session_id = decode_cursor(cursor)
+        sessions = sessions.filter(
+            Q(started_at__lt=started_at) | Q(started_at=started_at, id__lt=session_id)
+        )
+
+    page_size = max(1, min(page_size, MAX_PAGE_SIZE))
+    rows = list(sessions[:page_size + 1])
+    next_cursor = encode_cursor(rows[page_size - 1]) if len(rows) > page_size else None
+    return HistoryPage(rows[:page_size], next_cursor)
+
+
+def history_summary(child):
+    """Totals for the history page header, in one aggregate query"""
+    summary = GameSession.objects.filter(child=child).aggregate(
+        total=Count('id'),
+        completed=Count('id', filter=Q(completed=True)),
+        last_played=Max('started_at')
+    )
+    summary['incomplete'] = summary['total'] - summary['completed']
+    return summary
+
+
+def session_row(session):
+    """A session as the JSON history feed sends it"""
+    details = getattr(session, 'color_matching_data', None)
+    return {
+        'id': session.id,
+        'game': session.game.name,
+        'game_slug': session.game.slug,
+        'level': session.level,
+        'score': session.score,
+        'time_taken': session.time_taken,
+        'completed': session.completed,
+        'status': session.status,
+        'started_at': session.started_at.isoformat(),
+        'accuracy': round(details.accuracy) if details is not None else None,
+    }
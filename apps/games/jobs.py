@@ -0,0 +1,17 @@
+from datetime import timedelta
+
+from apps.jobs.tasks import task
+
+from .leaderboard import rebuild
+from .lifecycle import STALE_AFTER, close_stale_sessions
+from .models import Game
+
+
+@task('games.rebuild_leaderboards', every=timedelta(days=1))
+def rebuild_leaderboards(game_id=None):
+    rebuild(Game.objects.get(id=game_id) if game_id is not None else None)
+
+
+@task('games.close_stale_sessions', every=STALE_AFTER)
+def close_stale(minutes=None):
+    close_stale_sessions(timedelta(minutes=minutes) if minutes is not None else STALE_AFTER)
@@ -0,0 +1,133 @@
+"""
+Leaderboards per game level.
+
+``LeaderboardEntry`` holds one row per child and level with the child's best
+score (ties go to the faster time). ``record_session`` updates it as each
+result is saved, and the rank index on (game, level, -best_score, best_time)
+keeps the rows in leaderboard order. A top-N list is then a short index scan
+and a percentile is two counts over a range of that index. Sessions are never
+sorted.
+
+Leaderboards are scoped: teachers compare the children in their classroom,
+therapists the children on their caseload, and staff every child.
+"""
+from collections import namedtuple
+
+from django.db import transaction
+from django.db.models import Q
+
+from apps.users.models import ChildProfile
+
+from .models import GameSession, LeaderboardEntry
+
+TOP_N = 10
+MAX_TOP_N = 100
+
+Standing = namedtuple('Standing', ['entry', 'rank', 'percentile', 'total'])
+
+
+def _beats(entry, session):
+    """Whether ``session`` ranks above the entry's current best"""
+    return (session.score, -session.time_taken) > (entry.best_score, -entry.best_time)
+
+
+def record_session(session):
+    """Fold a finished session into its child's entry; call inside the result's transaction"""
+    entry, created = LeaderboardEntry.objects.select_for_update().get_or_create(
+        game_id=session.game_id,
+        level=session.level,
+        child_id=session.child_id,
+        defaults={
+            'best_score': session.score,
+            'best_time': session.time_taken,
+            'best_session': session,
+            'sessions_played': 1,
+        }
+    )
+    if created:
+        return entry
+    entry.sessions_played += 1
+    if _beats(entry, session):
+        entry.best_score = session.score
+        entry.best_time = session.time_taken
+        entry.best_session = session
+    entry.save()
+    return entry
+
+
+def rebuild(game=None):
+    """Recompute every entry from finished sessions; returns the number of entries"""
+    sessions = GameSession.objects.filter(status=GameSession.Status.FINISHED)
+    entries = LeaderboardEntry.objects.all()
+    if game is not None:
+        sessions = sessions.filter(game=game)
+        entries = entries.filter(game=game)
+
+    best = {}
+    for session in sessions.only('id', 'game_id', 'level', 'child_id', 'score', 'time_taken').iterator():
+        key = (session.game_id, session.level, session.child_id)
+        entry = best.get(key)
+        if entry is None:
+            best[key] = LeaderboardEntry(
+                game_id=session.game_id,
+                level=session.level,
+                child_id=session.child_id,
+                best_score=session.score,
+                best_time=session.time_taken,
+                best_session_id=session.id,
+                sessions_played=1
+            )
+            continue
+        entry.sessions_played += 1
+        if _beats(entry, session):
+            entry.best_score = session.score
+            entry.best_time = session.time_taken
+            entry.best_session_id = session.id
+
+    # Readers and a failed rebuild never see an empty leaderboard
+    with transaction.atomic():
+        entries.delete()
+        LeaderboardEntry.objects.bulk_create(best.values(), batch_size=500)
+    return len(best)
+
+
+def scope_children(user):
+    """User ids of the children ``user`` may compare, or None if they may not see leaderboards"""
+    if user.is_staff:
+        return ChildProfile.objects.values('user_id')
+    if user.role == 'teacher' and hasattr(user, 'teacher_profile'):
+        return user.teacher_profile.assigned_children.values('user_id')
+    if user.role == 'therapist' and hasattr(user, 'therapist_profile'):
+        return user.therapist_profile.assigned_children.values('user_id')
+    return None
+
+
+def _entries(game, level, children):
+    return LeaderboardEntry.objects.filter(game=game, level=level, child_id__in=children)
+
+
+def top(game, level, children, limit=TOP_N):
+    """The best entries for a level among ``children``, in rank order"""
+    limit = max(1, min(limit, MAX_TOP_N))
+    return list(_entries(game, level, children).select_related('child').order_by('-best_score', 'best_time', 'child_id')[:limit])
+
+
+def standing(game, level, child, children):
+    """Where ``child`` ranks among ``children`` on a level, or None if they have not played it.
+
+    The percentile is the share of the other children ranked below them.
+    """
+    entry = LeaderboardEntry.objects.filter(game=game, level=level, child=child).first()
+    if entry is None:
+        return None
+    entries = _entries(game, level, children)
+    ahead = entries.filter(
+        Q(best_score__gt=entry.best_score) | Q(best_score=entry.best_score, best_time__lt=entry.best_time)
+    ).count()
+    behind = entries.filter(
+        Q(best_score__lt=entry.best_score) | Q(best_score=entry.best_score, best_time__gt=entry.best_time)
+    ).count()
+    total = entries.count()
+    others = total - 1
+    percentile = round(100 * behind / others) if others > 0 else 100
+    return Standing(entry, ahead + 1, percentile, total)
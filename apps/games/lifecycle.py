@@ -0,0 +1,59 @@
+"""
+Game session lifecycle.
+
+A GameSession is created when a child starts a level and stays ``active``
+while the game page sends heartbeats. Recording its result finishes it;
+leaving the page abandons it. Sessions whose page went away without saying
+so (closed tablet, lost connection) are abandoned in bulk by
+``close_stale_sessions`` once their heartbeats stop.
+
+An abandoned session keeps its board, closed to further moves, so a result
+synced late is still scored by the board rather than by the client.
+"""
+from datetime import timedelta
+
+from django.utils import timezone
+
+from .engine import close_board
+from .models import GameSession
+
+HEARTBEAT_INTERVAL = timedelta(seconds=30)
+STALE_AFTER = timedelta(minutes=10)
+
+
+def heartbeat(session_id, child_id):
+    """Mark an active session as still open; returns False if it is not active"""
+    return GameSession.objects.filter(
+        id=session_id,
+        child_id=child_id,
+        status=GameSession.Status.ACTIVE
+    ).update(last_seen_at=timezone.now()) == 1
+
+
+def abandon(session_id, child_id):
+    """End an active session without a result"""
+    abandoned = GameSession.objects.filter(
+        id=session_id,
+        child_id=child_id,
+        status=GameSession.Status.ACTIVE
+    ).update(status=GameSession.Status.ABANDONED, last_seen_at=timezone.now()) == 1
+    if abandoned:
+        close_board(session_id)
+    return abandoned
+
+
+def close_stale_sessions(stale_after=STALE_AFTER):
+    """Abandon every active session without a heartbeat for ``stale_after`` and close their boards"""
+    stale = GameSession.objects.filter(
+        status=GameSession.Status.ACTIVE,
+        last_seen_at__lt=timezone.now() - stale_after
+    )
+    session_ids = list(stale.values_list('id', flat=True))
+    # Only sessions still active are abandoned, in case one finished meanwhile
+    closed = GameSession.objects.filter(
+        id__in=session_ids,
+        status=GameSession.Status.ACTIVE
+    ).update(status=GameSession.Status.ABANDONED)
+    for session_id in session_ids:
+        close_board(session_id)
+    return closed
@@ -0,0 +1,48 @@
+from collections import namedtuple
+import time
+
+from django.core.management.base import BaseCommand
+from apps.games.engine import generate_layout, board_pool, Board
+
+FakeColor = namedtuple('FakeColor', ['hex_code', 'name'])
+
+
+class Command(BaseCommand):
+    help = 'Time seeded board generation and pool lookups for grids from 2x2 to 8x8'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--iterations',
+            type=int,
+            default=2000,
+            help='Boards generated per grid size'
+        )
+        parser.add_argument(
+            '--max-size',
+            type=int,
+            default=8,
+            help='Largest grid size to time'
+        )
+
+    def time_per_call(self, function, iterations):
+        start = time.perf_counter()
+        for i in range(iterations):
+            function(i)
+        return (time.perf_counter() - start) / iterations * 1e6
+
+    def handle(self, *args, **options):
+        iterations = options['iterations']
+        self.stdout.write(f'{"grid":>6} {"generate (us)":>14} {"pool pick (us)":>15} {"board (us)":>11}')
+        for size in range(2, options['max_size'] + 1):
+            color_count = size * size // 2
+            colors = [FakeColor(f'#{i:06x}', f'color {i}') for i in range(color_count)]
+            pool = board_pool(size, color_count)
+
+            def build(i):
+                seed, chosen, cards = pool.pick()
+                Board(i, 1, size, cards, [(colors[index].hex_code, colors[index].name) for index in chosen], 10, color_count, 60)
+
+            generate = self.time_per_call(lambda i: generate_layout(i, size, color_count), iterations)
+            pick = self.time_per_call(lambda i: pool.pick(), iterations)
+            board = self.time_per_call(build, iterations)
+            self.stdout.write(f'{size}x{size:<4} {generate:>14.1f} {pick:>15.2f} {board:>11.1f}')
@@ -0,0 +1,20 @@
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+from apps.games.lifecycle import STALE_AFTER, close_stale_sessions
+
+
+class Command(BaseCommand):
+    help = 'Mark active game sessions whose page stopped sending heartbeats as abandoned'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--minutes',
+            type=int,
+            default=int(STALE_AFTER.total_seconds() // 60),
+            help='Close sessions without a heartbeat for this many minutes'
+        )
+
+    def handle(self, *args, **options):
+        closed = close_stale_sessions(timedelta(minutes=options['minutes']))
+        self.stdout.write(self.style.SUCCESS(f'Closed {closed} stale game sessions'))
@@ -0,0 +1,10 @@
+from django.core.management.base import BaseCommand
+from apps.games.leaderboard import rebuild
+
+
+class Command(BaseCommand):
+    help = 'Recompute leaderboard entries from finished game sessions'
+
+    def handle(self, *args, **options):
+        count = rebuild()
+        self.stdout.write(self.style.SUCCESS(f'Rebuilt {count} leaderboard entries'))
@@ -1,4 +1,5 @@
 from django.core.management.base import BaseCommand
+from apps.games.color_matching import ColorMatching
 from apps.games.models import Game, ColorMatchingGame, Color, ColorMatchingLevel
 
 class Command(BaseCommand):
@@ -9,8 +10,9 @@ class Command(BaseCommand):
         
         # Create the main game
         game, created = Game.objects.get_or_create(
-            name='Color Matching Game',
+            slug=ColorMatching.slug,
             defaults={
+                'name': ColorMatching.name,
                 'description': 'Match colors to improve memory and concentration',
                 'is_active': True
             }
@@ -0,0 +1,18 @@
+# Generated by Django 5.2.4 on 2026-10-19 12:43
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('games', '0003_color_colormatchinggame_and_more'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='gamesession',
+            name='seed',
+            field=models.PositiveIntegerField(blank=True, help_text='Seed the board was dealt from, for replays and audits', null=True),
+        ),
+    ]
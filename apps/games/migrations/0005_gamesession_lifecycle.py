@@ -0,0 +1,45 @@
+# Generated by Django 5.2.4 on 2026-10-19 12:44
+
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import Q
+from django.db.models.functions import Coalesce
+
+
+def close_existing_sessions(apps, schema_editor):
+    """Sessions from before the lifecycle were shared between plays; none is still running"""
+    GameSession = apps.get_model('games', 'GameSession')
+    finished = Q(completed=True) | Q(completed_at__isnull=False)
+    GameSession.objects.filter(finished).update(status='finished')
+    GameSession.objects.exclude(finished).update(status='abandoned')
+    GameSession.objects.update(last_seen_at=Coalesce('completed_at', 'started_at'))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('games', '0004_gamesession_seed'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='gamesession',
+            name='last_seen_at',
+            field=models.DateTimeField(blank=True, help_text='Last heartbeat from the game page', null=True),
+        ),
+        migrations.AddField(
+            model_name='gamesession',
+            name='status',
+            field=models.CharField(choices=[('active', 'Active'), ('finished', 'Finished'), ('abandoned', 'Abandoned')], default='active', max_length=10),
+        ),
+        migrations.AddIndex(
+            model_name='gamesession',
+            index=models.Index(fields=['child', 'game', 'level', 'started_at'], name='game_session_child_level_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='gamesession',
+            index=models.Index(fields=['status', 'last_seen_at'], name='game_session_status_seen_idx'),
+        ),
+        migrations.RunPython(close_existing_sessions, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,35 @@
+# Generated by Django 5.2.4 on 2026-10-19 12:55
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('games', '0006_gamesession_history_index'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='LeaderboardEntry',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('level', models.IntegerField()),
+                ('best_score', models.IntegerField(default=0)),
+                ('best_time', models.IntegerField(default=0, help_text='Time taken in the best-scoring session, in seconds')),
+                ('sessions_played', models.PositiveIntegerField(default=0)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('best_session', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to='games.gamesession')),
+                ('child', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='leaderboard_entries', to=settings.AUTH_USER_MODEL)),
+                ('game', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='leaderboard', to='games.game')),
+            ],
+            options={
+                'ordering': ['-best_score', 'best_time'],
+                'indexes': [models.Index(fields=['game', 'level', '-best_score', 'best_time'], name='leaderboard_rank_idx')],
+                'unique_together': {('game', 'level', 'child')},
+            },
+        ),
+    ]
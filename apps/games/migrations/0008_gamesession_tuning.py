@@ -0,0 +1,36 @@
+# Generated by Django 5.2.4 on 2026-10-19 12:59
+
+from django.db import migrations, models
+from django.db.models import OuterRef, Subquery
+
+
+def copy_level_settings(apps, schema_editor):
+    """Earlier sessions were played with their level's own settings"""
+    GameSession = apps.get_model('games', 'GameSession')
+    ColorMatchingGame = apps.get_model('games', 'ColorMatchingGame')
+    ColorMatchingLevel = apps.get_model('games', 'ColorMatchingLevel')
+    GameSession.objects.filter(game__name__icontains='color matching').update(
+        time_limit=Subquery(ColorMatchingGame.objects.filter(level=OuterRef('level')).values('time_limit')[:1]),
+        grid_size=Subquery(ColorMatchingLevel.objects.filter(game__level=OuterRef('level')).values('grid_size')[:1])
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('games', '0007_leaderboardentry'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='gamesession',
+            name='grid_size',
+            field=models.PositiveSmallIntegerField(blank=True, help_text='Grid size the board was dealt with', null=True),
+        ),
+        migrations.AddField(
+            model_name='gamesession',
+            name='time_limit',
+            field=models.PositiveIntegerField(blank=True, help_text='Time limit the session was played with, in seconds', null=True),
+        ),
+        migrations.RunPython(copy_level_settings, migrations.RunPython.noop),
+    ]
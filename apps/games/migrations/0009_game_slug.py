@@ -0,0 +1,39 @@
+# Generated by Django 5.2.4 on 2026-10-19 13:10
+
+from django.db import migrations, models
+from django.utils.text import slugify
+
+
+def fill_slugs(apps, schema_editor):
+    """Color matching games get the registry's slug; other games one from their name"""
+    Game = apps.get_model('games', 'Game')
+    taken = set()
+    for game in Game.objects.order_by('id'):
+        base = 'color-matching' if 'color matching' in game.name.lower() else (slugify(game.name)[:40] or 'game')
+        slug, suffix = base, 2
+        while slug in taken:
+            slug, suffix = f'{base}-{suffix}', suffix + 1
+        taken.add(slug)
+        game.slug = slug
+        game.save(update_fields=['slug'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('games', '0008_gamesession_tuning'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='game',
+            name='slug',
+            field=models.SlugField(max_length=50, null=True),
+        ),
+        migrations.RunPython(fill_slugs, migrations.RunPython.noop),
+        migrations.AlterField(
+            model_name='game',
+            name='slug',
+            field=models.SlugField(help_text="Key of the game's type in the game registry", unique=True),
+        ),
+    ]
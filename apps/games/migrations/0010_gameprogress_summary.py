@@ -0,0 +1,47 @@
+# Generated by Django 5.2.4 on 2026-10-19 13:10
+
+from django.db import migrations, models
+from django.db.models import Max, Sum
+
+
+def summarize_sessions(apps, schema_editor):
+    """Fill the new totals from the sessions already played"""
+    GameProgress = apps.get_model('games', 'GameProgress')
+    GameSession = apps.get_model('games', 'GameSession')
+    ColorMatchingSession = apps.get_model('games', 'ColorMatchingSession')
+    for progress in GameProgress.objects.all():
+        sessions = GameSession.objects.filter(child_id=progress.child_id, game_id=progress.game_id, status='finished')
+        totals = sessions.aggregate(total_time=Sum('time_taken'), best_score=Max('score'))
+        recent = ColorMatchingSession.objects.filter(
+            game_session__in=sessions
+        ).order_by('-game_session__started_at').values_list('accuracy', flat=True)[:10]
+        progress.total_time = totals['total_time'] or 0
+        progress.best_score = totals['best_score'] or 0
+        progress.recent_accuracy = [round(accuracy, 1) for accuracy in reversed(list(recent))]
+        progress.save(update_fields=['total_time', 'best_score', 'recent_accuracy'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('games', '0009_game_slug'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='gameprogress',
+            name='best_score',
+            field=models.IntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='gameprogress',
+            name='recent_accuracy',
+            field=models.JSONField(blank=True, default=list, help_text='Accuracy of the latest sessions, oldest first'),
+        ),
+        migrations.AddField(
+            model_name='gameprogress',
+            name='total_time',
+            field=models.PositiveIntegerField(default=0, help_text='Seconds played across all sessions'),
+        ),
+        migrations.RunPython(summarize_sessions, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,44 @@
+from django.db import migrations
+
+
+def backfill_leaderboard(apps, schema_editor):
+    """Rank the sessions finished before leaderboards kept themselves up to date"""
+    GameSession = apps.get_model('games', 'GameSession')
+    LeaderboardEntry = apps.get_model('games', 'LeaderboardEntry')
+    best = {}
+    sessions = GameSession.objects.filter(status='finished').only(
+        'id', 'game_id', 'level', 'child_id', 'score', 'time_taken'
+    ).order_by('id')
+    for session in sessions.iterator():
+        key = (session.game_id, session.level, session.child_id)
+        entry = best.get(key)
+        if entry is None:
+            best[key] = LeaderboardEntry(
+                game_id=session.game_id,
+                level=session.level,
+                child_id=session.child_id,
+                best_score=session.score,
+                best_time=session.time_taken,
+                best_session_id=session.id,
+                sessions_played=1
+            )
+            continue
+        entry.sessions_played += 1
+        # Higher score first, then the faster time, as in leaderboard.record_session
+        if (session.score, -session.time_taken) > (entry.best_score, -entry.best_time):
+            entry.best_score = session.score
+            entry.best_time = session.time_taken
+            entry.best_session_id = session.id
+    LeaderboardEntry.objects.all().delete()
+    LeaderboardEntry.objects.bulk_create(best.values(), batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('games', '0010_gameprogress_summary'),
+    ]
+
+    operations = [
+        migrations.RunPython(backfill_leaderboard, migrations.RunPython.noop),
+    ]
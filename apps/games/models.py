@@ -7,6 +7,7 @@ User = get_user_model()
 class Game(models.Model):
     """General game model"""
     name = models.CharField(max_length=100)
+    slug = models.SlugField(max_length=50, unique=True, help_text="Key of the game's type in the game registry")
     description = models.TextField()
     is_active = models.BooleanField(default=True)
     created_at = models.DateTimeField(auto_now_add=True)
@@ -63,6 +64,12 @@ class ColorMatchingLevel(models.Model):
 
 class GameSession(models.Model):
     """Track individual game sessions for children"""
+
+    class Status(models.TextChoices):
+        ACTIVE = 'active', 'Active'
+        FINISHED = 'finished', 'Finished'
+        ABANDONED = 'abandoned', 'Abandoned'
+
     child = models.ForeignKey(User, on_delete=models.CASCADE, related_name='game_sessions')
     game = models.ForeignKey(Game, on_delete=models.CASCADE)
     level = models.IntegerField()
@@ -71,9 +78,19 @@ class GameSession(models.Model):
     completed = models.BooleanField(default=False)
     started_at = models.DateTimeField(auto_now_add=True)
     completed_at = models.DateTimeField(null=True, blank=True)
+    seed = models.PositiveIntegerField(null=True, blank=True, help_text="Seed the board was dealt from, for replays and audits")
+    grid_size = models.PositiveSmallIntegerField(null=True, blank=True, help_text="Grid size the board was dealt with")
+    time_limit = models.PositiveIntegerField(null=True, blank=True, help_text="Time limit the session was played with, in seconds")
+    status = models.CharField(max_length=10, choices=Status.choices, default=Status.ACTIVE)
+    last_seen_at = models.DateTimeField(null=True, blank=True, help_text="Last heartbeat from the game page")
 
     class Meta:
         ordering = ['-started_at']
+        indexes = [
+            models.Index(fields=['child', 'game', 'level', 'started_at'], name='game_session_child_level_idx'),
+            models.Index(fields=['status', 'last_seen_at'], name='game_session_status_seen_idx'),
+            models.Index(fields=['child', '-started_at', '-id'], name='game_session_history_idx'),
+        ]
 
     def __str__(self):
         return f"{self.child.username} - {self.game.name} Level {self.level}"
@@ -96,6 +113,9 @@ class GameProgress(models.Model):
     total_score = models.IntegerField(default=0)
     total_sessions = models.IntegerField(default=0)
     average_accuracy = models.FloatField(default=0.0)
+    total_time = models.PositiveIntegerField(default=0, help_text="Seconds played across all sessions")
+    best_score = models.IntegerField(default=0)
+    recent_accuracy = models.JSONField(default=list, blank=True, help_text="Accuracy of the latest sessions, oldest first")
     last_played = models.DateTimeField(null=True, blank=True)
     updated_at = models.DateTimeField(auto_now=True)
 
@@ -105,3 +125,24 @@ class GameProgress(models.Model):
 
     def __str__(self):
         return f"{self.child.username} - {self.game.name} Progress"
+
+class LeaderboardEntry(models.Model):
+    """A child's best result on one level of a game, kept in rank order by its index"""
+    game = models.ForeignKey(Game, on_delete=models.CASCADE, related_name='leaderboard')
+    level = models.IntegerField()
+    child = models.ForeignKey(User, on_delete=models.CASCADE, related_name='leaderboard_entries')
+    best_score = models.IntegerField(default=0)
+    best_time = models.IntegerField(default=0, help_text="Time taken in the best-scoring session, in seconds")
+    best_session = models.ForeignKey(GameSession, on_delete=models.SET_NULL, null=True, blank=True, related_name='+')
+    sessions_played = models.PositiveIntegerField(default=0)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        unique_together = ['game', 'level', 'child']
+        ordering = ['-best_score', 'best_time']
+        indexes = [
+            models.Index(fields=['game', 'level', '-best_score', 'best_time'], name='leaderboard_rank_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.child.username} - {self.game.name} Level {self.level}: {self.best_score}"
@@ -0,0 +1,130 @@
+"""
+Game registry.
+
+Every kind of game is a ``GameType`` subclass registered under the slug of
+its ``Game`` row. The type says how the game's levels are listed and played,
+how a result is scored, and what it records besides the session, so the
+level, play and leaderboard pages (all keyed on the slug in their URL),
+progress and adaptive difficulty work for any registered game without name
+lookups. Types are registered when the app loads (see ``GamesConfig.ready``).
+
+Game rows are found by slug through ``game_id``, which keeps the slug to id
+map in memory. The map is loaded on first use and reloaded when a game is
+saved or deleted, or when a slug is missing from it.
+"""
+from django.core.cache import cache
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+from django.shortcuts import get_object_or_404
+from django.urls import reverse
+
+from .models import Game
+
+LEVEL_COUNT_KEY = 'games:level-count:{slug}'
+LEVEL_COUNT_TIMEOUT = 60 * 10
+
+_types = {}
+_game_ids = {}
+
+
+class ResultUnavailable(Exception):
+    """A session's result can no longer be checked on the server, so none is recorded"""
+
+
+class LevelUnavailable(Exception):
+    """A level exists but is not set up well enough to be played"""
+
+
+class GameType:
+    """Hooks for one kind of game; subclasses set ``slug`` and override what they need"""
+    slug = None
+    name = None
+    # Templates of the game's level list and play pages, if it can be played
+    levels_template = None
+    play_template = None
+    # adaptive.DifficultyPolicy tuning the game's levels, if any
+    difficulty = None
+
+    def active_levels(self):
+        """The game's active level rows in order, each with a ``level`` number"""
+        return []
+
+    def levels(self):
+        """Level numbers of the game's active levels, in order"""
+        return [row.level for row in self.active_levels()]
+
+    def levels_url(self):
+        """URL of the game's level list, or None if it cannot be played"""
+        if self.levels_template is None:
+            return None
+        return reverse('games:game_levels', args=[self.slug])
+
+    def level_count(self):
+        """How many active levels the game has, cached briefly for dashboards"""
+        key = LEVEL_COUNT_KEY.format(slug=self.slug)
+        count = cache.get(key)
+        if count is None:
+            count = len(self.levels())
+            cache.set(key, count, LEVEL_COUNT_TIMEOUT)
+        return count
+
+    def load_level(self, level):
+        """Whatever a play of ``level`` needs; raises Http404 for unknown levels"""
+        raise NotImplementedError
+
+    def start(self, child, game, level):
+        """Open a session of ``level`` for ``child`` and return the play page's context.
+
+        Raises Http404 for unknown levels and LevelUnavailable for levels
+        that cannot be played.
+        """
+        raise NotImplementedError
+
+    def final_result(self, session, data):
+        """The result to record from what the client reported; may raise ResultUnavailable"""
+        return data
+
+    def record_details(self, session, data):
+        """Store game-specific details of a result; returns its accuracy percentage"""
+        return 0.0
+
+    def finished(self, session):
+        """Called after a result has been recorded"""
+
+
+def register(game_type):
+    """Class decorator adding a GameType to the registry"""
+    _types[game_type.slug] = game_type()
+    return game_type
+
+
+def game_type(slug):
+    return _types.get(slug)
+
+
+def type_for(game):
+    """The registered type of a Game row, or None"""
+    return _types.get(game.slug)
+
+
+def registered_types():
+    return list(_types.values())
+
+
+def game_id(slug):
+    """Id of the game with ``slug``, or None"""
+    if slug not in _game_ids:
+        _game_ids.clear()
+        _game_ids.update(Game.objects.values_list('slug', 'id'))
+    return _game_ids.get(slug)
+
+
+def get_game_or_404(slug):
+    """The active Game row registered as ``slug``"""
+    return get_object_or_404(Game, pk=game_id(slug), is_active=True)
+
+
+@receiver(post_save, sender=Game)
+@receiver(post_delete, sender=Game)
+def forget_game_ids(sender, **kwargs):
+    _game_ids.clear()
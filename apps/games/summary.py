@@ -0,0 +1,119 @@
+"""
+Per-child game summaries.
+
+``GameProgress`` is the summary: one row per child and game with totals,
+best score, play time and the accuracy of the latest sessions. It is
+updated in place as each result is saved, so dashboards read one row per
+game instead of the child's sessions.
+"""
+from collections import namedtuple
+
+from django.db.models import F, FilteredRelation, Q
+from django.utils import timezone
+
+from .models import Game, GameProgress
+from .registry import type_for
+
+RECENT_ACCURACY = 10
+TREND_THRESHOLD = 5
+PROGRESS_RING = 157
+
+
+class GameSummary(namedtuple('GameSummary', [
+    'game', 'levels_url', 'level_count', 'highest_level_completed', 'sessions', 'total_score',
+    'best_score', 'average_accuracy', 'total_time', 'accuracy_trend', 'last_played'
+])):
+    __slots__ = ()
+
+    @property
+    def progress_offset(self):
+        """Stroke offset of the dashboard's progress ring; the full ring length means no progress"""
+        if not self.level_count:
+            return PROGRESS_RING
+        done = min(self.highest_level_completed / self.level_count, 1)
+        return round(PROGRESS_RING * (1 - done), 1)
+
+    @property
+    def minutes(self):
+        return round(self.total_time / 60)
+
+
+def record_progress(session, accuracy):
+    """Fold a recorded session into its child's summary; call inside the result's transaction"""
+    progress, created = GameProgress.objects.select_for_update().get_or_create(
+        child_id=session.child_id,
+        game_id=session.game_id,
+        defaults={
+            'highest_level_completed': session.level if session.completed else 0,
+            'total_score': session.score,
+            'total_sessions': 1,
+            'average_accuracy': accuracy,
+            'total_time': session.time_taken,
+            'best_score': session.score,
+            'recent_accuracy': [round(accuracy, 1)],
+            'last_played': timezone.now()
+        }
+    )
+    if created:
+        return progress
+
+    progress.total_score += session.score
+    progress.total_sessions += 1
+    if session.completed and session.level > progress.highest_level_completed:
+        progress.highest_level_completed = session.level
+    # Running average, so no earlier session is read again
+    progress.average_accuracy += (accuracy - progress.average_accuracy) / progress.total_sessions
+    progress.total_time += session.time_taken
+    progress.best_score = max(progress.best_score, session.score)
+    progress.recent_accuracy = (progress.recent_accuracy + [round(accuracy, 1)])[-RECENT_ACCURACY:]
+    progress.last_played = timezone.now()
+    progress.save()
+    return progress
+
+
+def accuracy_trend(recent):
+    """'up', 'down' or 'steady', comparing the newer half of ``recent`` with the older half"""
+    if len(recent) < 4:
+        return 'steady'
+    half = len(recent) // 2
+    older = sum(recent[:half]) / half
+    newer = sum(recent[-half:]) / half
+    if newer - older >= TREND_THRESHOLD:
+        return 'up'
+    if older - newer >= TREND_THRESHOLD:
+        return 'down'
+    return 'steady'
+
+
+def child_summaries(child):
+    """One summary per active game for ``child``, from a single query"""
+    games = Game.objects.filter(is_active=True).annotate(
+        summary=FilteredRelation('progress', condition=Q(progress__child=child))
+    ).annotate(
+        highest_level_completed=F('summary__highest_level_completed'),
+        sessions=F('summary__total_sessions'),
+        total_score=F('summary__total_score'),
+        best_score=F('summary__best_score'),
+        average_accuracy=F('summary__average_accuracy'),
+        total_time=F('summary__total_time'),
+        recent_accuracy=F('summary__recent_accuracy'),
+        last_played=F('summary__last_played'),
+    ).order_by('name')
+
+    summaries = []
+    for game in games:
+        registered = type_for(game)
+        summaries.append(GameSummary(
+            game=game,
+            levels_url=registered.levels_url() if registered else None,
+            level_count=registered.level_count() if registered else 0,
+            highest_level_completed=game.highest_level_completed or 0,
+            sessions=game.sessions or 0,
+            total_score=game.total_score or 0,
+            best_score=game.best_score or 0,
+            average_accuracy=game.average_accuracy or 0.0,
+            total_time=game.total_time or 0,
+            accuracy_trend=accuracy_trend(game.recent_accuracy or []),
+            last_played=game.last_played,
+        ))
+    return summaries
@@ -1,3 +1,570 @@
-from django.test import TestCase
+from django.test import TestCase, Client
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.urls import reverse
+from .models import Game, ColorMatchingGame, Color, ColorMatchingLevel, GameSession, ColorMatchingSession, GameProgress, LeaderboardEntry
+from apps.users.models import ChildProfile, TeacherProfile
+from .adaptive import Window, Result, load_window, record_result, recommend_level
+from .color_matching import ColorMatching
+from .registry import game_id, type_for
+from .engine import load_board, generate_layout, board_pool, replay_board
+from .leaderboard import rebuild
+from django.core.management import call_command
+from django.db import IntegrityError
+from django.utils import timezone
+from datetime import timedelta
+import io
+import json
+import pickle
+from unittest import mock
 
-# Create your tests here.
+User = get_user_model()
+
+COLORS = [
+    ('Red', '#FF0000'), ('Blue', '#0000FF'), ('Green', '#00FF00'), ('Yellow', '#FFFF00'),
+    ('Orange', '#FFA500'), ('Purple', '#800080'), ('Pink', '#FFC0CB'), ('Brown', '#8B4513'),
+]
+
+
+class ColorMatchingTestCase(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.client = Client()
+
+        self.child_user = User.objects.create_user(
+            email='child@test.com',
+            username='childtest',
+            password='testpass123',
+            role='child'
+        )
+        self.other_child = User.objects.create_user(
+            email='other@test.com',
+            username='othertest',
+            password='testpass123',
+            role='child'
+        )
+
+        self.game = Game.objects.create(name='Color Matching Game', slug='color-matching', description='Match colors')
+        self.level = ColorMatchingGame.objects.create(
+            level=1,
+            name='Beginner',
+            description='Match the colors',
+            time_limit=60,
+            points_per_match=10,
+            required_matches=8
+        )
+        config = ColorMatchingLevel.objects.create(game=self.level, grid_size=4)
+        config.colors.set([
+            Color.objects.create(name=name, hex_code=hex_code, category='primary')
+            for name, hex_code in COLORS
+        ])
+        self.client.login(email='child@test.com', password='testpass123')
+
+    def start(self):
+        response = self.client.get(reverse('games:play_game', args=['color-matching', 1]))
+        session = response.context['session']
+        return response, session, load_board(session.id)
+
+    def flip(self, session, position):
+        return self.client.post(
+            reverse('games:api_flip_card', args=[session.id]),
+            data=json.dumps({'position': position}),
+            content_type='application/json'
+        )
+
+    def pairs(self, board):
+        positions = {}
+        for position, color in enumerate(board.cards):
+            positions.setdefault(color, []).append(position)
+        return list(positions.values())
+
+
+class ColorMatchingEngineTest(ColorMatchingTestCase):
+    def test_page_does_not_reveal_colors(self):
+        """Test that the board is dealt on the server and colors stay there"""
+        response, session, board = self.start()
+
+        self.assertEqual(len(board.cards), 16)
+        self.assertEqual(sorted(board.cards), sorted(list(range(8)) * 2))
+        for name, hex_code in COLORS:
+            self.assertNotContains(response, hex_code)
+
+    def test_match_and_miss(self):
+        """Test that flips are scored by the server"""
+        response, session, board = self.start()
+        pairs = self.pairs(board)
+
+        self.assertEqual(self.flip(session, pairs[0][0]).json()['result'], 'first')
+        move = self.flip(session, pairs[1][0]).json()
+        self.assertEqual(move['result'], 'miss')
+        self.assertEqual(move['attempts'], 1)
+
+        self.flip(session, pairs[0][0])
+        move = self.flip(session, pairs[0][1]).json()
+        self.assertEqual(move['result'], 'match')
+        self.assertEqual(move['color'], board.palette[board.cards[pairs[0][1]]][0])
+        self.assertEqual((move['matches'], move['attempts'], move['score']), (1, 2, 10))
+
+    def test_invalid_moves(self):
+        """Test that the board refuses impossible flips"""
+        response, session, board = self.start()
+        first, second = self.pairs(board)[0]
+        self.flip(session, first)
+        self.flip(session, second)
+
+        self.assertEqual(self.flip(session, first).status_code, 400)
+        self.assertEqual(self.flip(session, 16).status_code, 400)
+        self.assertEqual(self.flip(session, 'a').status_code, 400)
+
+        self.client.login(email='other@test.com', password='testpass123')
+        self.assertEqual(self.flip(session, second).status_code, 410)
+
+    def test_result_comes_from_board(self):
+        """Test that reported scores are replaced by the board's"""
+        response, session, board = self.start()
+        for first, second in self.pairs(board):
+            self.flip(session, first)
+            move = self.flip(session, second).json()
+        self.assertTrue(move['completed'])
+        self.assertEqual(self.flip(session, 0).status_code, 400)
+
+        self.client.post(
+            reverse('games:save_result'),
+            data=json.dumps({'session_id': session.id, 'score': 9999, 'matches_found': 99, 'total_attempts': 1, 'completed': True}),
+            content_type='application/json'
+        )
+        session.refresh_from_db()
+        self.assertEqual(session.score, 80)
+        self.assertTrue(session.completed)
+        self.assertEqual(session.color_matching_data.total_attempts, 8)
+        self.assertEqual(GameProgress.objects.get(child=self.child_user, game=self.game).total_score, 80)
+        self.assertIsNone(load_board(session.id))
+
+    def test_lost_board_result_is_refused(self):
+        """Test that a dealt session whose board expired does not fall back to the client's score"""
+        session = self.start()[1]
+        cache.clear()
+
+        response = self.client.post(
+            reverse('games:save_result'),
+            data=json.dumps({'session_id': session.id, 'score': 99999, 'completed': True}),
+            content_type='application/json'
+        )
+        self.assertEqual(response.status_code, 410)
+        session.refresh_from_db()
+        self.assertEqual(session.status, GameSession.Status.ACTIVE)
+        self.assertEqual(session.score, 0)
+        self.assertFalse(GameProgress.objects.exists())
+        self.assertFalse(LeaderboardEntry.objects.exists())
+
+    def test_board_is_small(self):
+        """Test that a stored board stays well under a kilobyte"""
+        response, session, board = self.start()
+
+        self.assertLess(len(pickle.dumps(board, pickle.HIGHEST_PROTOCOL)), 1024)
+
+    def test_seed_replays_board(self):
+        """Test that the stored seed deals the same board again"""
+        response, session, board = self.start()
+        session.refresh_from_db()
+        config = self.level.level_config
+
+        replayed = replay_board(session, self.level, config, list(config.colors.order_by('id')))
+        self.assertIsNotNone(session.seed)
+        self.assertEqual(replayed.cards, board.cards)
+        self.assertEqual(replayed.palette, board.palette)
+
+    def test_layouts_are_deterministic(self):
+        """Test seeded generation for grids up to 8x8"""
+        for size in range(2, 9):
+            chosen, cards = generate_layout(1234, size, 40)
+            self.assertEqual((chosen, cards), generate_layout(1234, size, 40))
+            self.assertEqual(len(cards), size * size // 2 * 2)
+            self.assertEqual(sorted(cards), sorted(list(range(len(chosen))) * 2))
+        self.assertNotEqual(generate_layout(1, 8, 40), generate_layout(2, 8, 40))
+
+    def test_boards_come_from_pool(self):
+        """Test that starting a level picks a pre-generated layout"""
+        pool = board_pool(4, len(COLORS))
+        response, session, board = self.start()
+        session.refresh_from_db()
+
+        self.assertIs(board_pool(4, len(COLORS)), pool)
+        self.assertIn(session.seed, [layout[0] for layout in pool.layouts])
+
+    def test_benchmark_command(self):
+        """Test that the board benchmark runs"""
+        out = io.StringIO()
+        call_command('benchmark_boards', iterations=10, stdout=out)
+        self.assertIn('8x8', out.getvalue())
+
+
+class GameSessionLifecycleTest(ColorMatchingTestCase):
+    def save_result(self, session, **data):
+        return self.client.post(
+            reverse('games:save_result'),
+            data=json.dumps(dict({'session_id': session.id}, **data)),
+            content_type='application/json'
+        )
+
+    def test_each_play_gets_a_session(self):
+        """Test that starting a level again creates a new session with one insert"""
+        first = self.start()[1]
+        with self.assertNumQueries(7):
+            second = self.start()[1]
+
+        self.assertNotEqual(first.id, second.id)
+        self.assertEqual(GameSession.objects.filter(child=self.child_user, level=1).count(), 2)
+        self.assertEqual(second.status, GameSession.Status.ACTIVE)
+        self.assertIsNotNone(second.last_seen_at)
+
+    def test_result_is_recorded_once(self):
+        """Test that a finished session is not counted again"""
+        session = self.start()[1]
+        self.save_result(session, score=10, completed=False)
+        self.save_result(session, score=10, completed=False)
+
+        session.refresh_from_db()
+        self.assertEqual(session.status, GameSession.Status.FINISHED)
+        progress = GameProgress.objects.get(child=self.child_user, game=self.game)
+        self.assertEqual(progress.total_sessions, 1)
+
+    def test_heartbeat_and_abandon(self):
+        """Test that the page keeps its session open and closes it on leaving"""
+        session = self.start()[1]
+        GameSession.objects.filter(id=session.id).update(last_seen_at=timezone.now() - timedelta(minutes=5))
+        heartbeat = reverse('games:api_session_heartbeat', args=[session.id])
+
+        self.assertEqual(self.client.post(heartbeat).status_code, 200)
+        session.refresh_from_db()
+        self.assertGreater(session.last_seen_at, timezone.now() - timedelta(minutes=1))
+
+        self.client.login(email='other@test.com', password='testpass123')
+        self.assertFalse(self.client.post(reverse('games:api_session_abandon', args=[session.id])).json()['success'])
+        self.client.login(email='child@test.com', password='testpass123')
+        self.assertTrue(self.client.post(reverse('games:api_session_abandon', args=[session.id])).json()['success'])
+
+        session.refresh_from_db()
+        self.assertEqual(session.status, GameSession.Status.ABANDONED)
+        self.assertIsNotNone(load_board(session.id).finished_at)
+        self.assertEqual(self.flip(session, 0).status_code, 400)
+        self.assertEqual(self.client.post(heartbeat).status_code, 410)
+
+    def test_late_result_for_abandoned_session(self):
+        """Test that a result synced after the session was abandoned is kept, scored by its board"""
+        response, session, board = self.start()
+        first, second = self.pairs(board)[0]
+        self.flip(session, first)
+        self.flip(session, second)
+        self.client.post(reverse('games:api_session_abandon', args=[session.id]))
+        self.save_result(session, score=99999, matches_found=8, total_attempts=8, completed=True)
+
+        session.refresh_from_db()
+        self.assertEqual(session.status, GameSession.Status.FINISHED)
+        self.assertEqual(session.score, 10)
+        self.assertFalse(session.completed)
+        self.assertEqual(LeaderboardEntry.objects.get(child=self.child_user).best_score, 10)
+
+    def test_late_result_without_board_is_refused(self):
+        """Test that an abandoned session whose board expired does not take the client's score"""
+        session = self.start()[1]
+        self.client.post(reverse('games:api_session_abandon', args=[session.id]))
+        cache.clear()
+        self.assertEqual(self.save_result(session, score=99999, completed=True).status_code, 410)
+
+        session.refresh_from_db()
+        self.assertEqual(session.status, GameSession.Status.ABANDONED)
+        self.assertEqual(session.score, 0)
+        self.assertFalse(LeaderboardEntry.objects.exists())
+
+    def test_stale_sessions_are_closed(self):
+        """Test that the sweeper abandons sessions whose heartbeats stopped"""
+        stale = self.start()[1]
+        fresh = self.start()[1]
+        GameSession.objects.filter(id=stale.id).update(last_seen_at=timezone.now() - timedelta(hours=1))
+
+        out = io.StringIO()
+        call_command('close_stale_game_sessions', stdout=out)
+        self.assertIn('Closed 1 stale game sessions', out.getvalue())
+        stale.refresh_from_db()
+        fresh.refresh_from_db()
+        self.assertEqual(stale.status, GameSession.Status.ABANDONED)
+        self.assertEqual(fresh.status, GameSession.Status.ACTIVE)
+        self.assertIsNotNone(load_board(stale.id).finished_at)
+        self.assertEqual(self.flip(stale, 0).status_code, 400)
+        self.assertEqual(self.flip(fresh, 0).status_code, 200)
+
+
+class GameHistoryTest(TestCase):
+    def setUp(self):
+        self.client = Client()
+        self.child_user = User.objects.create_user(
+            email='child@test.com',
+            username='childtest',
+            password='testpass123',
+            role='child'
+        )
+        self.game = Game.objects.create(name='Color Matching Game', slug='color-matching', description='Match colors')
+        started_at = timezone.now() - timedelta(days=1)
+        sessions = GameSession.objects.bulk_create([
+            GameSession(child=self.child_user, game=self.game, level=1, score=i, completed=i % 2 == 0)
+            for i in range(30)
+        ])
+        # Pairs of sessions share a start time so the cursor has to break ties
+        for i, session in enumerate(sessions):
+            GameSession.objects.filter(id=session.id).update(started_at=started_at + timedelta(minutes=i // 2))
+        ColorMatchingSession.objects.bulk_create([
+            ColorMatchingSession(game_session=session, matches_found=3, total_attempts=4, accuracy=75)
+            for session in sessions
+        ])
+        self.client.login(email='child@test.com', password='testpass123')
+
+    def test_history_page(self):
+        """Test that the page shows the first page and totals with a fixed number of queries"""
+        with self.assertNumQueries(4):
+            response = self.client.get(reverse('games:history'))
+
+        self.assertEqual(len(response.context['sessions']), 25)
+        self.assertEqual(response.context['summary']['total'], 30)
+        self.assertEqual(response.context['summary']['completed'], 15)
+        self.assertContains(response, '75%')
+        self.assertIsNotNone(response.context['next_url'])
+
+    def test_feed_walks_every_session_once(self):
+        """Test that following the cursors returns each session exactly once, newest first"""
+        url = reverse('games:api_history') + '?limit=7'
+        seen = []
+        while url:
+            data = self.client.get(url).json()
+            seen += [row['id'] for row in data['sessions']]
+            url = data['next']
+            if url:
+                url += '&limit=7'
+
+        expected = list(GameSession.objects.order_by('-started_at', '-id').values_list('id', flat=True))
+        self.assertEqual(seen, expected)
+
+    def test_feed_filters_and_rejects_bad_cursors(self):
+        """Test the status filter and cursor validation"""
+        data = self.client.get(reverse('games:api_history'), {'status': 'completed', 'limit': 100}).json()
+        self.assertEqual(len(data['sessions']), 15)
+        self.assertTrue(all(row['completed'] for row in data['sessions']))
+        self.assertEqual(data['sessions'][0]['accuracy'], 75)
+
+        self.assertEqual(self.client.get(reverse('games:api_history'), {'cursor': 'not-a-cursor'}).status_code, 400)
+
+
+class LeaderboardTest(TestCase):
+    def setUp(self):
+        self.client = Client()
+        self.game = Game.objects.create(name='Color Matching Game', slug='color-matching', description='Match colors')
+        self.level = ColorMatchingGame.objects.create(
+            level=1,
+            name='Beginner',
+            description='Match the colors',
+            time_limit=60,
+            points_per_match=10,
+            required_matches=4
+        )
+        self.teacher = User.objects.create_user(
+            email='teacher@test.com',
+            username='teachertest',
+            password='testpass123',
+            role='teacher'
+        )
+        classroom = TeacherProfile.objects.create(user=self.teacher)
+        self.children = []
+        for i in range(5):
+            child = User.objects.create_user(
+                email=f'child{i}@test.com',
+                username=f'child{i}',
+                password='testpass123',
+                role='child'
+            )
+            profile = ChildProfile.objects.create(user=child, age=7)
+            if i < 4:
+                classroom.assigned_children.add(profile)
+            self.children.append(child)
+
+    def play(self, child, score, time_taken):
+        session = GameSession.objects.create(child=child, game=self.game, level=1)
+        self.client.force_login(child)
+        self.client.post(
+            reverse('games:save_result'),
+            data=json.dumps({'session_id': session.id, 'score': score, 'time_taken': time_taken, 'completed': True}),
+            content_type='application/json'
+        )
+
+    def test_entries_keep_best_result(self):
+        """Test that an entry keeps the best score, with ties going to the faster time"""
+        child = self.children[0]
+        self.play(child, 30, 40)
+        self.play(child, 20, 10)
+        self.play(child, 30, 25)
+
+        entry = LeaderboardEntry.objects.get(child=child, game=self.game, level=1)
+        self.assertEqual((entry.best_score, entry.best_time, entry.sessions_played), (30, 25, 3))
+
+    def test_top_and_percentile_within_classroom(self):
+        """Test ranking among the teacher's children only"""
+        for child, score in zip(self.children, [20, 40, 30, 10, 90]):
+            self.play(child, score, 30)
+
+        self.client.force_login(self.teacher)
+        data = self.client.get(reverse('games:api_leaderboard', args=['color-matching', 1]), {'child': self.children[2].id}).json()
+        self.assertEqual([row['best_score'] for row in data['top']], [40, 30, 20, 10])
+        self.assertEqual(data['standing'], {'rank': 2, 'percentile': 67, 'total': 4, 'best_score': 30, 'best_time': 30})
+
+        outside = self.client.get(reverse('games:api_leaderboard', args=['color-matching', 1]), {'child': self.children[4].id})
+        self.assertEqual(outside.status_code, 404)
+        response = self.client.get(reverse('games:leaderboard', args=['color-matching', 1]))
+        self.assertEqual(len(response.context['entries']), 4)
+
+    def test_children_cannot_see_leaderboards(self):
+        """Test that leaderboards are limited to teachers and therapists"""
+        self.client.force_login(self.children[0])
+        self.assertEqual(self.client.get(reverse('games:api_leaderboard', args=['color-matching', 1])).status_code, 403)
+
+    def test_rebuild_matches_incremental_entries(self):
+        """Test that rebuilding from sessions gives the same entries"""
+        for child, score in zip(self.children, [20, 40, 30, 10, 90]):
+            self.play(child, score, 30)
+            self.play(child, score + 5, 50)
+        before = list(LeaderboardEntry.objects.order_by('child_id').values_list('child_id', 'best_score', 'best_time', 'sessions_played'))
+
+        out = io.StringIO()
+        call_command('rebuild_leaderboards', stdout=out)
+        after = list(LeaderboardEntry.objects.order_by('child_id').values_list('child_id', 'best_score', 'best_time', 'sessions_played'))
+        self.assertEqual(before, after)
+        self.assertIn('Rebuilt 5 leaderboard entries', out.getvalue())
+
+    def test_failed_rebuild_keeps_entries(self):
+        """Test that a rebuild that fails part way leaves the old entries in place"""
+        self.play(self.children[0], 20, 30)
+        with mock.patch.object(LeaderboardEntry.objects, 'bulk_create', side_effect=IntegrityError):
+            with self.assertRaises(IntegrityError):
+                rebuild()
+        self.assertEqual(LeaderboardEntry.objects.get().best_score, 20)
+
+
+class AdaptiveDifficultyTest(ColorMatchingTestCase):
+    def setUp(self):
+        super().setUp()
+        for level in (2, 3):
+            ColorMatchingGame.objects.create(
+                level=level,
+                name=f'Level {level}',
+                description='Match the colors',
+                time_limit=60,
+                points_per_match=10,
+                required_matches=8
+            )
+
+    def play(self, accuracy, time_taken, completed=True):
+        session = self.start()[1]
+        GameSession.objects.filter(id=session.id).update(score=10, time_taken=time_taken, completed=completed, status=GameSession.Status.FINISHED)
+        ColorMatchingSession.objects.create(game_session=session, matches_found=1, total_attempts=1, accuracy=accuracy)
+        session.refresh_from_db()
+        record_result(session, accuracy)
+        return session
+
+    def test_window_keeps_running_totals(self):
+        """Test that the window drops its oldest result as new ones arrive"""
+        window = Window(size=3)
+        for accuracy in (10, 20, 30, 40):
+            window.push(Result(1, accuracy, 0.5, True))
+
+        self.assertEqual(len(window), 3)
+        self.assertAlmostEqual(window.accuracy, 30)
+        self.assertEqual(window.completion_rate, 1)
+
+    def test_recommends_next_level_when_accurate_and_quick(self):
+        """Test that a child who masters a level is offered the next one"""
+        for _ in range(3):
+            self.play(95, 20)
+
+        response = self.client.get(reverse('games:game_levels', args=['color-matching']))
+        self.assertEqual(response.context['recommended_level'], 2)
+
+    def test_struggling_child_gets_more_time_and_a_smaller_grid(self):
+        """Test that a hard level is tuned down for the child"""
+        for _ in range(3):
+            self.play(30, 60, completed=False)
+
+        response, session, board = self.start()
+        self.assertEqual(session.time_limit, 75)
+        self.assertEqual(session.grid_size, 3)
+        self.assertEqual(board.grid_size, 3)
+        self.assertEqual(len(board.cards), 8)
+        self.assertContains(response, 'timeRemaining: 75')
+        self.assertEqual(recommend_level(self.game, self.child_user, [1, 2, 3]), 1)
+
+    def test_window_is_rebuilt_from_sessions(self):
+        """Test that an evicted window is rebuilt with one query"""
+        for _ in range(3):
+            self.play(95, 20)
+        cache.delete(f'games:adaptive:{self.game.id}:{self.child_user.id}')
+
+        with self.assertNumQueries(1):
+            window = load_window(self.game, self.child_user)
+        self.assertEqual(len(window), 3)
+        self.assertAlmostEqual(window.accuracy, 95)
+        with self.assertNumQueries(0):
+            load_window(self.game, self.child_user)
+
+
+class GameRegistryTest(TestCase):
+    def setUp(self):
+        self.client = Client()
+        self.child_user = User.objects.create_user(
+            email='child@test.com',
+            username='childtest',
+            password='testpass123',
+            role='child'
+        )
+        self.game = Game.objects.create(name='Colour Pairs', slug='color-matching', description='Match colors')
+        self.other = Game.objects.create(name='Shape Sorting', slug='shape-sorting', description='Sort shapes')
+        self.client.login(email='child@test.com', password='testpass123')
+
+    def test_slug_lookup_is_cached(self):
+        """Test that games are found by slug without a query once the map is loaded"""
+        self.assertEqual(game_id('color-matching'), self.game.id)
+        with self.assertNumQueries(0):
+            self.assertEqual(game_id('shape-sorting'), self.other.id)
+
+        renamed = Game.objects.create(name='Memory', slug='memory', description='Remember')
+        self.assertEqual(game_id('memory'), renamed.id)
+
+    def test_games_resolve_by_slug_not_name(self):
+        """Test that a registered game is found whatever it is called"""
+        self.assertIsInstance(type_for(self.game), ColorMatching)
+        self.assertIsNone(type_for(self.other))
+
+        response = self.client.get(reverse('games:dashboard'))
+        self.assertContains(response, reverse('games:game_levels', args=['color-matching']))
+        self.assertEqual(self.client.get(reverse('games:game_levels', args=['color-matching'])).status_code, 200)
+
+    def test_pages_dispatch_on_slug(self):
+        """Test that the level, play and leaderboard pages only serve registered games"""
+        self.assertEqual(reverse('games:game_levels', args=['color-matching']), '/games/color-matching/')
+        self.assertEqual(self.client.get(reverse('games:game_levels', args=['shape-sorting'])).status_code, 404)
+        self.assertEqual(self.client.get(reverse('games:play_game', args=['shape-sorting', 1])).status_code, 404)
+        self.assertEqual(self.client.get(reverse('games:game_levels', args=['unknown'])).status_code, 404)
+
+        self.game.is_active = False
+        self.game.save()
+        self.assertEqual(self.client.get(reverse('games:game_levels', args=['color-matching'])).status_code, 404)
+
+    def test_unregistered_game_results_are_recorded(self):
+        """Test that progress works for games without a registered type"""
+        session = GameSession.objects.create(child=self.child_user, game=self.other, level=1)
+        self.client.post(
+            reverse('games:save_result'),
+            data=json.dumps({'session_id': session.id, 'score': 15, 'time_taken': 20, 'completed': True}),
+            content_type='application/json'
+        )
+
+        session.refresh_from_db()
+        self.assertEqual(session.score, 15)
+        progress = GameProgress.objects.get(child=self.child_user, game=self.other)
+        self.assertEqual((progress.total_score, progress.highest_level_completed), (15, 1))
@@ -5,9 +5,16 @@ app_name = 'games'
 
 urlpatterns = [
     path('', views.games_dashboard, name='dashboard'),
-    path('color-matching/', views.color_matching_levels, name='color_matching_levels'),
-    path('color-matching/level/<int:level>/', views.color_matching_game, name='color_matching_game'),
+    path('api/leaderboard/<slug:game>/<int:level>/', views.api_leaderboard, name='api_leaderboard'),
     path('progress/', views.game_progress, name='progress'),
     path('history/', views.game_history, name='history'),
+    path('api/history/', views.api_game_history, name='api_history'),
     path('api/save-result/', views.save_game_result, name='save_result'),
+    path('api/sessions/<int:session_id>/flip/', views.api_flip_card, name='api_flip_card'),
+    path('api/sessions/<int:session_id>/heartbeat/', views.api_session_heartbeat, name='api_session_heartbeat'),
+    path('api/sessions/<int:session_id>/abandon/', views.api_session_abandon, name='api_session_abandon'),
+    # Registered games by slug; last, so the fixed paths above win
+    path('<slug:game>/', views.game_levels, name='game_levels'),
+    path('<slug:game>/level/<int:level>/', views.play_game, name='play_game'),
+    path('<slug:game>/level/<int:level>/leaderboard/', views.leaderboard, name='leaderboard'),
 ] 
\ No newline at end of file
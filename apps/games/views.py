@@ -1,23 +1,33 @@
 from django.shortcuts import render, get_object_or_404, redirect
 from django.contrib.auth.decorators import login_required
 from django.contrib import messages
-from django.http import JsonResponse
+from django.http import Http404, JsonResponse
+from django.urls import reverse
 from django.views.decorators.csrf import csrf_exempt
 from django.utils import timezone
 from django.db import transaction
 import json
-import random
 from datetime import datetime
+from urllib.parse import urlencode
 
-from .models import (
-    Game, ColorMatchingGame, Color, ColorMatchingLevel,
-    GameSession, ColorMatchingSession, GameProgress
-)
+from .models import Game, GameSession, GameProgress
+from .adaptive import record_result, recommend_level
+from .engine import flip_card, MoveError
+from .history import history_page, history_summary, session_row, InvalidCursor, PAGE_SIZE, STATUS_FILTERS
+from .leaderboard import record_session, scope_children, top, standing, TOP_N
+from .lifecycle import heartbeat, abandon
+from .registry import GameType, LevelUnavailable, ResultUnavailable, type_for, game_type, get_game_or_404
+from .summary import record_progress
+from apps.learning.achievements import handle_event, GAME_LEVEL_COMPLETED
+from apps.sync.idempotency import idempotent
 
 @login_required
 def games_dashboard(request):
     """Display available games"""
-    games = Game.objects.filter(is_active=True)
+    games = list(Game.objects.filter(is_active=True))
+    for game in games:
+        registered = type_for(game)
+        game.levels_url = registered.levels_url() if registered else None
     progress = GameProgress.objects.filter(child=request.user)
     progress_dict = {p.game_id: p for p in progress}
     
@@ -28,11 +38,18 @@ def games_dashboard(request):
     }
     return render(request, 'games/dashboard.html', context)
 
+def _playable_or_404(slug):
+    """The registered type of the game with ``slug`` and its active Game row, if it can be played"""
+    registered = game_type(slug)
+    if registered is None or registered.levels_template is None:
+        raise Http404('No such game')
+    return registered, get_game_or_404(slug)
+
 @login_required
-def color_matching_levels(request):
-    """Display color matching game levels"""
-    game = get_object_or_404(Game, name__icontains='color matching')
-    levels = ColorMatchingGame.objects.filter(is_active=True).order_by('level')
+def game_levels(request, game):
+    """Display a game's levels"""
+    registered, game = _playable_or_404(game)
+    levels = registered.active_levels()
     
     # Get user's progress for this game
     progress, created = GameProgress.objects.get_or_create(
@@ -44,149 +61,119 @@ def color_matching_levels(request):
     context = {
         'game': game,
         'levels': levels,
+        'can_view_leaderboards': scope_children(request.user) is not None,
+        'recommended_level': recommend_level(game, request.user, [level.level for level in levels]),
         'progress': progress,
     }
-    return render(request, 'games/color_matching_levels.html', context)
+    return render(request, registered.levels_template, context)
 
 @login_required
-def color_matching_game(request, level):
-    """Play color matching game for specific level"""
-    game = get_object_or_404(Game, name__icontains='color matching')
-    level_obj = get_object_or_404(ColorMatchingGame, level=level, is_active=True)
-    level_config = get_object_or_404(ColorMatchingLevel, game=level_obj)
-    
-    # Get colors for this level
-    colors = list(level_config.colors.all())
-    
-    if not colors:
-        return JsonResponse({'error': 'No colors configured for this level'}, status=400)
+def play_game(request, game, level):
+    """Play a level of a game in a new session"""
+    registered, game = _playable_or_404(game)
+    try:
+        context = registered.start(request.user, game, level)
+    except LevelUnavailable as e:
+        return JsonResponse({'error': str(e)}, status=400)
     
-    # Create game session
-    session, created = GameSession.objects.get_or_create(
-        child=request.user,
-        game=game,
-        level=level,
-        defaults={'started_at': timezone.now()}
-    )
-    
-    # Prepare game data
-    grid_size = level_config.grid_size
-    num_colors_needed = (grid_size * grid_size) // 2
-    
-    # Select colors for this game
-    game_colors = random.sample(colors, min(num_colors_needed, len(colors)))
-    
-    # Create pairs of cards
-    cards = []
-    for color in game_colors:
-        cards.extend([color] * 2)  # Each color appears twice
+    context['game'] = game
+    return render(request, registered.play_template, context)
+
+def record_game_result(child, data):
+    """Apply a finished game's results to its session and the child's progress.
     
-    # Shuffle cards
-    random.shuffle(cards)
+    The game's registered type decides the final result (color matching
+    boards replace what the client reported) and stores its details.
+    A session's result is recorded once; repeating it returns the session
+    unchanged. Abandoned sessions still take a result that arrives late.
+    Raises GameSession.DoesNotExist if the session is not the child's, and
+    ResultUnavailable if its result can no longer be checked.
+    """
+    with transaction.atomic():
+        # Update game session
+        session = GameSession.objects.select_for_update().select_related('game').get(
+            id=data.get('session_id'),
+            child=child
+        )
+        if session.status == GameSession.Status.FINISHED:
+            return session
+        registered = type_for(session.game) or GameType()
+        data = registered.final_result(session, data)
+        score = data.get('score', 0)
+        completed = data.get('completed', False)
+        
+        session.score = score
+        session.time_taken = data.get('time_taken', 0)
+        session.completed = completed
+        session.status = GameSession.Status.FINISHED
+        if completed:
+            session.completed_at = timezone.now()
+        session.save()
+        record_session(session)
+        accuracy = registered.record_details(session, data)
+        
+        record_progress(session, accuracy)
     
-    # Arrange cards in grid
-    grid = []
-    for i in range(grid_size):
-        row = []
-        for j in range(grid_size):
-            card_index = i * grid_size + j
-            if card_index < len(cards):
-                row.append({
-                    'id': card_index,
-                    'color': cards[card_index].hex_code,
-                    'name': cards[card_index].name,
-                    'row': i,
-                    'col': j
-                })
-        grid.append(row)
+    registered.finished(session)
+    record_result(session, accuracy)
+    if completed:
+        handle_event(child.id, GAME_LEVEL_COMPLETED, value=session.level, scope=session.game.slug)
+    return session
+
+@csrf_exempt
+@login_required
+def api_flip_card(request, session_id):
+    """Flip one card of a color matching board and report what it shows"""
+    if request.method != 'POST':
+        return JsonResponse({'error': 'POST required'}, status=405)
+    try:
+        position = json.loads(request.body).get('position')
+    except (ValueError, AttributeError):
+        return JsonResponse({'error': 'Invalid JSON'}, status=400)
     
-    context = {
-        'game': game,
-        'level': level_obj,
-        'session': session,
-        'grid': grid,
-        'grid_size': grid_size,
-        'time_limit': level_obj.time_limit,
-        'required_matches': level_obj.required_matches,
-        'colors': game_colors,
-    }
-    return render(request, 'games/color_matching.html', context)
+    try:
+        move = flip_card(session_id, request.user.id, position)
+    except LookupError:
+        return JsonResponse({'error': 'This game has expired, please start the level again'}, status=410)
+    except MoveError as e:
+        return JsonResponse({'error': str(e)}, status=400)
+    return JsonResponse(move)
 
 @csrf_exempt
 @login_required
+def api_session_heartbeat(request, session_id):
+    """Keep a game session open while its page is showing"""
+    if request.method != 'POST':
+        return JsonResponse({'error': 'POST required'}, status=405)
+    if not heartbeat(session_id, request.user.id):
+        return JsonResponse({'error': 'This game session is no longer active'}, status=410)
+    return JsonResponse({'success': True})
+
+@csrf_exempt
+@login_required
+def api_session_abandon(request, session_id):
+    """End a game session that was left before it finished"""
+    if request.method != 'POST':
+        return JsonResponse({'error': 'POST required'}, status=405)
+    return JsonResponse({'success': abandon(session_id, request.user.id)})
+
+@csrf_exempt
+@login_required
+@idempotent
 def save_game_result(request):
     """Save game session results via AJAX"""
     if request.method == 'POST':
         try:
             data = json.loads(request.body)
-            session_id = data.get('session_id')
-            score = data.get('score', 0)
-            time_taken = data.get('time_taken', 0)
-            matches_found = data.get('matches_found', 0)
-            total_attempts = data.get('total_attempts', 0)
-            completed = data.get('completed', False)
-            
-            with transaction.atomic():
-                # Update game session
-                session = GameSession.objects.get(id=session_id, child=request.user)
-                session.score = score
-                session.time_taken = time_taken
-                session.completed = completed
-                if completed:
-                    session.completed_at = timezone.now()
-                session.save()
-                
-                # Create or update color matching session data
-                color_session, created = ColorMatchingSession.objects.get_or_create(
-                    game_session=session,
-                    defaults={
-                        'matches_found': matches_found,
-                        'total_attempts': total_attempts,
-                        'accuracy': (matches_found / total_attempts * 100) if total_attempts > 0 else 0
-                    }
-                )
-                
-                if not created:
-                    color_session.matches_found = matches_found
-                    color_session.total_attempts = total_attempts
-                    color_session.accuracy = (matches_found / total_attempts * 100) if total_attempts > 0 else 0
-                    color_session.save()
-                
-                # Update game progress
-                progress, created = GameProgress.objects.get_or_create(
-                    child=request.user,
-                    game=session.game,
-                    defaults={
-                        'highest_level_completed': session.level if completed else 0,
-                        'total_score': score,
-                        'total_sessions': 1,
-                        'average_accuracy': color_session.accuracy,
-                        'last_played': timezone.now()
-                    }
-                )
-                
-                if not created:
-                    progress.total_score += score
-                    progress.total_sessions += 1
-                    if completed and session.level > progress.highest_level_completed:
-                        progress.highest_level_completed = session.level
-                    
-                    # Update average accuracy
-                    all_sessions = ColorMatchingSession.objects.filter(
-                        game_session__child=request.user,
-                        game_session__game=session.game
-                    )
-                    total_accuracy = sum(s.accuracy for s in all_sessions)
-                    progress.average_accuracy = total_accuracy / all_sessions.count()
-                    
-                    progress.last_played = timezone.now()
-                    progress.save()
+            record_game_result(request.user, data)
             
             return JsonResponse({
                 'success': True,
                 'message': 'Game result saved successfully'
             })
             
+        except ResultUnavailable as e:
+            return JsonResponse({'success': False, 'error': str(e)}, status=410)
         except Exception as e:
             return JsonResponse({
                 'success': False,
@@ -195,6 +182,75 @@ def save_game_result(request):
     
     return JsonResponse({'error': 'Invalid request method'}, status=405)
 
+def _leaderboard_scope(user, slug, level):
+    """The game, its levels, the level and the children ``user`` may rank, or None if they may not see leaderboards"""
+    children = scope_children(user)
+    if children is None:
+        return None
+    registered, game = _playable_or_404(slug)
+    levels = list(registered.active_levels())
+    level_obj = next((row for row in levels if row.level == level), None)
+    if level_obj is None:
+        raise Http404('No such level')
+    return game, levels, level_obj, children
+
+@login_required
+def leaderboard(request, game, level):
+    """Best results on a level within the user's classroom or caseload"""
+    scope = _leaderboard_scope(request.user, game, level)
+    if scope is None:
+        messages.error(request, "Leaderboards are only available to teachers and therapists.")
+        return redirect('games:dashboard')
+    game, levels, level_obj, children = scope
+    
+    context = {
+        'game': game,
+        'level': level_obj,
+        'levels': levels,
+        'entries': top(game, level, children),
+    }
+    return render(request, 'games/leaderboard.html', context)
+
+@login_required
+def api_leaderboard(request, game, level):
+    """Top entries for a level, and a child's rank and percentile when ``child`` is given"""
+    scope = _leaderboard_scope(request.user, game, level)
+    if scope is None:
+        return JsonResponse({'error': 'Leaderboards are only available to teachers and therapists'}, status=403)
+    game, levels, level_obj, children = scope
+    try:
+        limit = int(request.GET.get('limit', TOP_N))
+        child_id = int(request.GET['child']) if request.GET.get('child') else None
+    except ValueError:
+        return JsonResponse({'error': 'Invalid limit or child'}, status=400)
+    
+    data = {
+        'level': level,
+        'top': [
+            {
+                'rank': rank,
+                'child_id': entry.child_id,
+                'child': entry.child.get_full_name() or entry.child.username,
+                'best_score': entry.best_score,
+                'best_time': entry.best_time,
+                'sessions_played': entry.sessions_played,
+            }
+            for rank, entry in enumerate(top(game, level, children, limit), start=1)
+        ],
+    }
+    if child_id is not None:
+        if not children.filter(user_id=child_id).exists():
+            return JsonResponse({'error': 'Child not found'}, status=404)
+        result = standing(game, level, child_id, children)
+        data['standing'] = result and {
+            'rank': result.rank,
+            'percentile': result.percentile,
+            'total': result.total,
+            'best_score': result.entry.best_score,
+            'best_time': result.entry.best_time,
+        }
+    return JsonResponse(data)
+
 @login_required
 def game_progress(request):
     """Display user's game progress"""
@@ -208,9 +264,43 @@ def game_progress(request):
 @login_required
 def game_history(request):
     """Display user's game session history"""
-    sessions = GameSession.objects.filter(child=request.user).order_by('-started_at')
+    status = request.GET.get('status')
+    if status not in STATUS_FILTERS:
+        status = None
+    try:
+        page = history_page(request.user, request.GET.get('cursor'), status)
+    except InvalidCursor:
+        page = history_page(request.user, None, status)
     
     context = {
-        'sessions': sessions,
+        'sessions': page.sessions,
+        'summary': history_summary(request.user),
+        'status': status or 'all',
+        'next_url': _history_feed_url(page.next_cursor, status),
     }
     return render(request, 'games/history.html', context)
+
+def _history_feed_url(cursor, status):
+    if cursor is None:
+        return None
+    params = {'cursor': cursor}
+    if status:
+        params['status'] = status
+    return f"{reverse('games:api_history')}?{urlencode(params)}"
+
+@login_required
+def api_game_history(request):
+    """Next page of the user's game history for infinite scroll"""
+    status = request.GET.get('status')
+    if status not in STATUS_FILTERS:
+        status = None
+    try:
+        page_size = int(request.GET.get('limit', PAGE_SIZE))
+        page = history_page(request.user, request.GET.get('cursor'), status, page_size)
+    except (ValueError, InvalidCursor):
+        return JsonResponse({'error': 'Invalid cursor or limit'}, status=400)
+    
+    return JsonResponse({
+        'sessions': [session_row(session) for session in page.sessions],
+        'next': _history_feed_url(page.next_cursor, status),
+    })
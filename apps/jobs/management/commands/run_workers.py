@@ -0,0 +1,140 @@
+from datetime import timedelta
+import logging
+import multiprocessing
+import signal
+import threading
+
+from django.core.management.base import BaseCommand
+from django.db import OperationalError, connection, connections
+from apps.jobs.tasks import schedule_periodic
+from apps.jobs.worker import LEASE, work, worker_name
+
+logger = logging.getLogger(__name__)
+
+SCHEDULE_INTERVAL = 60
+
+
+def _thread_worker(index, stop, options):
+    try:
+        work(worker_name(index), stop, **options)
+    finally:
+        connection.close()
+
+
+def _scheduler(stop, interval):
+    try:
+        while not stop.wait(interval):
+            try:
+                schedule_periodic()
+            except OperationalError:
+                logger.warning('Could not schedule periodic jobs, retrying', exc_info=True)
+    finally:
+        connection.close()
+
+
+def _process_worker(index, stop, options):
+    # Ctrl-C reaches the whole process group; only the command's stop event ends a worker,
+    # so a running task is never interrupted half way
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    # Forked from the command, so the parent's connections must not be reused
+    connections.close_all()
+    _thread_worker(index, stop, options)
+
+
+class Command(BaseCommand):
+    help = 'Run background jobs from the database job queue'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--workers',
+            type=int,
+            default=2,
+            help='Number of jobs to run at the same time'
+        )
+        parser.add_argument(
+            '--processes',
+            action='store_true',
+            help='Run workers as processes instead of threads, for CPU-bound tasks'
+        )
+        parser.add_argument(
+            '--once',
+            action='store_true',
+            help='Exit when no job is ready instead of waiting for more'
+        )
+        parser.add_argument(
+            '--poll-interval',
+            type=float,
+            default=1.0,
+            help='Seconds to wait before looking for jobs again when none is ready'
+        )
+        parser.add_argument(
+            '--lease',
+            type=int,
+            default=int(LEASE.total_seconds()),
+            help='Seconds a job may run before other workers may take it over'
+        )
+        parser.add_argument(
+            '--schedule',
+            action='store_true',
+            help='Also queue periodic tasks when they are due; run one scheduling command at a time'
+        )
+
+    def handle(self, *args, **options):
+        worker_options = {
+            'once': options['once'],
+            'poll_interval': options['poll_interval'],
+            'lease': timedelta(seconds=options['lease']),
+        }
+        workers = max(1, options['workers'])
+        if options['processes']:
+            context = multiprocessing.get_context('fork')
+            stop = context.Event()
+        else:
+            stop = threading.Event()
+
+        def request_stop(signum, frame):
+            # A second Ctrl-C is handled as usual
+            signal.signal(signal.SIGINT, previous)
+            self.stdout.write('Stopping workers after their current job...')
+            stop.set()
+
+        scheduler = None
+
+        def start_scheduler():
+            nonlocal scheduler
+            if options['schedule'] and not options['once']:
+                scheduler = threading.Thread(target=_scheduler, args=(stop, SCHEDULE_INTERVAL))
+                scheduler.start()
+
+        if options['schedule']:
+            queued = schedule_periodic()
+            self.stdout.write(f'Scheduled {len(queued)} periodic jobs')
+
+        previous = signal.signal(signal.SIGINT, request_stop)
+        try:
+            if workers == 1 and not options['processes']:
+                start_scheduler()
+                ran = work(worker_name(), stop, **worker_options)
+                self.stdout.write(self.style.SUCCESS(f'Ran {ran} jobs'))
+                return
+
+            if options['processes']:
+                connections.close_all()
+                pool = [context.Process(target=_process_worker, args=(index, stop, worker_options)) for index in range(workers)]
+            else:
+                pool = [threading.Thread(target=_thread_worker, args=(index, stop, worker_options)) for index in range(workers)]
+
+            kind = 'processes' if options['processes'] else 'threads'
+            self.stdout.write(f'Starting {workers} worker {kind}')
+            for worker in pool:
+                worker.start()
+            # Started after forking, so no process inherits the scheduler's connection
+            start_scheduler()
+            for worker in pool:
+                worker.join()
+        finally:
+            signal.signal(signal.SIGINT, previous)
+            if scheduler is not None:
+                stop.set()
+                scheduler.join()
+        self.stdout.write(self.style.SUCCESS('Workers stopped'))
@@ -0,0 +1,69 @@
+"""
+Background tasks.
+
+A task is a function registered under a name with ``@task``; apps keep theirs
+in a ``jobs.py`` module, which is imported when the app registry is ready.
+``enqueue`` stores a ``Job`` row for a task and returns at once; the work
+runs later in a ``run_workers`` process. Payloads are JSON and are passed to
+the task as keyword arguments.
+
+A task registered with ``every`` is periodic: ``schedule_periodic``, which
+``run_workers --schedule`` calls in a loop, queues its next run whenever none
+is queued or running, due ``every`` after the previous run was due.
+"""
+from datetime import timedelta
+
+from django.db.models import Max
+from django.utils import timezone
+
+from .models import Job
+
+MAX_ATTEMPTS = 3
+
+TASKS = {}
+SCHEDULE = {}
+
+
+def task(name, every=None):
+    """Register the decorated function as the task ``name``, run every ``every`` if given"""
+    def register(function):
+        TASKS[name] = function
+        if every is not None:
+            SCHEDULE[name] = every
+        return function
+    return register
+
+
+def enqueue(name, payload=None, priority=0, delay=None, max_attempts=MAX_ATTEMPTS):
+    """Queue a run of the task ``name``; ``delay`` is a timedelta or seconds"""
+    if name not in TASKS:
+        raise ValueError(f'No task registered as {name!r}')
+    if delay is not None and not isinstance(delay, timedelta):
+        delay = timedelta(seconds=delay)
+    return Job.objects.create(
+        name=name,
+        payload=payload or {},
+        priority=priority,
+        run_at=timezone.now() + delay if delay else timezone.now(),
+        max_attempts=max_attempts
+    )
+
+
+def schedule_periodic():
+    """Queue the next run of each periodic task that has no run queued or running; returns the jobs queued"""
+    pending = set(Job.objects.filter(
+        name__in=list(SCHEDULE),
+        status__in=[Job.Status.QUEUED, Job.Status.RUNNING]
+    ).values_list('name', flat=True))
+    last_runs = dict(Job.objects.filter(name__in=list(SCHEDULE)).values('name').annotate(
+        last_run=Max('run_at')
+    ).values_list('name', 'last_run').order_by())
+    now = timezone.now()
+    jobs = []
+    for name, every in SCHEDULE.items():
+        if name in pending:
+            continue
+        last_run = last_runs.get(name)
+        delay = max(last_run + every - now, timedelta(0)) if last_run else None
+        jobs.append(enqueue(name, delay=delay))
+    return jobs
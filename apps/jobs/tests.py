@@ -0,0 +1,228 @@
+from django.test import TestCase
+from django.core.management import call_command
+from django.utils import timezone
+from unittest import mock
+from django.db import OperationalError
+from django.db.models.query import QuerySet
+from .models import Job
+from .tasks import SCHEDULE, TASKS, enqueue, schedule_periodic
+from .worker import claim, renew_lease, run_job, work
+from apps.games.models import Game, GameSession
+from django.contrib.auth import get_user_model
+from datetime import timedelta
+import io
+import os
+import signal
+import threading
+import time
+
+User = get_user_model()
+
+
+class JobQueueTest(TestCase):
+    def setUp(self):
+        self.calls = []
+
+        def record(**payload):
+            self.calls.append(payload)
+
+        def fail(**payload):
+            raise ValueError('broken')
+
+        patcher = mock.patch.dict(TASKS, {'tests.record': record, 'tests.fail': fail})
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_enqueue_rejects_unknown_task(self):
+        with self.assertRaises(ValueError):
+            enqueue('tests.missing')
+        self.assertFalse(Job.objects.exists())
+
+    def test_claim_takes_highest_priority_ready_job(self):
+        low = enqueue('tests.record', {'n': 1})
+        high = enqueue('tests.record', {'n': 2}, priority=5)
+        enqueue('tests.record', {'n': 3}, priority=10, delay=60)
+
+        job = claim('worker-a')
+        self.assertEqual(job.id, high.id)
+        self.assertEqual(job.status, Job.Status.RUNNING)
+        self.assertEqual(job.locked_by, 'worker-a')
+        self.assertEqual(job.attempts, 1)
+        self.assertGreater(job.locked_until, timezone.now())
+
+        # A leased job is not handed to another worker
+        self.assertEqual(claim('worker-b').id, low.id)
+        self.assertIsNone(claim('worker-c'))
+
+    def test_conditional_claim_skips_job_taken_by_another_worker(self):
+        first = enqueue('tests.record', {'n': 1}, priority=1)
+        second = enqueue('tests.record', {'n': 2})
+        original_filter = Job.objects.filter
+
+        def lose_first_race(*args, **kwargs):
+            # Another worker leases the first candidate between the read and the update
+            if kwargs.get('id') == first.id and 'status' in kwargs:
+                original_filter(id=first.id).update(status=Job.Status.RUNNING, locked_by='other',
+                                                    locked_until=timezone.now() + timedelta(minutes=5))
+            return original_filter(*args, **kwargs)
+
+        with mock.patch.object(Job.objects, 'filter', side_effect=lose_first_race):
+            job = claim('worker-a')
+        self.assertEqual(job.id, second.id)
+        self.assertEqual(Job.objects.get(id=first.id).locked_by, 'other')
+
+    def test_expired_lease_is_claimed_again(self):
+        job = enqueue('tests.record')
+        claim('lost-worker', lease=timedelta(seconds=-1))
+
+        job = claim('worker-b')
+        self.assertEqual(job.locked_by, 'worker-b')
+        self.assertEqual(job.attempts, 2)
+
+    def test_run_job_marks_done(self):
+        enqueue('tests.record', {'n': 1})
+        self.assertTrue(run_job(claim('worker-a')))
+
+        job = Job.objects.get()
+        self.assertEqual(self.calls, [{'n': 1}])
+        self.assertEqual(job.status, Job.Status.DONE)
+        self.assertEqual(job.locked_by, '')
+        self.assertIsNotNone(job.finished_at)
+
+    def test_failed_job_is_retried_with_backoff_then_fails(self):
+        enqueue('tests.fail', max_attempts=2)
+
+        with self.assertLogs('apps.jobs.worker', 'ERROR'):
+            self.assertFalse(run_job(claim('worker-a')))
+        job = Job.objects.get()
+        self.assertEqual(job.status, Job.Status.QUEUED)
+        self.assertGreater(job.run_at, timezone.now())
+        self.assertIn('broken', job.last_error)
+        self.assertIsNone(claim('worker-a'))
+
+        Job.objects.update(run_at=timezone.now())
+        with self.assertLogs('apps.jobs.worker', 'ERROR'):
+            run_job(claim('worker-a'))
+        job = Job.objects.get()
+        self.assertEqual(job.status, Job.Status.FAILED)
+        self.assertEqual(job.attempts, 2)
+        self.assertIsNotNone(job.finished_at)
+
+    def test_unregistered_task_fails_without_retry(self):
+        Job.objects.create(name='tests.removed')
+
+        with self.assertLogs('apps.jobs.worker', 'ERROR'):
+            run_job(claim('worker-a'))
+        job = Job.objects.get()
+        self.assertEqual(job.status, Job.Status.FAILED)
+        self.assertIn('tests.removed', job.last_error)
+
+    def test_run_workers_command(self):
+        for n in range(3):
+            enqueue('tests.record', {'n': n})
+        out = io.StringIO()
+        call_command('run_workers', workers=1, once=True, stdout=out)
+
+        self.assertIn('Ran 3 jobs', out.getvalue())
+        self.assertEqual(sorted(call['n'] for call in self.calls), [0, 1, 2])
+        self.assertFalse(Job.objects.exclude(status=Job.Status.DONE).exists())
+
+    def test_periodic_task_is_queued_when_none_is_pending(self):
+        with mock.patch.dict(SCHEDULE, {'tests.record': timedelta(hours=1)}, clear=True):
+            job = schedule_periodic()[0]
+            self.assertEqual(schedule_periodic(), [])
+            self.assertLessEqual(job.run_at, timezone.now())
+
+            run_job(claim('worker-a'))
+            following = schedule_periodic()[0]
+            self.assertAlmostEqual(following.run_at, job.run_at + timedelta(hours=1), delta=timedelta(seconds=1))
+            self.assertIsNone(claim('worker-a'))
+
+    def test_run_workers_schedules_periodic_tasks(self):
+        out = io.StringIO()
+        with mock.patch.dict(SCHEDULE, {'tests.record': timedelta(hours=1)}, clear=True):
+            call_command('run_workers', workers=1, once=True, schedule=True, stdout=out)
+
+        self.assertIn('Scheduled 1 periodic jobs', out.getvalue())
+        self.assertIn('Ran 1 jobs', out.getvalue())
+        self.assertEqual(self.calls, [{}])
+
+    def test_lease_is_renewed(self):
+        """Test that a running job's lease is extended only while its worker holds it"""
+        enqueue('tests.record')
+        job = claim('worker-a', lease=timedelta(seconds=30))
+
+        self.assertTrue(renew_lease(job, timedelta(minutes=10)))
+        self.assertGreater(Job.objects.get().locked_until, timezone.now() + timedelta(minutes=9))
+
+        Job.objects.update(locked_by='worker-b')
+        self.assertFalse(renew_lease(job))
+
+    def test_long_task_keeps_its_lease(self):
+        """Test that the lease is renewed in the background while a task runs"""
+        TASKS['tests.slow'] = lambda: time.sleep(1.5)
+        enqueue('tests.slow')
+        job = claim('worker-a', lease=timedelta(seconds=3))
+
+        with mock.patch('apps.jobs.worker.renew_lease') as renew:
+            self.assertTrue(run_job(job, lease=timedelta(seconds=3)))
+        renew.assert_called_with(job, timedelta(seconds=3))
+        self.assertEqual(Job.objects.get().status, Job.Status.DONE)
+
+    def test_locked_database_is_retried(self):
+        """Test that status writes wait out a locked database"""
+        enqueue('tests.record')
+        job = claim('worker-a')
+        update = QuerySet.update
+        failures = [OperationalError('database is locked')] * 2
+
+        def flaky_update(queryset, **fields):
+            if failures:
+                raise failures.pop()
+            return update(queryset, **fields)
+
+        with mock.patch('django.db.models.query.QuerySet.update', flaky_update), \
+                mock.patch('apps.jobs.worker.time.sleep'), self.assertLogs('apps.jobs.worker', 'WARNING'):
+            self.assertTrue(run_job(job))
+        self.assertEqual(Job.objects.get().status, Job.Status.DONE)
+
+    def test_worker_survives_database_errors(self):
+        """Test that a failed status write does not end the worker"""
+        for n in range(2):
+            enqueue('tests.record', {'n': n})
+
+        with mock.patch('apps.jobs.worker.run_job', side_effect=[OperationalError('database is locked'), True]), \
+                self.assertLogs('apps.jobs.worker', 'ERROR'):
+            self.assertEqual(work('worker-a', threading.Event(), once=True), 2)
+
+    def test_interrupt_finishes_current_job(self):
+        """Test that Ctrl-C stops the worker after its job instead of interrupting it"""
+        def interrupted(n):
+            os.kill(os.getpid(), signal.SIGINT)
+            self.calls.append({'n': n})
+
+        TASKS['tests.interrupted'] = interrupted
+        enqueue('tests.interrupted', {'n': 1}, priority=1)
+        enqueue('tests.record', {'n': 2})
+        handler = signal.getsignal(signal.SIGINT)
+        out = io.StringIO()
+        call_command('run_workers', workers=1, once=True, stdout=out)
+
+        self.assertIn('Ran 1 jobs', out.getvalue())
+        self.assertEqual(self.calls, [{'n': 1}])
+        self.assertEqual(sorted(Job.objects.values_list('status', flat=True)), [Job.Status.DONE, Job.Status.QUEUED])
+        self.assertIs(signal.getsignal(signal.SIGINT), handler)
+
+    def test_app_tasks_are_discovered(self):
+        child = User.objects.create_user(username='child', email='child@test.com', password='testpass123', role='child')
+        game = Game.objects.create(name='Color Matching', slug='color-matching')
+        session = GameSession.objects.create(child=child, game=game, level=1)
+        GameSession.objects.filter(id=session.id).update(last_seen_at=timezone.now() - timedelta(hours=1))
+
+        enqueue('games.close_stale_sessions')
+        run_job(claim('worker-a'))
+
+        self.assertEqual(Job.objects.get().status, Job.Status.DONE)
+        self.assertEqual(GameSession.objects.get(id=session.id).status, GameSession.Status.ABANDONED)
+        self.assertIn('sync.prune_client_events', TASKS)
+        self.assertTrue({'games.rebuild_leaderboards', 'games.close_stale_sessions', 'sync.prune_client_events'} <= set(SCHEDULE))
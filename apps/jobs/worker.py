@@ -0,0 +1,201 @@
+"""
+Claiming and running jobs.
+
+A worker claims one job at a time by leasing it: the job is marked running
+with the worker's name and a ``locked_until`` time. A job whose lease has
+run out (its worker died or hung) is ready again and counts the lost run as
+an attempt. While a task runs, its lease is renewed every third of the lease,
+so a long task is never handed to a second worker.
+
+On databases with ``SELECT ... FOR UPDATE SKIP LOCKED`` (PostgreSQL, MySQL 8)
+concurrent workers lock different ready rows and never wait on each other.
+SQLite has no row locks, so there a worker reads a few ready jobs and claims
+one with a conditional UPDATE that only matches while the job is still in the
+state it read; a worker that loses the race moves on to the next candidate.
+
+Failed runs are retried with exponential backoff and jitter until the job
+runs out of attempts. SQLite answers "database is locked" while another
+worker writes, so status writes are retried briefly before giving up.
+"""
+from contextlib import contextmanager
+from datetime import timedelta
+import logging
+import os
+import random
+import socket
+import threading
+import time
+import traceback
+
+from django.db import OperationalError, connection, transaction
+from django.db.models import F, Q
+from django.utils import timezone
+
+from .models import Job
+from .tasks import TASKS
+
+logger = logging.getLogger(__name__)
+
+LEASE = timedelta(minutes=5)
+CLAIM_CANDIDATES = 5
+BACKOFF_BASE = 10
+BACKOFF_MAX = 60 * 60
+WRITE_RETRIES = 5
+WRITE_RETRY_DELAY = 0.2
+
+
+def worker_name(index=0):
+    return f'{socket.gethostname()}:{os.getpid()}:{index}'
+
+
+def backoff(attempts):
+    """Delay before retrying a job that has failed ``attempts`` times"""
+    seconds = min(BACKOFF_BASE * 2 ** (attempts - 1), BACKOFF_MAX)
+    return timedelta(seconds=seconds * random.uniform(0.5, 1))
+
+
+def _ready(now):
+    return Job.objects.filter(
+        Q(status=Job.Status.QUEUED, run_at__lte=now) |
+        Q(status=Job.Status.RUNNING, locked_until__lt=now)
+    ).order_by('-priority', 'run_at', 'id')
+
+
+def _lease(worker, now, lease):
+    return {
+        'status': Job.Status.RUNNING,
+        'locked_by': worker,
+        'locked_until': now + lease,
+        'attempts': F('attempts') + 1,
+    }
+
+
+def claim(worker, lease=LEASE):
+    """Lease the next ready job to ``worker``; None if there is nothing to run"""
+    now = timezone.now()
+    if connection.features.has_select_for_update_skip_locked:
+        with transaction.atomic():
+            job_id = _ready(now).select_for_update(skip_locked=True).values_list('id', flat=True).first()
+            if job_id is None:
+                return None
+            Job.objects.filter(id=job_id).update(**_lease(worker, now, lease))
+        return Job.objects.get(id=job_id)
+
+    candidates = _ready(now).values_list('id', 'status', 'locked_until')[:CLAIM_CANDIDATES]
+    for job_id, status, locked_until in candidates:
+        claimed = Job.objects.filter(
+            id=job_id,
+            status=status,
+            locked_until=locked_until
+        ).update(**_lease(worker, now, lease))
+        if claimed:
+            return Job.objects.get(id=job_id)
+    return None
+
+
+def _write(queryset, **fields):
+    """Update ``queryset``, waiting out a locked database a few times before raising"""
+    for attempt in range(WRITE_RETRIES):
+        try:
+            return queryset.update(**fields)
+        except OperationalError:
+            if attempt == WRITE_RETRIES - 1:
+                raise
+            logger.warning('Could not update a job, retrying', exc_info=True)
+            time.sleep(WRITE_RETRY_DELAY * 2 ** attempt)
+
+
+def renew_lease(job, lease=LEASE):
+    """Extend the lease of a running job; False if its worker no longer holds it"""
+    mine = Job.objects.filter(id=job.id, status=Job.Status.RUNNING, locked_by=job.locked_by)
+    return _write(mine, locked_until=timezone.now() + lease) == 1
+
+
+@contextmanager
+def _leased(job, lease):
+    """Keep renewing the job's lease from a background thread until the block ends"""
+    done = threading.Event()
+    interval = max(lease.total_seconds() / 3, 1)
+
+    def keep():
+        try:
+            while not done.wait(interval):
+                try:
+                    renew_lease(job, lease)
+                except OperationalError:
+                    logger.warning('Could not renew the lease of job %s', job.id, exc_info=True)
+        finally:
+            connection.close()
+
+    keeper = threading.Thread(target=keep, name=f'lease-{job.id}', daemon=True)
+    keeper.start()
+    try:
+        yield
+    finally:
+        done.set()
+        keeper.join()
+
+
+def run_job(job, lease=LEASE):
+    """Run a claimed job and record how it went; returns True if it succeeded"""
+    mine = Job.objects.filter(id=job.id, locked_by=job.locked_by)
+    handler = TASKS.get(job.name)
+    try:
+        if handler is None:
+            raise LookupError(f'No task registered as {job.name!r}')
+        if job.attempts > job.max_attempts:
+            raise RuntimeError('The job ran out of attempts while its worker was lost')
+        with _leased(job, lease):
+            handler(**job.payload)
+    except Exception:
+        logger.exception('Job %s (%s) failed on attempt %s', job.id, job.name, job.attempts)
+        now = timezone.now()
+        retry = handler is not None and job.attempts < job.max_attempts
+        _write(
+            mine,
+            status=Job.Status.QUEUED if retry else Job.Status.FAILED,
+            run_at=now + backoff(job.attempts) if retry else job.run_at,
+            locked_by='',
+            locked_until=None,
+            last_error=traceback.format_exc(),
+            finished_at=None if retry else now
+        )
+        return False
+
+    _write(
+        mine,
+        status=Job.Status.DONE,
+        locked_by='',
+        locked_until=None,
+        last_error='',
+        finished_at=timezone.now()
+    )
+    return True
+
+
+def work(worker, stop, once=False, poll_interval=1.0, lease=LEASE):
+    """Run jobs until ``stop`` is set; with ``once``, until no job is ready.
+
+    Returns the number of jobs run.
+    """
+    ran = 0
+    while not stop.is_set():
+        try:
+            job = claim(worker, lease)
+        except OperationalError:
+            # SQLite reports "database is locked" while another worker writes
+            logger.warning('Could not claim a job, retrying', exc_info=True)
+            stop.wait(poll_interval)
+            continue
+        if job is None:
+            if once:
+                break
+            stop.wait(poll_interval)
+            continue
+        try:
+            run_job(job, lease)
+        except OperationalError:
+            # The job stays running and is retried once its lease runs out
+            logger.exception('Could not record the outcome of job %s', job.id)
+        ran += 1
+    return ran
@@ -0,0 +1,161 @@
+"""
+Achievement rules.
+
+Rules are declared in ``RULES`` and indexed by the event type they listen to,
+so an incoming event only looks at its own handful of rules. Each event
+carries (or lazily computes) the single number its rules compare with their
+threshold, such as the child's completed-letter count or the streak a
+routine has just reached. Awards are inserted with ``ignore_conflicts``
+against the (child, code) unique constraint, so repeated or concurrent
+events never award twice.
+"""
+from collections import namedtuple, defaultdict
+from datetime import timedelta
+
+from django.db.models import Count
+
+from .models import Achievement, ChildLetterProgress, ChildNumberProgress, ChildWordProgress
+
+AchievementRule = namedtuple('AchievementRule', ['code', 'name', 'description', 'event', 'threshold', 'scope'])
+AchievementRule.__new__.__defaults__ = (None,)
+
+LETTER_COMPLETED = 'letter_completed'
+NUMBER_COMPLETED = 'number_completed'
+WORD_COMPLETED = 'word_completed'
+ROUTINE_STREAK = 'routine_streak'
+GAME_LEVEL_COMPLETED = 'game_level_completed'
+
+RULES = [
+    AchievementRule('first_letter', 'First Letter', 'Traced your first letter', LETTER_COMPLETED, 1),
+    AchievementRule('letters_10', 'Letter Explorer', 'Completed 10 letters', LETTER_COMPLETED, 10),
+    AchievementRule('letters_26', 'Alphabet Star', 'Completed 26 letters', LETTER_COMPLETED, 26),
+    AchievementRule('first_number', 'First Number', 'Counted your first number', NUMBER_COMPLETED, 1),
+    AchievementRule('numbers_10', 'Number Cruncher', 'Completed 10 numbers', NUMBER_COMPLETED, 10),
+    AchievementRule('words_10', 'Word Finder', 'Matched 10 words', WORD_COMPLETED, 10),
+    AchievementRule('routine_streak_5', 'On a Roll', 'Finished a routine 5 days in a row', ROUTINE_STREAK, 5),
+    AchievementRule('routine_streak_30', 'Routine Champion', 'Finished a routine 30 days in a row', ROUTINE_STREAK, 30),
+    AchievementRule('color_matching_5', 'Color Master', 'Completed color matching level 5', GAME_LEVEL_COMPLETED, 5, 'color-matching'),
+]
+
+RULES_BY_EVENT = defaultdict(list)
+for _rule in RULES:
+    RULES_BY_EVENT[_rule.event].append(_rule)
+
+# Events whose value is a count the engine looks up itself
+COMPLETION_MODELS = {
+    LETTER_COMPLETED: ChildLetterProgress,
+    NUMBER_COMPLETED: ChildNumberProgress,
+    WORD_COMPLETED: ChildWordProgress,
+}
+
+
+def _matches(rule, scope):
+    return rule.scope is None or rule.scope == scope
+
+
+def award(child_id, rules):
+    """Create achievements for ``rules``, skipping any the child already has"""
+    Achievement.objects.bulk_create([
+        Achievement(child_id=child_id, code=rule.code, name=rule.name, description=rule.description)
+        for rule in rules
+    ], ignore_conflicts=True)
+
+
+def handle_event(child_id, event, value=None, scope=None):
+    """Evaluate the rules listening to ``event`` and award the ones now met.
+
+    ``value`` is the number compared with thresholds, or a callable returning
+    it; completion events look their count up when ``value`` is None. The
+    value is only computed when some rule is still unearned. ``scope`` picks
+    out scoped rules, such as a game's slug. Returns the codes of the rules met.
+    """
+    rules = [rule for rule in RULES_BY_EVENT.get(event, []) if _matches(rule, scope)]
+    if not rules:
+        return []
+
+    earned = set(Achievement.objects.filter(
+        child_id=child_id,
+        code__in=[rule.code for rule in rules]
+    ).values_list('code', flat=True))
+    pending = [rule for rule in rules if rule.code not in earned]
+    if not pending:
+        return []
+
+    if value is None and event in COMPLETION_MODELS:
+        value = COMPLETION_MODELS[event].objects.filter(child_id=child_id, completed=True).count()
+    elif callable(value):
+        value = value()
+    if value is None:
+        return []
+
+    met = [rule for rule in pending if value >= rule.threshold]
+    if met:
+        award(child_id, met)
+    return [rule.code for rule in met]
+
+
+def _longest_streaks(rows, required_masks):
+    """Longest run of full days per child from (child, routine, date, bitmap) rows ordered by child, routine, date"""
+    longest = defaultdict(int)
+    key = last_date = None
+    run = 0
+    for child_id, routine_id, date, bitmap in rows:
+        mask = required_masks.get(routine_id)
+        if not mask or bitmap & mask != mask:
+            continue
+        if (child_id, routine_id) == key and last_date == date - timedelta(days=1):
+            run += 1
+        else:
+            run = 1
+        key, last_date = (child_id, routine_id), date
+        longest[child_id] = max(longest[child_id], run)
+    return longest
+
+
+def backfill_achievements(batch_size=2000):
+    """Award every achievement already earned by existing progress.
+
+    Each source is read once, streamed in ``batch_size`` chunks, into one
+    value per (child, event, scope); rules are then checked against those
+    values and all awards are inserted in bulk. Returns the number of
+    achievements created.
+    """
+    from apps.games.models import GameSession
+    from apps.routines.models import DailyRoutineCompletion, Task
+
+    values = defaultdict(int)
+    for event, model in COMPLETION_MODELS.items():
+        counts = model.objects.filter(completed=True).values('child_id').annotate(
+            count=Count('id')
+        ).values_list('child_id', 'count').order_by()
+        for child_id, count in counts.iterator(chunk_size=batch_size):
+            values[child_id, event, None] = count
+
+    required_masks = defaultdict(int)
+    for routine_id, slot in Task.objects.filter(is_required=True).values_list('routine_id', 'slot'):
+        required_masks[routine_id] |= 1 << slot
+    rows = DailyRoutineCompletion.objects.order_by('child_id', 'routine_id', 'date').values_list(
+        'child_id', 'routine_id', 'date', 'completed_tasks'
+    ).iterator(chunk_size=batch_size)
+    for child_id, streak in _longest_streaks(rows, required_masks).items():
+        values[child_id, ROUTINE_STREAK, None] = streak
+
+    sessions = GameSession.objects.filter(completed=True).values_list(
+        'child_id', 'game__slug', 'level'
+    ).iterator(chunk_size=batch_size)
+    for child_id, game_slug, level in sessions:
+        key = (child_id, GAME_LEVEL_COMPLETED, game_slug)
+        values[key] = max(values[key], level)
+
+    awards = {}
+    for (child_id, event, scope), value in values.items():
+        for rule in RULES_BY_EVENT.get(event, []):
+            if _matches(rule, scope) and value >= rule.threshold:
+                awards[child_id, rule.code] = rule
+
+    before = Achievement.objects.exclude(code='').count()
+    Achievement.objects.bulk_create([
+        Achievement(child_id=child_id, code=rule.code, name=rule.name, description=rule.description)
+        for (child_id, code), rule in awards.items()
+    ], batch_size=batch_size, ignore_conflicts=True)
+    return Achievement.objects.exclude(code='').count() - before
@@ -0,0 +1,134 @@
+"""
+Cached letter, number and word catalogs.
+
+The catalogs only change when staff edit them, so they are read from the
+cache under a catalog version that every save or delete bumps. The version
+is the millisecond timestamp of the last change: it doubles as the pages'
+Last-Modified time, and a flushed cache starts a fresh version instead of
+reusing one a client may already hold as an ETag.
+"""
+from datetime import datetime, timezone as dt_timezone
+import time
+
+from django.core.cache import cache
+
+from .models import Letter, Number, Word
+
+VERSION_KEY = 'learning:catalog_version'
+CATALOG_KEY = 'learning:catalog:{kind}:{version}'
+WORD_KEY = 'learning:word:{word_id}:{version}'
+CACHE_TIMEOUT = 60 * 60 * 24
+
+CATALOG_QUERIES = {
+    # Tracing data is large and has its own in-process index
+    'letters': lambda: Letter.objects.defer('tracing_data').order_by('char'),
+    'numbers': lambda: Number.objects.defer('tracing_data').order_by('value'),
+    'words': lambda: Word.objects.order_by('category', 'text'),
+}
+
+
+def _now_ms():
+    return int(time.time() * 1000)
+
+
+def get_catalog_version():
+    return cache.get_or_set(VERSION_KEY, _now_ms, None)
+
+
+def bump_catalog_version():
+    current = cache.get(VERSION_KEY) or 0
+    cache.set(VERSION_KEY, max(_now_ms(), current + 1), None)
+
+
+def catalog_last_modified(version=None):
+    version = version or get_catalog_version()
+    return datetime.fromtimestamp(version / 1000, tz=dt_timezone.utc)
+
+
+def catalog_items(kind):
+    """Every letter, number or word, in display order"""
+    key = CATALOG_KEY.format(kind=kind, version=get_catalog_version())
+    items = cache.get(key)
+    if items is None:
+        items = list(CATALOG_QUERIES[kind]())
+        cache.set(key, items, CACHE_TIMEOUT)
+    return items
+
+
+def find_letter(char):
+    """Letter for ``char``, preferring an exact case match"""
+    letters = catalog_items('letters')
+    for letter in letters:
+        if letter.char == char:
+            return letter
+    for letter in letters:
+        if letter.char.lower() == char.lower():
+            return letter
+    return None
+
+
+def find_number(value):
+    return next((number for number in catalog_items('numbers') if number.value == value), None)
+
+
+def find_word(word_id):
+    """One word, cached on its own so a detail page never loads the whole catalog"""
+    key = WORD_KEY.format(word_id=word_id, version=get_catalog_version())
+    word = cache.get(key)
+    if word is None:
+        word = Word.objects.filter(pk=word_id).first()
+        if word is not None:
+            cache.set(key, word, CACHE_TIMEOUT)
+    return word
+
+
+def _file_url(field):
+    return field.url if field else None
+
+
+def catalog_data():
+    """JSON-ready catalog for clients to keep locally"""
+    version = get_catalog_version()
+    key = CATALOG_KEY.format(kind='json', version=version)
+    data = cache.get(key)
+    if data is None:
+        data = {
+            'version': version,
+            'letters': [
+                {'id': letter.id, 'char': letter.char, 'case': letter.case, 'image': _file_url(letter.image)}
+                for letter in catalog_items('letters')
+            ],
+            'numbers': [
+                {
+                    'id': number.id,
+                    'value': number.value,
+                    'image': _file_url(number.image),
+                    'quantity_image': _file_url(number.quantity_image),
+                }
+                for number in catalog_items('numbers')
+            ],
+            'words': [
+                {'id': word.id, 'text': word.text, 'category': word.category, 'image': _file_url(word.image)}
+                for word in catalog_items('words')
+            ],
+        }
+        cache.set(key, data, CACHE_TIMEOUT)
+    return data
+
+
+def _user_changed_ms(user):
+    updated_at = getattr(user, 'updated_at', None)
+    return int(updated_at.timestamp() * 1000) if updated_at else 0
+
+
+def page_etag(request, *args, **kwargs):
+    """ETag for catalog pages; they show the signed-in user, so it changes with them"""
+    return f'{get_catalog_version()}-{request.user.pk}-{_user_changed_ms(request.user)}'
+
+
+def page_last_modified(request, *args, **kwargs):
+    return catalog_last_modified(max(get_catalog_version(), _user_changed_ms(request.user)))
+
+
+def data_etag(request, *args, **kwargs):
+    return str(get_catalog_version())
@@ -0,0 +1,107 @@
+"""
+Reference strokes from font glyphs.
+
+A glyph is rendered with Pillow, thinned to a one pixel wide skeleton
+(Zhang-Suen) and the skeleton is walked into strokes. Strokes start at their
+top-left end and are ordered top to bottom, left to right, which is close to
+how children are taught to write most characters.
+"""
+from PIL import Image, ImageDraw, ImageFont
+
+NEIGHBOURS = [(-1, 0), (0, 1), (1, 0), (0, -1), (-1, 1), (1, 1), (1, -1), (-1, -1)]
+MIN_STROKE_PIXELS = 4
+
+
+def load_font(font_path=None, size=96):
+    if font_path:
+        return ImageFont.truetype(font_path, size)
+    return ImageFont.load_default(size=size)
+
+
+def render_glyph(text, font):
+    """Set of (row, col) ink pixels for ``text``, with a blank border"""
+    left, top, right, bottom = font.getbbox(text)
+    image = Image.new('1', (right - left + 4, bottom - top + 4), 0)
+    ImageDraw.Draw(image).text((2 - left, 2 - top), text, font=font, fill=1)
+    width, height = image.size
+    data = image.load()
+    return {(row, col) for row in range(height) for col in range(width) if data[col, row]}
+
+
+def _ring(pixels, row, col):
+    # P2..P9 clockwise from north, as in Zhang-Suen
+    return [
+        (row - 1, col) in pixels, (row - 1, col + 1) in pixels,
+        (row, col + 1) in pixels, (row + 1, col + 1) in pixels,
+        (row + 1, col) in pixels, (row + 1, col - 1) in pixels,
+        (row, col - 1) in pixels, (row - 1, col - 1) in pixels,
+    ]
+
+
+def thin(pixels):
+    """Zhang-Suen thinning of a pixel set"""
+    pixels = set(pixels)
+    changed = True
+    while changed:
+        changed = False
+        for step in (0, 1):
+            remove = []
+            for row, col in pixels:
+                p = _ring(pixels, row, col)
+                count = sum(p)
+                if not 2 <= count <= 6:
+                    continue
+                transitions = sum(not p[i] and p[(i + 1) % 8] for i in range(8))
+                if transitions != 1:
+                    continue
+                if step == 0 and not (p[0] and p[2] and p[4]) and not (p[2] and p[4] and p[6]):
+                    remove.append((row, col))
+                elif step == 1 and not (p[0] and p[2] and p[6]) and not (p[0] and p[4] and p[6]):
+                    remove.append((row, col))
+            if remove:
+                pixels.difference_update(remove)
+                changed = True
+    return pixels
+
+
+def _neighbours(pixels, pixel):
+    row, col = pixel
+    return [(row + dr, col + dc) for dr, dc in NEIGHBOURS if (row + dr, col + dc) in pixels]
+
+
+def trace_skeleton(pixels):
+    """Walk a skeleton into strokes of (row, col) pixels"""
+    unvisited = set(pixels)
+    strokes = []
+    while unvisited:
+        # Prefer loose ends so strokes run end to end; closed loops start top-left
+        ends = [p for p in unvisited if len([n for n in _neighbours(pixels, p) if n in unvisited]) <= 1]
+        current = min(ends or unvisited)
+        stroke = [current]
+        unvisited.discard(current)
+        while True:
+            candidates = [n for n in _neighbours(pixels, current) if n in unvisited]
+            if not candidates:
+                # Close the stroke onto an already walked junction
+                joins = [n for n in _neighbours(pixels, current) if len(stroke) < 2 or n != stroke[-2]]
+                if joins and len(stroke) >= MIN_STROKE_PIXELS:
+                    stroke.append(joins[0])
+                break
+            current = candidates[0]
+            stroke.append(current)
+            unvisited.discard(current)
+        if len(stroke) >= MIN_STROKE_PIXELS:
+            strokes.append(stroke)
+    return strokes
+
+
+def glyph_strokes(text, font_path=None, size=96):
+    """Strokes of ``text`` as lists of [x, y] pixel coordinates"""
+    font = load_font(font_path, size)
+    strokes = []
+    for stroke in trace_skeleton(thin(render_glyph(text, font))):
+        if stroke[-1] < stroke[0]:
+            stroke.reverse()
+        strokes.append([[col, row] for row, col in stroke])
+    strokes.sort(key=lambda stroke: (stroke[0][1], stroke[0][0]))
+    return strokes
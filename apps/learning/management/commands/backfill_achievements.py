@@ -0,0 +1,19 @@
+from django.core.management.base import BaseCommand
+from apps.learning.achievements import backfill_achievements
+
+
+class Command(BaseCommand):
+    help = 'Award achievements already earned by existing learning, routine and game progress'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=2000,
+            help='Number of rows streamed and written per query'
+        )
+
+    def handle(self, *args, **options):
+        self.stdout.write('Evaluating achievement rules over existing progress...')
+        created = backfill_achievements(batch_size=options['batch_size'])
+        self.stdout.write(self.style.SUCCESS(f'Awarded {created} achievements'))
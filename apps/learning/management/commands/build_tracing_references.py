@@ -0,0 +1,78 @@
+from concurrent.futures import ProcessPoolExecutor
+from functools import partial
+import os
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from apps.learning.models import Letter, Number
+from apps.learning.glyphs import glyph_strokes, load_font
+from apps.learning.tracing import make_reference_data, invalidate_references
+
+
+def build_reference(text, font_path, size, source):
+    strokes = glyph_strokes(text, font_path, size)
+    return make_reference_data(strokes, source) if strokes else None
+
+
+class Command(BaseCommand):
+    help = 'Precompute tracing reference paths for letters and numbers from font glyphs'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--font',
+            help='TrueType/OpenType font to render glyphs with (default: Pillow built-in font)'
+        )
+        parser.add_argument(
+            '--size',
+            type=int,
+            default=96,
+            help='Glyph size in pixels'
+        )
+        parser.add_argument(
+            '--workers',
+            type=int,
+            default=os.cpu_count() or 1,
+            help='Number of processes rendering glyphs'
+        )
+        parser.add_argument(
+            '--missing-only',
+            action='store_true',
+            help='Only build references for items without tracing data'
+        )
+
+    def handle(self, *args, **options):
+        font_path = options['font']
+        try:
+            font = load_font(font_path, options['size'])
+        except (OSError, ImportError) as e:
+            raise CommandError(f'Cannot load font: {e}')
+        source = ' '.join(font.getname())
+
+        letters = Letter.objects.only('id', 'char')
+        numbers = Number.objects.only('id', 'value')
+        if options['missing_only']:
+            letters = letters.filter(tracing_data__isnull=True)
+            numbers = numbers.filter(tracing_data__isnull=True)
+        items = [(letter, letter.char) for letter in letters] + [(number, str(number.value)) for number in numbers]
+        if not items:
+            self.stdout.write('Nothing to build')
+            return
+
+        self.stdout.write(f'Building {len(items)} tracing references with {source}...')
+        build = partial(build_reference, font_path=font_path, size=options['size'], source=source)
+        texts = [text for item, text in items]
+        if options['workers'] > 1:
+            with ProcessPoolExecutor(max_workers=options['workers']) as executor:
+                references = list(executor.map(build, texts, chunksize=4))
+        else:
+            references = [build(text) for text in texts]
+
+        for (item, text), reference in zip(items, references):
+            item.tracing_data = reference
+
+        with transaction.atomic():
+            Letter.objects.bulk_update([item for item, text in items if isinstance(item, Letter)], ['tracing_data'])
+            Number.objects.bulk_update([item for item, text in items if isinstance(item, Number)], ['tracing_data'])
+        invalidate_references()
+
+        self.stdout.write(self.style.SUCCESS(f'Built {len(items)} tracing references'))
@@ -0,0 +1,19 @@
+from django.core.management.base import BaseCommand
+from apps.learning.search import rebuild_word_index
+
+
+class Command(BaseCommand):
+    help = 'Rebuild the trigram search index over words'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=2000,
+            help='Number of index rows written per query'
+        )
+
+    def handle(self, *args, **options):
+        self.stdout.write('Rebuilding word search index...')
+        count = rebuild_word_index(batch_size=options['batch_size'])
+        self.stdout.write(self.style.SUCCESS(f'Indexed {count} words'))
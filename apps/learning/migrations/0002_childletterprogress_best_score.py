@@ -0,0 +1,18 @@
+# Generated by Django 5.2.4 on 2026-10-19 12:02
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('learning', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='childletterprogress',
+            name='best_score',
+            field=models.PositiveSmallIntegerField(default=0),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.2.4 on 2026-10-19 12:06
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('learning', '0002_childletterprogress_best_score'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='number',
+            name='tracing_data',
+            field=models.JSONField(blank=True, null=True),
+        ),
+    ]
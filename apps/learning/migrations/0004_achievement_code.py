@@ -0,0 +1,24 @@
+# Generated by Django 5.2.4 on 2026-10-19 12:12
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('learning', '0003_number_tracing_data'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='achievement',
+            name='code',
+            field=models.CharField(blank=True, default='', help_text='Rule that awarded this achievement', max_length=64),
+        ),
+        migrations.AddConstraint(
+            model_name='achievement',
+            constraint=models.UniqueConstraint(condition=models.Q(('code', ''), _negated=True), fields=('child', 'code'), name='unique_achievement_per_child'),
+        ),
+    ]
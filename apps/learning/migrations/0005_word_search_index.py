@@ -0,0 +1,64 @@
+# Generated by Django 5.2.4 on 2026-10-19 12:18
+
+import re
+
+import django.db.models.deletion
+import django.db.models.functions.text
+from django.conf import settings
+from django.db import migrations, models
+
+
+def trigrams(text):
+    """Copy of search.trigrams as it was when the index was added"""
+    grams = set()
+    for token in re.sub(r'[^\w]+', ' ', text.lower()).split():
+        padded = f'  {token} '
+        grams.update(padded[i:i + 3] for i in range(len(padded) - 2))
+    return grams
+
+
+def index_existing_words(apps, schema_editor):
+    Word = apps.get_model('learning', 'Word')
+    WordTrigram = apps.get_model('learning', 'WordTrigram')
+    WordTrigram.objects.bulk_create([
+        WordTrigram(word_id=word_id, trigram=gram, category=category)
+        for word_id, text, category in Word.objects.values_list('id', 'text', 'category')
+        for gram in trigrams(text)
+    ], batch_size=2000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('learning', '0004_achievement_code'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='WordTrigram',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('trigram', models.CharField(max_length=3)),
+                ('category', models.CharField(max_length=16)),
+            ],
+        ),
+        migrations.AddIndex(
+            model_name='word',
+            index=models.Index(fields=['category', 'text'], name='word_category_text_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='word',
+            index=models.Index(django.db.models.functions.text.Lower('text'), name='word_text_lower_idx'),
+        ),
+        migrations.AddField(
+            model_name='wordtrigram',
+            name='word',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='trigrams', to='learning.word'),
+        ),
+        migrations.AddIndex(
+            model_name='wordtrigram',
+            index=models.Index(fields=['trigram', 'category'], name='word_trigram_idx'),
+        ),
+        migrations.RunPython(index_existing_words, migrations.RunPython.noop),
+    ]
@@ -1,5 +1,6 @@
 from django.db import models
 from django.conf import settings
+from django.db.models.functions import Lower
 
 # Letter model (A-Z)
 class Letter(models.Model):
@@ -22,6 +23,7 @@ class Number(models.Model):
     value = models.PositiveSmallIntegerField(unique=True)
     image = models.ImageField(upload_to='numbers/')
     quantity_image = models.ImageField(upload_to='numbers/quantities/', blank=True, null=True)
+    tracing_data = models.JSONField(blank=True, null=True)
 
     def __str__(self):
         return str(self.value)
@@ -41,9 +43,26 @@ class Word(models.Model):
     category = models.CharField(max_length=16, choices=CATEGORY_CHOICES)
     created_by = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.SET_NULL, null=True, blank=True)
 
+    class Meta:
+        indexes = [
+            models.Index(fields=['category', 'text'], name='word_category_text_idx'),
+            models.Index(Lower('text'), name='word_text_lower_idx'),
+        ]
+
     def __str__(self):
         return self.text
 
+# Trigram search index over Word.text, kept in sync by signals
+class WordTrigram(models.Model):
+    word = models.ForeignKey(Word, on_delete=models.CASCADE, related_name='trigrams')
+    trigram = models.CharField(max_length=3)
+    category = models.CharField(max_length=16)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['trigram', 'category'], name='word_trigram_idx'),
+        ]
+
 # Progress tracking for each module
 class ChildLetterProgress(models.Model):
     child = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name='letter_progress')
@@ -51,6 +70,7 @@ class ChildLetterProgress(models.Model):
     completed = models.BooleanField(default=False)
     timestamp = models.DateTimeField(auto_now=True)
     attempts = models.PositiveSmallIntegerField(default=0)
+    best_score = models.PositiveSmallIntegerField(default=0)
 
     class Meta:
         unique_together = ('child', 'letter')
@@ -78,9 +98,19 @@ class ChildWordProgress(models.Model):
 # Achievement/Milestone tracking
 class Achievement(models.Model):
     child = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name='achievements')
+    code = models.CharField(max_length=64, blank=True, default='', help_text='Rule that awarded this achievement')
     name = models.CharField(max_length=64)
     description = models.TextField(blank=True)
     achieved_on = models.DateTimeField(auto_now_add=True)
 
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=['child', 'code'],
+                condition=~models.Q(code=''),
+                name='unique_achievement_per_child'
+            ),
+        ]
+
     def __str__(self):
         return f"{self.child} - {self.name}"
@@ -0,0 +1,170 @@
+"""
+Recording and summarising learning progress.
+
+Learning pages send attempts in batches. Each batch is folded per item and
+written with one upsert and one update per item type: the upsert creates any
+missing progress rows and the update adds the attempt counts with
+``F('attempts') + n`` so concurrent batches never lose attempts.
+"""
+from django.db import transaction
+from django.db.models import Case, When, Value, F, Q, Count, FilteredRelation, PositiveSmallIntegerField
+from django.db.models.functions import Greatest
+from django.utils import timezone
+
+from .achievements import handle_event
+from .models import Letter, Number, Word, ChildLetterProgress, ChildNumberProgress, ChildWordProgress
+
+PROGRESS_MODELS = {
+    'letter': (Letter, ChildLetterProgress, 'letter'),
+    'number': (Number, ChildNumberProgress, 'number'),
+    'word': (Word, ChildWordProgress, 'word'),
+}
+MAX_BATCH_EVENTS = 500
+
+
+def record_attempts(child, kind, attempts):
+    """Add attempts at items of one kind to the child's progress.
+
+    ``attempts`` is an iterable of ``(item_id, completed)`` or, for letters,
+    ``(item_id, completed, score)``. Returns the number of items touched.
+    """
+    item_model, progress_model, field = PROGRESS_MODELS[kind]
+    column = f'{field}_id'
+
+    totals = {}
+    for attempt in attempts:
+        item_id, completed = attempt[0], attempt[1]
+        score = attempt[2] if len(attempt) > 2 else None
+        count, done, best = totals.get(item_id, (0, False, None))
+        if score is not None:
+            best = score if best is None else max(best, score)
+        totals[item_id] = (count + 1, done or bool(completed), best)
+    if not totals:
+        return 0
+
+    updates = {
+        'attempts': F('attempts') + Case(
+            *[When(**{column: item_id}, then=Value(count)) for item_id, (count, done, best) in totals.items()],
+            default=Value(0),
+            output_field=PositiveSmallIntegerField()
+        ),
+    }
+    completed_ids = [item_id for item_id, (count, done, best) in totals.items() if done]
+    if completed_ids:
+        updates['completed'] = Case(
+            When(**{f'{column}__in': completed_ids}, then=Value(True)),
+            default=F('completed')
+        )
+    scores = {item_id: best for item_id, (count, done, best) in totals.items() if best is not None}
+    if scores and kind == 'letter':
+        updates['best_score'] = Greatest(F('best_score'), Case(
+            *[When(**{column: item_id}, then=Value(best)) for item_id, best in scores.items()],
+            default=F('best_score'),
+            output_field=PositiveSmallIntegerField()
+        ))
+
+    now = timezone.now()
+    with transaction.atomic():
+        progress_model.objects.bulk_create(
+            [progress_model(child=child, timestamp=now, **{column: item_id}) for item_id in totals],
+            update_conflicts=True,
+            unique_fields=['child', field],
+            update_fields=['timestamp']
+        )
+        progress_model.objects.filter(child=child, **{f'{column}__in': list(totals)}).update(**updates)
+    if completed_ids:
+        handle_event(child.id, f'{kind}_completed')
+    return len(totals)
+
+
+def record_progress_events(child, events):
+    """Validate and record a batch of ``{"type", "id", "completed"}`` events.
+
+    Returns ``(recorded, rejected)``: items touched per type and the indexes of
+    events that were malformed or named unknown items.
+    """
+    by_kind = {}
+    rejected = []
+    for index, event in enumerate(events):
+        if not isinstance(event, dict) or event.get('type') not in PROGRESS_MODELS or not isinstance(event.get('id'), int):
+            rejected.append(index)
+            continue
+        by_kind.setdefault(event['type'], []).append((index, event))
+
+    recorded = {}
+    for kind, kind_events in by_kind.items():
+        item_model = PROGRESS_MODELS[kind][0]
+        known = set(item_model.objects.filter(
+            id__in={event['id'] for index, event in kind_events}
+        ).values_list('id', flat=True))
+        attempts = []
+        for index, event in kind_events:
+            if event['id'] in known:
+                attempts.append((event['id'], bool(event.get('completed'))))
+            else:
+                rejected.append(index)
+        recorded[kind] = record_attempts(child, kind, attempts)
+    return recorded, sorted(rejected)
+
+
+def _with_progress(queryset, relation, child):
+    return queryset.annotate(
+        progress=FilteredRelation(relation, condition=Q(**{f'{relation}__child': child}))
+    )
+
+
+def progress_summary(child):
+    """Completion per letter, per number and per word category in three queries"""
+    letters = list(_with_progress(Letter.objects, 'childletterprogress', child).order_by('char').values(
+        'id', 'char', 'case',
+        completed=F('progress__completed'),
+        attempts=F('progress__attempts'),
+        best_score=F('progress__best_score')
+    ))
+    numbers = list(_with_progress(Number.objects, 'childnumberprogress', child).order_by('value').values(
+        'id', 'value',
+        completed=F('progress__completed'),
+        attempts=F('progress__attempts')
+    ))
+    categories = dict(Word.CATEGORY_CHOICES)
+    word_rows = _with_progress(Word.objects, 'childwordprogress', child).values('category').annotate(
+        total=Count('id'),
+        completed=Count('id', filter=Q(progress__completed=True)),
+        attempted=Count('id', filter=Q(progress__attempts__gt=0))
+    ).order_by('category')
+    words = [
+        {
+            'category': row['category'],
+            'label': categories.get(row['category'], row['category']),
+            'total': row['total'],
+            'completed': row['completed'],
+            'attempted': row['attempted'],
+            'percent': round(row['completed'] / row['total'] * 100) if row['total'] else 0,
+        }
+        for row in word_rows
+    ]
+
+    def totals(items):
+        completed = sum(1 for item in items if item['completed'])
+        return {
+            'total': len(items),
+            'completed': completed,
+            'percent': round(completed / len(items) * 100) if items else 0,
+        }
+
+    word_total = sum(row['total'] for row in words)
+    word_completed = sum(row['completed'] for row in words)
+    return {
+        'letters': letters,
+        'numbers': numbers,
+        'word_categories': words,
+        'totals': {
+            'letters': totals(letters),
+            'numbers': totals(numbers),
+            'words': {
+                'total': word_total,
+                'completed': word_completed,
+                'percent': round(word_completed / word_total * 100) if word_total else 0,
+            },
+        },
+    }
@@ -0,0 +1,119 @@
+"""
+Word search.
+
+Prefix matches come from the expression index on ``LOWER(text)`` as a range
+scan. Fuzzy matches come from ``WordTrigram``, which holds the trigrams of
+every word (padded like pg_trgm, so word starts weigh more) next to its
+category: candidates are the words sharing the most trigrams with the query,
+ranked by trigram similarity. Prefix matches are listed first.
+"""
+from collections import namedtuple
+import re
+
+from django.core.paginator import Paginator
+from django.db import transaction
+from django.db.models import Count
+from django.db.models.functions import Lower
+
+from .models import Word, WordTrigram
+
+PAGE_SIZE = 24
+SIMILARITY_THRESHOLD = 0.3
+MAX_FUZZY_CANDIDATES = 200
+MAX_PREFIX_RESULTS = 1000
+
+SearchResults = namedtuple('SearchResults', ['page', 'query', 'category'])
+
+
+def normalize(text):
+    return ' '.join(re.sub(r'[^\w]+', ' ', text.lower()).split())
+
+
+def trigrams(text):
+    """Set of padded trigrams of every token in ``text``"""
+    grams = set()
+    for token in normalize(text).split():
+        padded = f'  {token} '
+        grams.update(padded[i:i + 3] for i in range(len(padded) - 2))
+    return grams
+
+
+def similarity(first, second):
+    if not first or not second:
+        return 0.0
+    return len(first & second) / len(first | second)
+
+
+def index_word(word):
+    """Replace a word's trigram rows"""
+    with transaction.atomic():
+        WordTrigram.objects.filter(word=word).delete()
+        WordTrigram.objects.bulk_create([
+            WordTrigram(word=word, trigram=gram, category=word.category)
+            for gram in trigrams(word.text)
+        ])
+
+
+def rebuild_word_index(batch_size=2000):
+    """Rebuild the whole trigram table; returns the number of words indexed"""
+    count = 0
+    with transaction.atomic():
+        WordTrigram.objects.all().delete()
+        rows = []
+        for word_id, text, category in Word.objects.values_list('id', 'text', 'category').iterator(chunk_size=batch_size):
+            rows.extend(WordTrigram(word_id=word_id, trigram=gram, category=category) for gram in trigrams(text))
+            count += 1
+            if len(rows) >= batch_size:
+                WordTrigram.objects.bulk_create(rows, batch_size=batch_size)
+                rows = []
+        WordTrigram.objects.bulk_create(rows, batch_size=batch_size)
+    return count
+
+
+def _prefix_ids(query, category):
+    words = Word.objects.annotate(lowered=Lower('text')).filter(
+        lowered__gte=query,
+        lowered__lt=query + '\uffff'
+    )
+    if category:
+        words = words.filter(category=category)
+    return list(words.order_by('lowered').values_list('id', flat=True)[:MAX_PREFIX_RESULTS])
+
+
+def _fuzzy_ids(query, category):
+    grams = trigrams(query)
+    if not grams:
+        return []
+    matches = WordTrigram.objects.filter(trigram__in=grams)
+    if category:
+        matches = matches.filter(category=category)
+    candidates = matches.values('word_id').annotate(
+        hits=Count('id')
+    ).order_by('-hits').values_list('word_id', flat=True)[:MAX_FUZZY_CANDIDATES]
+    texts = dict(Word.objects.filter(id__in=list(candidates)).values_list('id', 'text'))
+
+    scored = [(similarity(grams, trigrams(text)), text.lower(), word_id) for word_id, text in texts.items()]
+    scored = [row for row in scored if row[0] >= SIMILARITY_THRESHOLD]
+    scored.sort(key=lambda row: (-row[0], row[1]))
+    return [word_id for score, text, word_id in scored]
+
+
+def search_words(query='', category=None, page=1, page_size=PAGE_SIZE):
+    """Page of words matching ``query`` by prefix or fuzzily, within ``category``"""
+    query = normalize(query or '')
+    if category not in dict(Word.CATEGORY_CHOICES):
+        category = None
+
+    if not query:
+        words = Word.objects.order_by('category', 'text') if not category else Word.objects.filter(category=category).order_by('text')
+        return SearchResults(Paginator(words, page_size).get_page(page), query, category)
+
+    ids = _prefix_ids(query, category)
+    if len(query) >= 3:
+        seen = set(ids)
+        ids += [word_id for word_id in _fuzzy_ids(query, category) if word_id not in seen]
+
+    page_obj = Paginator(ids, page_size).get_page(page)
+    words = Word.objects.in_bulk(list(page_obj.object_list))
+    page_obj.object_list = [words[word_id] for word_id in page_obj.object_list if word_id in words]
+    return SearchResults(page_obj, query, category)
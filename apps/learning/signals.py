@@ -0,0 +1,33 @@
+from django.db.models.signals import post_save, post_delete
+from django.dispatch import receiver
+
+from .models import Letter, Number, Word
+from .catalog import bump_catalog_version
+from .search import index_word
+from .tracing import invalidate_references
+
+
+@receiver(post_save, sender=Letter)
+@receiver(post_delete, sender=Letter)
+@receiver(post_save, sender=Number)
+@receiver(post_delete, sender=Number)
+def refresh_references(sender, instance, **kwargs):
+    """Tracing data may have changed"""
+    invalidate_references()
+
+
+@receiver(post_save, sender=Letter)
+@receiver(post_delete, sender=Letter)
+@receiver(post_save, sender=Number)
+@receiver(post_delete, sender=Number)
+@receiver(post_save, sender=Word)
+@receiver(post_delete, sender=Word)
+def refresh_catalog(sender, instance, **kwargs):
+    """Catalog pages and the JSON catalog must be rebuilt"""
+    bump_catalog_version()
+
+
+@receiver(post_save, sender=Word)
+def refresh_word_index(sender, instance, **kwargs):
+    """Re-index the word's trigrams; deleting a word cascades to its rows"""
+    index_word(instance)
@@ -1,3 +1,763 @@
-from django.test import TestCase
+from django.test import TestCase, Client
+from django.contrib.auth import get_user_model
+from django.urls import reverse
+from django.core.cache import cache
+from django.core.management import call_command
+from .models import Letter, Number, Word, ChildLetterProgress, ChildNumberProgress, ChildWordProgress
+from .progress import record_progress_events, progress_summary
+from .achievements import handle_event, backfill_achievements, LETTER_COMPLETED
+from .models import Achievement
+from .catalog import get_catalog_version
+from .search import search_words, rebuild_word_index
+from .models import WordTrigram
+from apps.games.models import Game, GameSession
+from apps.routines.models import Routine, Task, TaskCompletion
+from apps.routines.completions import record_completion
+from django.utils import timezone
+from datetime import timedelta
+from .tracing import (
+    get_reference, get_references, score_trace, build_grid, prepare_path, warm_references, invalidate_references,
+    _count_within_tolerance, REFERENCE_MODELS, TOLERANCE, PASS_SCORE
+)
+from io import StringIO
+from unittest import mock
+from django.db import DatabaseError
+import random
+import time
+import json
 
-# Create your tests here.
+User = get_user_model()
+
+# Reference strokes for "L" in a 100x100 box: down, then right
+L_STROKES = [[[20, 10], [20, 90]], [[20, 90], [80, 90]]]
+
+
+def dense(strokes, scale=1, offset=0, steps=20):
+    """Interpolate strokes the way a canvas would report them, moved and scaled"""
+    result = []
+    for stroke in strokes:
+        points = []
+        for (x1, y1), (x2, y2) in zip(stroke, stroke[1:]):
+            for i in range(steps):
+                t = i / steps
+                points.append([(x1 + t * (x2 - x1)) * scale + offset, (y1 + t * (y2 - y1)) * scale + offset])
+        points.append([stroke[-1][0] * scale + offset, stroke[-1][1] * scale + offset])
+        result.append(points)
+    return result
+
+
+class TracingScoreTest(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.client = Client()
+
+        self.child_user = User.objects.create_user(
+            email='child@test.com',
+            username='childtest',
+            password='testpass123',
+            role='child',
+            first_name='Test',
+            last_name='Child'
+        )
+        self.letter = Letter.objects.create(
+            char='L',
+            image='letters/l.png',
+            tracing_data={'strokes': L_STROKES}
+        )
+        self.other = Letter.objects.create(
+            char='O',
+            image='letters/o.png',
+            tracing_data={'strokes': [[[50, 10], [90, 50], [50, 90], [10, 50], [50, 10]]]}
+        )
+
+    def test_matching_trace_passes(self):
+        """Test that a moved and scaled copy of the reference passes"""
+        reference = get_reference('letter', self.letter.id)
+        result = score_trace(reference, dense(L_STROKES, scale=4, offset=30))
+
+        self.assertTrue(result['passed'])
+        self.assertGreaterEqual(result['score'], 95)
+
+    def test_wrong_letter_fails(self):
+        """Test that tracing a different shape fails"""
+        reference = get_reference('letter', self.letter.id)
+        result = score_trace(reference, dense(self.other.tracing_data['strokes']))
+
+        self.assertFalse(result['passed'])
+        self.assertLess(result['score'], PASS_SCORE)
+
+    def test_partial_trace_fails(self):
+        """Test that only the first stroke of the letter is not enough"""
+        reference = get_reference('letter', self.letter.id)
+        result = score_trace(reference, dense(L_STROKES[:1]))
+
+        self.assertFalse(result['passed'])
+
+    def test_reference_path_is_cached(self):
+        """Test that references are indexed in process and reloaded on save"""
+        get_reference('letter', self.letter.id)
+        with self.assertNumQueries(0):
+            self.assertIsNotNone(get_reference('letter', self.letter.id))
+
+        self.letter.tracing_data = None
+        self.letter.save()
+        self.assertIsNone(get_reference('letter', self.letter.id))
+
+    def test_scoring_speed(self):
+        """Test that a trace is scored in a few milliseconds"""
+        reference = get_reference('letter', self.letter.id)
+        strokes = dense(L_STROKES, scale=4, steps=150)
+
+        start = time.perf_counter()
+        for _ in range(20):
+            score_trace(reference, strokes)
+        per_trace = (time.perf_counter() - start) / 20
+
+        self.assertLess(per_trace, 0.01)
+
+    def test_score_endpoint_records_passing_attempt(self):
+        """Test that a passing trace marks the letter completed"""
+        self.client.login(email='child@test.com', password='testpass123')
+        response = self.client.post(
+            reverse('learning:api_score_trace', args=[self.letter.id]),
+            data=json.dumps({'strokes': dense(L_STROKES)}),
+            content_type='application/json'
+        )
+
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.json()['passed'])
+        progress = ChildLetterProgress.objects.get(child=self.child_user, letter=self.letter)
+        self.assertTrue(progress.completed)
+        self.assertEqual(progress.attempts, 1)
+        self.assertEqual(progress.best_score, response.json()['score'])
+
+    def test_failed_stroke_is_not_recorded_until_final(self):
+        """Test that live feedback on a partial trace does not count as an attempt"""
+        self.client.login(email='child@test.com', password='testpass123')
+        url = reverse('learning:api_score_trace', args=[self.letter.id])
+        body = {'strokes': dense(L_STROKES[:1])}
+
+        self.client.post(url, data=json.dumps(body), content_type='application/json')
+        self.assertFalse(ChildLetterProgress.objects.exists())
+
+        body['final'] = True
+        self.client.post(url, data=json.dumps(body), content_type='application/json')
+        progress = ChildLetterProgress.objects.get(child=self.child_user, letter=self.letter)
+        self.assertFalse(progress.completed)
+        self.assertEqual(progress.attempts, 1)
+
+    def test_batch_scoring(self):
+        """Test scoring several traces and folding attempts per letter"""
+        self.client.login(email='child@test.com', password='testpass123')
+        response = self.client.post(
+            reverse('learning:api_score_traces'),
+            data=json.dumps({'traces': [
+                {'letter_id': self.letter.id, 'strokes': dense(L_STROKES[:1])},
+                {'letter_id': self.letter.id, 'strokes': dense(L_STROKES)},
+                {'letter_id': self.other.id, 'strokes': dense(L_STROKES)},
+                {'letter_id': 999, 'strokes': dense(L_STROKES)},
+            ]}),
+            content_type='application/json'
+        )
+
+        self.assertEqual(response.status_code, 200)
+        results = response.json()['results']
+        self.assertEqual([r.get('passed') for r in results], [False, True, False, None])
+        self.assertIn('error', results[3])
+
+        progress = ChildLetterProgress.objects.get(child=self.child_user, letter=self.letter)
+        self.assertEqual((progress.attempts, progress.completed), (2, True))
+        progress = ChildLetterProgress.objects.get(child=self.child_user, letter=self.other)
+        self.assertEqual((progress.attempts, progress.completed), (1, False))
+
+    def test_batch_rejects_bad_letter_ids_per_item(self):
+        """Test that a malformed letter id fails its own item, not the batch"""
+        self.client.login(email='child@test.com', password='testpass123')
+        response = self.client.post(
+            reverse('learning:api_score_traces'),
+            data=json.dumps({'traces': [
+                {'letter_id': [self.letter.id], 'strokes': dense(L_STROKES)},
+                {'letter_id': {'id': 1}, 'strokes': dense(L_STROKES)},
+                {'letter_id': True, 'strokes': dense(L_STROKES)},
+                {'letter_id': self.letter.id, 'strokes': 'not strokes'},
+                {'letter_id': self.letter.id, 'strokes': dense(L_STROKES)},
+            ]}),
+            content_type='application/json'
+        )
+
+        self.assertEqual(response.status_code, 200)
+        results = response.json()['results']
+        self.assertEqual(['error' in r for r in results], [True, True, True, True, False])
+        self.assertTrue(results[4]['passed'])
+
+    def test_invalid_points_rejected(self):
+        """Test that malformed strokes return an error"""
+        self.client.login(email='child@test.com', password='testpass123')
+        response = self.client.post(
+            reverse('learning:api_score_trace', args=[self.letter.id]),
+            data=json.dumps({'strokes': [[['a', 1]]]}),
+            content_type='application/json'
+        )
+
+        self.assertEqual(response.status_code, 400)
+
+
+class TracingReferenceTest(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.client = Client()
+
+        self.child_user = User.objects.create_user(
+            email='child@test.com',
+            username='childtest',
+            password='testpass123',
+            role='child',
+            first_name='Test',
+            last_name='Child'
+        )
+        self.letters = [
+            Letter.objects.create(char=char, image=f'letters/{char}.png', case=case)
+            for char, case in [('A', 'upper'), ('b', 'lower'), ('L', 'upper')]
+        ]
+        self.numbers = [
+            Number.objects.create(value=value, image=f'numbers/{value}.png')
+            for value in [3, 12]
+        ]
+
+    def build(self):
+        call_command('build_tracing_references', workers=1, stdout=StringIO())
+
+    def test_build_references(self):
+        """Test building precomputed references for letters and numbers"""
+        self.build()
+
+        for item in self.letters + self.numbers:
+            item.refresh_from_db()
+            data = item.tracing_data
+            self.assertEqual(data['version'], 1)
+            self.assertEqual(len(data['points']), 48)
+            self.assertTrue(data['strokes'])
+            self.assertTrue(all(0 <= x <= 1 and 0 <= y <= 1 for x, y in data['points']))
+
+    def test_built_reference_scores_its_glyph(self):
+        """Test that tracing the glyph's own strokes passes and another glyph does not"""
+        self.build()
+        a, b, l = [get_reference('letter', letter.id) for letter in self.letters]
+        strokes = Letter.objects.get(char='L').tracing_data['strokes']
+
+        self.assertTrue(score_trace(l, strokes)['passed'])
+        self.assertFalse(score_trace(b, strokes)['passed'])
+
+    def test_missing_only(self):
+        """Test that existing tracing data is kept with --missing-only"""
+        self.letters[0].tracing_data = {'strokes': L_STROKES}
+        self.letters[0].save()
+
+        call_command('build_tracing_references', workers=1, missing_only=True, stdout=StringIO())
+
+        self.letters[0].refresh_from_db()
+        self.assertEqual(self.letters[0].tracing_data, {'strokes': L_STROKES})
+        self.assertIsNotNone(Number.objects.get(value=3).tracing_data)
+
+    def test_grid_matches_brute_force(self):
+        """Test that grid lookups agree with comparing every pair of points"""
+        rng = random.Random(7)
+        points = prepare_path([[(rng.random(), rng.random()) for _ in range(30)]])
+        others = prepare_path([[(rng.random(), rng.random()) for _ in range(30)]])
+
+        expected = sum(
+            any((x - ox) ** 2 + (y - oy) ** 2 <= TOLERANCE ** 2 for ox, oy in others)
+            for x, y in points
+        )
+        self.assertEqual(_count_within_tolerance(points, others, build_grid(others)), expected)
+
+    def test_references_loaded_once(self):
+        """Test that every reference of a kind is loaded with one query"""
+        self.build()
+
+        with self.assertNumQueries(1):
+            for letter in self.letters:
+                self.assertIsNotNone(get_reference('letter', letter.id))
+        with self.assertNumQueries(0):
+            get_reference('letter', self.letters[0].id)
+
+    def test_warm_references(self):
+        """Test that warming loads every kind so the first score needs no query"""
+        self.build()
+
+        warm_references()
+        with self.assertNumQueries(0):
+            self.assertIsNotNone(get_reference('letter', self.letters[0].id))
+            get_references('number')
+
+    def test_warm_references_without_tables(self):
+        """Test that warming before migrations only logs"""
+        invalidate_references()
+        with mock.patch.dict(REFERENCE_MODELS, {'letter': mock.Mock(**{'objects.filter.side_effect': DatabaseError})}), \
+                self.assertLogs('apps.learning.tracing', 'WARNING'):
+            warm_references()
+
+    def test_reference_api(self):
+        """Test fetching compact references for on-device checks"""
+        self.build()
+        self.client.login(email='child@test.com', password='testpass123')
+
+        response = self.client.get(reverse('learning:api_tracing_reference', args=['number', self.numbers[1].id]))
+        self.assertEqual(response.status_code, 200)
+        data = response.json()
+        self.assertEqual(len(data['points']), 48)
+        self.assertEqual(len(data['grid']), data['grid_size'] ** 2)
+
+        response = self.client.get(reverse('learning:api_tracing_references', args=['letter']))
+        self.assertEqual(
+            sorted(response.json()['references']),
+            sorted(str(letter.id) for letter in self.letters)
+        )
+
+        response = self.client.get(reverse('learning:api_tracing_reference', args=['shape', 1]))
+        self.assertEqual(response.status_code, 404)
+
+
+class ProgressRecordingTest(TestCase):
+    def setUp(self):
+        self.client = Client()
+
+        self.child_user = User.objects.create_user(
+            email='child@test.com',
+            username='childtest',
+            password='testpass123',
+            role='child',
+            first_name='Test',
+            last_name='Child'
+        )
+        self.other_child = User.objects.create_user(
+            email='other@test.com',
+            username='othertest',
+            password='testpass123',
+            role='child'
+        )
+        self.letters = [
+            Letter.objects.create(char=char, image=f'letters/{char}.png')
+            for char in 'ABCDEFGHIJ'
+        ]
+        self.numbers = [
+            Number.objects.create(value=value, image=f'numbers/{value}.png')
+            for value in range(1, 6)
+        ]
+        self.words = [
+            Word.objects.create(text=text, image=f'words/{text}.png', category=category)
+            for text, category in [('cat', 'animal'), ('dog', 'animal'), ('cup', 'object'), ('red', 'color')]
+        ]
+
+    def post_events(self, events):
+        return self.client.post(
+            reverse('learning:api_progress_events'),
+            data=json.dumps({'events': events}),
+            content_type='application/json'
+        )
+
+    def test_batch_is_folded_per_item(self):
+        """Test that repeated attempts in one batch add up on one row"""
+        events = [
+            {'type': 'number', 'id': self.numbers[0].id, 'completed': False},
+            {'type': 'number', 'id': self.numbers[0].id, 'completed': True},
+            {'type': 'number', 'id': self.numbers[1].id, 'completed': False},
+            {'type': 'word', 'id': self.words[0].id, 'completed': True},
+        ]
+        recorded, rejected = record_progress_events(self.child_user, events)
+
+        self.assertEqual(recorded, {'number': 2, 'word': 1})
+        self.assertEqual(rejected, [])
+        first = ChildNumberProgress.objects.get(child=self.child_user, number=self.numbers[0])
+        second = ChildNumberProgress.objects.get(child=self.child_user, number=self.numbers[1])
+        self.assertEqual((first.attempts, first.completed), (2, True))
+        self.assertEqual((second.attempts, second.completed), (1, False))
+
+    def test_batches_accumulate(self):
+        """Test that later batches add attempts and never undo completion"""
+        number_id = self.numbers[0].id
+        record_progress_events(self.child_user, [{'type': 'number', 'id': number_id, 'completed': True}])
+        record_progress_events(self.child_user, [
+            {'type': 'number', 'id': number_id, 'completed': False},
+            {'type': 'number', 'id': number_id, 'completed': False},
+        ])
+
+        progress = ChildNumberProgress.objects.get(child=self.child_user, number_id=number_id)
+        self.assertEqual((progress.attempts, progress.completed), (3, True))
+
+    def test_batch_query_count(self):
+        """Test that a batch costs a fixed number of queries whatever its size"""
+        events = [{'type': 'letter', 'id': letter.id, 'completed': True} for letter in self.letters]
+        events += [{'type': 'word', 'id': word.id, 'completed': False} for word in self.words]
+
+        # Per type: existence check, upsert and increment, plus the savepoints;
+        # completed letters add the achievement check, count and award
+        with self.assertNumQueries(13):
+            record_progress_events(self.child_user, events)
+        self.assertEqual(ChildLetterProgress.objects.filter(child=self.child_user, completed=True).count(), 10)
+
+    def test_unknown_items_rejected(self):
+        """Test that malformed events and unknown ids are reported back"""
+        self.client.login(email='child@test.com', password='testpass123')
+        response = self.post_events([
+            {'type': 'letter', 'id': self.letters[0].id, 'completed': True},
+            {'type': 'letter', 'id': 9999, 'completed': True},
+            {'type': 'shape', 'id': 1},
+            'nonsense',
+        ])
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['recorded'], {'letter': 1})
+        self.assertEqual(response.json()['rejected'], [1, 2, 3])
+
+    def test_only_children_record(self):
+        """Test that staff accounts cannot record learning attempts"""
+        User.objects.create_user(
+            email='teacher@test.com',
+            username='teachertest',
+            password='testpass123',
+            role='teacher'
+        )
+        self.client.login(email='teacher@test.com', password='testpass123')
+        response = self.post_events([{'type': 'letter', 'id': self.letters[0].id, 'completed': True}])
+
+        self.assertEqual(response.status_code, 403)
+
+    def test_progress_summary(self):
+        """Test completion per letter, number and word category in three queries"""
+        record_progress_events(self.child_user, [
+            {'type': 'letter', 'id': self.letters[0].id, 'completed': True},
+            {'type': 'letter', 'id': self.letters[1].id, 'completed': False},
+            {'type': 'number', 'id': self.numbers[0].id, 'completed': True},
+            {'type': 'word', 'id': self.words[0].id, 'completed': True},
+            {'type': 'word', 'id': self.words[2].id, 'completed': False},
+        ])
+        # Another child's progress must not leak into the summary
+        record_progress_events(self.other_child, [
+            {'type': 'word', 'id': word.id, 'completed': True} for word in self.words
+        ])
+
+        with self.assertNumQueries(3):
+            summary = progress_summary(self.child_user)
+
+        self.assertEqual(summary['totals']['letters'], {'total': 10, 'completed': 1, 'percent': 10})
+        self.assertEqual(summary['totals']['numbers']['completed'], 1)
+        self.assertEqual(summary['letters'][1]['attempts'], 1)
+        categories = {row['category']: (row['completed'], row['total']) for row in summary['word_categories']}
+        self.assertEqual(categories, {'animal': (1, 2), 'object': (0, 1), 'color': (0, 1)})
+
+    def test_progress_dashboard(self):
+        """Test that the dashboard renders the child's progress"""
+        record_progress_events(self.child_user, [{'type': 'letter', 'id': self.letters[0].id, 'completed': True}])
+        self.client.login(email='child@test.com', password='testpass123')
+        response = self.client.get(reverse('learning:progress_dashboard'))
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.context['summary']['totals']['letters']['completed'], 1)
+
+
+class AchievementRulesTest(TestCase):
+    def setUp(self):
+        self.client = Client()
+
+        self.child_user = User.objects.create_user(
+            email='child@test.com',
+            username='childtest',
+            password='testpass123',
+            role='child',
+            first_name='Test',
+            last_name='Child'
+        )
+        self.letters = [
+            Letter.objects.create(char=char, image=f'letters/{char}.png')
+            for char in 'ABCDEFGHIJKL'
+        ]
+
+    def codes(self):
+        return set(Achievement.objects.filter(child=self.child_user).values_list('code', flat=True))
+
+    def complete_letters(self, letters):
+        record_progress_events(self.child_user, [
+            {'type': 'letter', 'id': letter.id, 'completed': True} for letter in letters
+        ])
+
+    def test_letter_rules_awarded_as_progress_grows(self):
+        """Test that letter thresholds are awarded once they are reached"""
+        self.complete_letters(self.letters[:1])
+        self.assertEqual(self.codes(), {'first_letter'})
+
+        self.complete_letters(self.letters[1:10])
+        self.assertEqual(self.codes(), {'first_letter', 'letters_10'})
+
+    def test_awarding_is_idempotent(self):
+        """Test that repeated events never award an achievement twice"""
+        self.complete_letters(self.letters[:1])
+        self.assertEqual(handle_event(self.child_user.id, LETTER_COMPLETED), [])
+        self.complete_letters(self.letters[:1])
+
+        self.assertEqual(Achievement.objects.filter(child=self.child_user, code='first_letter').count(), 1)
+
+    def test_earned_rules_skip_evaluation(self):
+        """Test that an event whose rules are all earned costs one query"""
+        handle_event(self.child_user.id, 'game_level_completed', value=5, scope='color-matching')
+
+        with self.assertNumQueries(1):
+            self.assertEqual(handle_event(self.child_user.id, 'game_level_completed', value=6, scope='color-matching'), [])
+        with self.assertNumQueries(0):
+            handle_event(self.child_user.id, 'unknown_event', value=100)
+
+    def test_game_level_rule_is_scoped(self):
+        """Test that only color matching levels count towards the color matching rule"""
+        self.assertEqual(handle_event(self.child_user.id, 'game_level_completed', value=9, scope='memory'), [])
+        self.assertEqual(
+            handle_event(self.child_user.id, 'game_level_completed', value=5, scope='color-matching'),
+            ['color_matching_5']
+        )
+
+    def test_save_game_result_awards_level(self):
+        """Test that completing color matching level 5 awards the achievement, whatever the game is called"""
+        game = Game.objects.create(name='Colour Pairs', slug='color-matching', description='Match colors')
+        session = GameSession.objects.create(child=self.child_user, game=game, level=5)
+        self.client.login(email='child@test.com', password='testpass123')
+
+        self.client.post(
+            reverse('games:save_result'),
+            data=json.dumps({'session_id': session.id, 'score': 50, 'completed': True}),
+            content_type='application/json'
+        )
+
+        self.assertIn('color_matching_5', self.codes())
+
+    def test_routine_streak_awarded(self):
+        """Test that completing a routine on the fifth day in a row awards the streak achievement"""
+        routine = Routine.objects.create(title='Morning', created_by=self.child_user)
+        task = Task.objects.create(routine=routine, title='Brush teeth', order=routine.next_task_order())
+        today = timezone.localdate()
+        for days_ago in range(1, 5):
+            record_completion(task, self.child_user.id, today - timedelta(days=days_ago))
+
+        TaskCompletion.objects.create(task=task, child=self.child_user)
+
+        self.assertIn('routine_streak_5', self.codes())
+
+    def test_backfill(self):
+        """Test awarding everything earned by existing progress in one pass"""
+        self.complete_letters(self.letters[:10])
+        Achievement.objects.all().delete()
+        game = Game.objects.create(name='Color Matching', slug='color-matching', description='Match colors')
+        GameSession.objects.create(child=self.child_user, game=game, level=6, completed=True)
+        GameSession.objects.create(child=self.child_user, game=game, level=2, completed=True)
+        routine = Routine.objects.create(title='Morning', created_by=self.child_user)
+        task = Task.objects.create(routine=routine, title='Brush teeth', order=routine.next_task_order())
+        start = timezone.localdate() - timedelta(days=20)
+        # A broken 3-day run followed by a 5-day run
+        for offset in [0, 1, 2, 4, 5, 6, 7, 8]:
+            record_completion(task, self.child_user.id, start + timedelta(days=offset))
+
+        self.assertEqual(backfill_achievements(), 4)
+        self.assertEqual(self.codes(), {'first_letter', 'letters_10', 'color_matching_5', 'routine_streak_5'})
+        self.assertEqual(backfill_achievements(), 0)
+
+
+class CatalogCacheTest(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.client = Client()
+
+        self.child_user = User.objects.create_user(
+            email='child@test.com',
+            username='childtest',
+            password='testpass123',
+            role='child'
+        )
+        self.other_user = User.objects.create_user(
+            email='other@test.com',
+            username='othertest',
+            password='testpass123',
+            role='child'
+        )
+        for char in 'ABab':
+            Letter.objects.create(char=char, image=f'letters/{char}.png', case='upper' if char.isupper() else 'lower')
+        Number.objects.create(value=3, image='numbers/3.png')
+        self.word = Word.objects.create(text='cat', image='words/cat.png', category='animal')
+        self.client.login(email='child@test.com', password='testpass123')
+
+    def test_repeat_page_load_is_not_modified(self):
+        """Test that a revalidated catalog page is a 304 without catalog queries"""
+        url = reverse('learning:alphabet_learning')
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        self.assertIn('ETag', response)
+        self.assertIn('Last-Modified', response)
+        self.assertIn('no-cache', response['Cache-Control'])
+
+        # Only the session and user lookups remain
+        with self.assertNumQueries(2):
+            response = self.client.get(url, HTTP_IF_NONE_MATCH=response['ETag'])
+        self.assertEqual(response.status_code, 304)
+
+    def test_if_modified_since(self):
+        """Test revalidation by Last-Modified"""
+        url = reverse('learning:number_detail', args=[3])
+        response = self.client.get(url)
+
+        response = self.client.get(url, HTTP_IF_MODIFIED_SINCE=response['Last-Modified'])
+        self.assertEqual(response.status_code, 304)
+
+    def test_saving_catalog_changes_etag(self):
+        """Test that editing the catalog invalidates cached pages"""
+        url = reverse('learning:word_detail', args=[self.word.id])
+        etag = self.client.get(url)['ETag']
+        version = get_catalog_version()
+
+        self.word.text = 'kitten'
+        self.word.save()
+
+        self.assertGreater(get_catalog_version(), version)
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertContains(response, 'kitten')
+
+    def test_etag_is_per_user(self):
+        """Test that another user's ETag does not produce a 304"""
+        url = reverse('learning:alphabet_learning')
+        etag = self.client.get(url)['ETag']
+
+        self.client.login(email='other@test.com', password='testpass123')
+        self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=etag).status_code, 200)
+
+    def test_letter_detail_prefers_exact_case(self):
+        """Test that upper and lower case letters resolve to their own pages"""
+        self.assertEqual(self.client.get(reverse('learning:letter_detail', args=['a'])).context['letter'].char, 'a')
+        self.assertEqual(self.client.get(reverse('learning:letter_detail', args=['A'])).context['letter'].char, 'A')
+        self.assertEqual(self.client.get(reverse('learning:letter_detail', args=['z'])).status_code, 404)
+
+    def test_catalog_api(self):
+        """Test the JSON catalog and its conditional GET"""
+        response = self.client.get(reverse('learning:api_catalog'))
+
+        data = response.json()
+        self.assertEqual([letter['char'] for letter in data['letters']], ['A', 'B', 'a', 'b'])
+        self.assertEqual(data['numbers'][0]['quantity_image'], None)
+        self.assertEqual(data['words'][0]['text'], 'cat')
+
+        response = self.client.get(reverse('learning:api_catalog'), HTTP_IF_NONE_MATCH=response['ETag'])
+        self.assertEqual(response.status_code, 304)
+
+    def test_profile_change_changes_etag(self):
+        """Test that a page showing the user is rebuilt after they edit their profile"""
+        url = reverse('learning:alphabet_learning')
+        etag = self.client.get(url)['ETag']
+
+        self.child_user.first_name = 'Zoe'
+        self.child_user.save()
+
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response['ETag'], etag)
+
+    def test_word_detail_does_not_load_catalog(self):
+        """Test that a word page reads one cached word, not the word catalog"""
+        url = reverse('learning:word_detail', args=[self.word.id])
+        self.assertContains(self.client.get(url), 'cat')
+        self.assertIsNone(cache.get(f'learning:catalog:words:{get_catalog_version()}'))
+
+        # Session and user lookups only, the word comes from the cache
+        with self.assertNumQueries(2):
+            self.assertContains(self.client.get(url), 'cat')
+        self.assertEqual(self.client.get(reverse('learning:word_detail', args=[999])).status_code, 404)
+
+
+
+class WordSearchTest(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.client = Client()
+
+        self.child_user = User.objects.create_user(
+            email='child@test.com',
+            username='childtest',
+            password='testpass123',
+            role='child'
+        )
+        for text, category in [
+            ('Elephant', 'animal'), ('Elk', 'animal'), ('Eagle', 'animal'),
+            ('Egg', 'food'), ('Eggplant', 'food'), ('Banana', 'food'),
+            ('Envelope', 'object'),
+        ]:
+            Word.objects.create(text=text, image=f'words/{text}.png', category=category)
+
+    def texts(self, results):
+        return [word.text for word in results.page]
+
+    def test_prefix_search(self):
+        """Test that prefix matches are case-insensitive and alphabetical"""
+        self.assertEqual(self.texts(search_words('el')), ['Elephant', 'Elk'])
+        self.assertEqual(self.texts(search_words('EGG')), ['Egg', 'Eggplant'])
+
+    def test_fuzzy_search(self):
+        """Test that misspellings still find the word"""
+        self.assertEqual(self.texts(search_words('elefant'))[:1], ['Elephant'])
+        self.assertIn('Banana', self.texts(search_words('bananna')))
+
+    def test_category_filter(self):
+        """Test that results stay inside the chosen category"""
+        self.assertEqual(self.texts(search_words('e', category='food')), ['Egg', 'Eggplant'])
+        self.assertEqual(self.texts(search_words('', category='animal')), ['Eagle', 'Elephant', 'Elk'])
+        # An unknown category is ignored rather than matching nothing
+        self.assertEqual(len(self.texts(search_words('e', category='planets'))), 6)
+
+    def test_index_kept_in_sync(self):
+        """Test that renaming, recategorising and deleting words update the index"""
+        word = Word.objects.get(text='Banana')
+        word.text = 'Mango'
+        word.category = 'color'
+        word.save()
+
+        self.assertEqual(self.texts(search_words('mango', category='color')), ['Mango'])
+        self.assertEqual(self.texts(search_words('banana')), [])
+
+        word.delete()
+        self.assertFalse(WordTrigram.objects.filter(word_id=word.id).exists())
+
+    def test_pagination(self):
+        """Test paging through search results"""
+        results = search_words('e', page=2, page_size=4)
+
+        self.assertEqual(results.page.number, 2)
+        self.assertEqual(results.page.paginator.count, 6)
+        self.assertEqual(self.texts(results), ['Elk', 'Envelope'])
+
+    def test_search_api(self):
+        """Test the JSON search endpoint"""
+        self.client.login(email='child@test.com', password='testpass123')
+        response = self.client.get(reverse('learning:api_word_search'), {'q': 'eg', 'category': 'food'})
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual([row['text'] for row in response.json()['results']], ['Egg', 'Eggplant'])
+
+        response = self.client.get(reverse('learning:word_learning'), {'q': 'elefant'})
+        self.assertContains(response, 'Elephant')
+
+    def test_search_speed(self):
+        """Test searching tens of thousands of words"""
+        rng = random.Random(3)
+        letters = 'abcdefghijklmnopqrstuvwxyz'
+        categories = [code for code, label in Word.CATEGORY_CHOICES]
+        Word.objects.bulk_create([
+            Word(
+                text=''.join(rng.choice(letters) for _ in range(rng.randint(4, 10))),
+                image='words/generated.png',
+                category=rng.choice(categories)
+            )
+            for _ in range(20000)
+        ], batch_size=2000)
+        rebuild_word_index()
+
+        queries = [('ele', None), ('elefant', None), ('qu', 'animal'), ('bananna', 'food'), ('zebra', None)]
+        start = time.perf_counter()
+        for query, category in queries:
+            list(search_words(query, category).page)
+        per_search = (time.perf_counter() - start) / len(queries)
+
+        self.assertLess(per_search, 0.02)
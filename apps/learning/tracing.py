@@ -0,0 +1,313 @@
+"""
+Handwriting scoring for letter tracing.
+
+Traces and reference paths are both reduced to the same shape before they are
+compared: every point is moved into a unit box (keeping the aspect ratio, so
+position and size on the canvas do not matter) and the strokes are resampled
+to ``RESAMPLE_POINTS`` evenly spaced points. Scoring then combines
+
+* coverage - how much of the reference the child traced,
+* accuracy - how much of the trace stays on the reference,
+* shape - a banded dynamic time warping distance, which rewards following the
+  reference in order.
+
+``Letter.tracing_data`` and ``Number.tracing_data`` hold the reference. The
+``build_tracing_references`` command precomputes it from font glyphs (see
+``make_reference_data``), including a grid of the resampled points for fast
+nearest-point checks; hand-entered ``{"strokes": [[[x, y], ...], ...]}`` in any
+coordinate space also works. All references are loaded into an in-process
+index when a server process starts (``warm_references``, called from the WSGI
+and ASGI entry points) and reloaded when any of them changes.
+"""
+from collections import namedtuple
+import logging
+import math
+import uuid
+
+from django.core.cache import cache
+from django.db import DatabaseError
+
+from .models import Letter, Number
+from .progress import record_attempts
+
+RESAMPLE_POINTS = 48
+DTW_BAND = RESAMPLE_POINTS // 4
+TOLERANCE = 0.12
+PASS_SCORE = 70
+MAX_POINTS = 5000
+# Cells must be at least TOLERANCE wide for the neighbour search in the grid
+GRID_SIZE = int(1 / TOLERANCE)
+REFERENCE_VERSION = 1
+
+REFERENCE_MODELS = {'letter': Letter, 'number': Number}
+VERSION_KEY = 'learning:tracing_version'
+
+Reference = namedtuple('Reference', ['points', 'grid'])
+
+_index = {}
+
+logger = logging.getLogger(__name__)
+
+
+def clean_strokes(strokes):
+    """Validate client input into a list of strokes of (x, y) float tuples"""
+    if not isinstance(strokes, list):
+        raise ValueError('strokes must be a list of point lists')
+    cleaned = []
+    total = 0
+    for stroke in strokes:
+        if not isinstance(stroke, list):
+            raise ValueError('strokes must be a list of point lists')
+        points = []
+        for point in stroke:
+            try:
+                x, y = point
+                points.append((float(x), float(y)))
+            except (TypeError, ValueError):
+                raise ValueError('points must be [x, y] pairs of numbers')
+        total += len(points)
+        if points:
+            cleaned.append(points)
+    if total > MAX_POINTS:
+        raise ValueError(f'A trace may contain at most {MAX_POINTS} points')
+    return cleaned
+
+
+def normalize(strokes):
+    """Fit strokes into the unit box, centred, keeping their aspect ratio"""
+    xs = [x for stroke in strokes for x, y in stroke]
+    ys = [y for stroke in strokes for x, y in stroke]
+    min_x, min_y = min(xs), min(ys)
+    width, height = max(xs) - min_x, max(ys) - min_y
+    scale = max(width, height) or 1.0
+    offset_x = 0.5 - width / scale / 2
+    offset_y = 0.5 - height / scale / 2
+    return [
+        [((x - min_x) / scale + offset_x, (y - min_y) / scale + offset_y) for x, y in stroke]
+        for stroke in strokes
+    ]
+
+
+def resample(strokes, count=RESAMPLE_POINTS):
+    """``count`` points spaced evenly along the strokes, in drawing order"""
+    lengths = [
+        sum(math.dist(stroke[i - 1], stroke[i]) for i in range(1, len(stroke)))
+        for stroke in strokes
+    ]
+    total = sum(lengths)
+    if not total:
+        return [strokes[0][0]] * count
+
+    step = total / (count - 1)
+    points = [strokes[0][0]]
+    carried = 0.0
+    for stroke, length in zip(strokes, lengths):
+        if not length:
+            continue
+        previous = stroke[0]
+        for current in stroke[1:]:
+            segment = math.dist(previous, current)
+            # Walk along the segment emitting a point every ``step``
+            while segment and carried + segment >= step and len(points) < count:
+                ratio = (step - carried) / segment
+                previous = (
+                    previous[0] + ratio * (current[0] - previous[0]),
+                    previous[1] + ratio * (current[1] - previous[1]),
+                )
+                points.append(previous)
+                segment = math.dist(previous, current)
+                carried = 0.0
+            carried += segment
+            previous = current
+    last = strokes[-1][-1]
+    while len(points) < count:
+        points.append(last)
+    return points
+
+
+def prepare_path(strokes, count=RESAMPLE_POINTS):
+    """Normalized, resampled path for cleaned strokes (None when empty)"""
+    if not strokes:
+        return None
+    return resample(normalize(strokes), count)
+
+
+def _cell(x, y):
+    return min(int(y * GRID_SIZE), GRID_SIZE - 1) * GRID_SIZE + min(int(x * GRID_SIZE), GRID_SIZE - 1)
+
+
+def build_grid(points):
+    """Bucket point indices into a ``GRID_SIZE`` x ``GRID_SIZE`` grid over the unit box"""
+    cells = [[] for _ in range(GRID_SIZE * GRID_SIZE)]
+    for index, (x, y) in enumerate(points):
+        cells[_cell(x, y)].append(index)
+    return cells
+
+
+def _count_within_tolerance(points, others, grid):
+    """How many ``points`` lie within ``TOLERANCE`` of one of ``others``.
+
+    Grid cells are at least ``TOLERANCE`` wide, so only the point's own cell
+    and its eight neighbours need checking.
+    """
+    limit = TOLERANCE * TOLERANCE
+    count = 0
+    for x, y in points:
+        cell = _cell(x, y)
+        row, col = divmod(cell, GRID_SIZE)
+        found = False
+        for r in range(max(row - 1, 0), min(row + 2, GRID_SIZE)):
+            for c in range(max(col - 1, 0), min(col + 2, GRID_SIZE)):
+                for index in grid[r * GRID_SIZE + c]:
+                    ox, oy = others[index]
+                    if (x - ox) ** 2 + (y - oy) ** 2 <= limit:
+                        found = True
+                        break
+                if found:
+                    break
+            if found:
+                break
+        count += found
+    return count
+
+
+def dtw_distance(path, reference, band=DTW_BAND):
+    """Mean point distance along the best warping path within ``band``"""
+    n, m = len(path), len(reference)
+    band = max(band, abs(n - m))
+    infinity = float('inf')
+    previous = [infinity] * (m + 1)
+    previous[0] = 0.0
+    for i in range(1, n + 1):
+        x, y = path[i - 1]
+        current = [infinity] * (m + 1)
+        for j in range(max(1, i - band), min(m, i + band) + 1):
+            rx, ry = reference[j - 1]
+            cost = ((x - rx) ** 2 + (y - ry) ** 2) ** 0.5
+            current[j] = cost + min(previous[j], current[j - 1], previous[j - 1])
+        previous = current
+    return previous[m] / max(n, m)
+
+
+def score_path(path, reference):
+    """Compare a prepared path with a ``Reference``"""
+    coverage = _count_within_tolerance(reference.points, path, build_grid(path)) / len(reference.points)
+    accuracy = _count_within_tolerance(path, reference.points, reference.grid) / len(path)
+    distance = dtw_distance(path, reference.points)
+    shape = max(0.0, 1 - distance / (2 * TOLERANCE))
+
+    score = round(100 * (0.4 * coverage + 0.4 * accuracy + 0.2 * shape))
+    return {
+        'score': score,
+        'passed': score >= PASS_SCORE,
+        'coverage': round(coverage, 3),
+        'accuracy': round(accuracy, 3),
+        'distance': round(distance, 4),
+    }
+
+
+def score_trace(reference, strokes):
+    """Score raw client strokes against a ``Reference``"""
+    path = prepare_path(clean_strokes(strokes))
+    if path is None:
+        return {'score': 0, 'passed': False, 'coverage': 0.0, 'accuracy': 0.0, 'distance': None}
+    return score_path(path, reference)
+
+
+def make_reference_data(strokes, source=''):
+    """Precomputed ``tracing_data`` for strokes in any coordinate space"""
+    strokes = normalize(clean_strokes(strokes))
+    points = resample(strokes)
+    return {
+        'version': REFERENCE_VERSION,
+        'source': source,
+        'strokes': [[[round(x, 3), round(y, 3)] for x, y in stroke] for stroke in strokes],
+        'points': [[round(x, 4), round(y, 4)] for x, y in points],
+        'grid': build_grid(points),
+    }
+
+
+def load_reference(data):
+    """``Reference`` from stored ``tracing_data``, or None if it has no strokes.
+
+    Precomputed data of the current version is used as is; anything else (hand
+    entered strokes, older versions) is prepared from its strokes.
+    """
+    if not isinstance(data, dict):
+        return None
+    if data.get('version') == REFERENCE_VERSION and len(data.get('points') or []) == RESAMPLE_POINTS:
+        return Reference([tuple(point) for point in data['points']], data['grid'])
+    try:
+        path = prepare_path(clean_strokes(data.get('strokes', [])))
+    except ValueError:
+        return None
+    if path is None:
+        return None
+    return Reference(path, build_grid(path))
+
+
+def compact_reference(reference):
+    """What a client needs to check traces on the device"""
+    return {
+        'points': [[round(x, 4), round(y, 4)] for x, y in reference.points],
+        'grid': reference.grid,
+        'grid_size': GRID_SIZE,
+        'tolerance': TOLERANCE,
+        'pass_score': PASS_SCORE,
+    }
+
+
+def _version():
+    # A random token rather than a counter, so a flushed cache can never hand
+    # back a version some process has already loaded
+    return cache.get_or_set(VERSION_KEY, lambda: uuid.uuid4().hex, None)
+
+
+def get_references(kind):
+    """Every reference of ``kind`` by object id, loaded once per process and version"""
+    version = _version()
+    if _index.get('version') != version:
+        _index.clear()
+        _index['version'] = version
+    references = _index.get(kind)
+    if references is None:
+        rows = REFERENCE_MODELS[kind].objects.filter(
+            tracing_data__isnull=False
+        ).values_list('id', 'tracing_data')
+        references = {}
+        for object_id, data in rows:
+            reference = load_reference(data)
+            if reference is not None:
+                references[object_id] = reference
+        _index[kind] = references
+    return references
+
+
+def warm_references():
+    """Load every reference kind into this process's index before the first trace is scored"""
+    try:
+        for kind in REFERENCE_MODELS:
+            get_references(kind)
+    except DatabaseError:
+        # e.g. not migrated yet; references then load on first use
+        logger.warning('Could not preload tracing references', exc_info=True)
+
+
+def get_reference(kind, object_id):
+    """``Reference`` for a letter or number id, or None"""
+    return get_references(kind).get(object_id)
+
+
+def invalidate_references():
+    """Make every process reload references on next use"""
+    cache.set(VERSION_KEY, uuid.uuid4().hex, None)
+
+
+def record_tracing_results(child, results):
+    """Add scored attempts to ``ChildLetterProgress``.
+
+    ``results`` is an iterable of ``(letter_id, score_result)``.
+    """
+    record_attempts(child, 'letter', [
+        (letter_id, result['passed'], result['score']) for letter_id, result in results
+    ])
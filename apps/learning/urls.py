@@ -12,4 +12,11 @@ urlpatterns = [
     path('words/', views.word_learning, name='word_learning'),
     path('words/<int:word_id>/', views.word_detail, name='word_detail'),
     path('progress/', views.progress_dashboard, name='progress_dashboard'),
+    path('api/progress/', views.api_progress_events, name='api_progress_events'),
+    path('api/catalog/', views.api_catalog, name='api_catalog'),
+    path('api/words/search/', views.api_word_search, name='api_word_search'),
+    path('api/tracing/<int:letter_id>/score/', views.api_score_trace, name='api_score_trace'),
+    path('api/tracing/score/', views.api_score_traces, name='api_score_traces'),
+    path('api/tracing/<str:kind>/references/', views.api_tracing_references, name='api_tracing_references'),
+    path('api/tracing/<str:kind>/<int:object_id>/reference/', views.api_tracing_reference, name='api_tracing_reference'),
 ] 
\ No newline at end of file
@@ -1,40 +1,229 @@
+import json
+
 from django.shortcuts import render, get_object_or_404
+from django.http import JsonResponse, Http404
+from django.views.decorators.cache import cache_control
+from django.views.decorators.csrf import csrf_exempt
+from django.views.decorators.http import require_POST, condition
 from .models import Letter, Number, Word, ChildLetterProgress, ChildNumberProgress, ChildWordProgress, Achievement
+from .catalog import (
+    catalog_items, catalog_data, find_letter, find_number, find_word,
+    page_etag, page_last_modified, data_etag
+)
+from .search import search_words
+from .progress import record_progress_events, progress_summary, MAX_BATCH_EVENTS
+from .tracing import score_trace, get_reference, compact_reference, get_references, record_tracing_results, REFERENCE_MODELS
 from django.contrib.auth.decorators import login_required
 
+MAX_BATCH_TRACES = 100
+
+def catalog_page(view):
+    """Conditional GET for pages built only from the catalog; browsers revalidate every load"""
+    view = condition(etag_func=page_etag, last_modified_func=page_last_modified)(view)
+    return cache_control(private=True, no_cache=True)(view)
+
 @login_required
+@catalog_page
 def alphabet_learning(request):
-    letters = Letter.objects.all().order_by('char')
+    letters = catalog_items('letters')
     return render(request, 'learning/alphabet_learning.html', {'letters': letters})
 
 @login_required
+@catalog_page
 def letter_detail(request, letter):
-    letter_obj = get_object_or_404(Letter, char__iexact=letter)
+    letter_obj = find_letter(letter)
+    if letter_obj is None:
+        raise Http404('No letter matches the given query.')
     return render(request, 'learning/letter_detail.html', {'letter': letter_obj})
 
+@csrf_exempt
+@login_required
+@require_POST
+def api_score_trace(request, letter_id):
+    """Score one letter trace; attempts are recorded when they pass or are final"""
+    reference = get_reference('letter', letter_id)
+    if reference is None:
+        return JsonResponse({'error': 'This letter has no reference path'}, status=404)
+
+    try:
+        data = json.loads(request.body)
+        result = score_trace(reference, data.get('strokes', []))
+    except (TypeError, ValueError, AttributeError) as e:
+        return JsonResponse({'error': str(e) or 'Invalid JSON'}, status=400)
+
+    if request.user.role == 'child' and (result['passed'] or data.get('final')):
+        record_tracing_results(request.user, [(letter_id, result)])
+    return JsonResponse(result)
+
+@csrf_exempt
+@login_required
+@require_POST
+def api_score_traces(request):
+    """Score a batch of traces, e.g. attempts queued while offline"""
+    try:
+        traces = json.loads(request.body).get('traces', [])
+    except (TypeError, ValueError, AttributeError):
+        return JsonResponse({'error': 'Invalid JSON'}, status=400)
+    if not isinstance(traces, list) or len(traces) > MAX_BATCH_TRACES:
+        return JsonResponse({'error': f'traces must be a list of at most {MAX_BATCH_TRACES} items'}, status=400)
+
+    results = []
+    scored = []
+    for trace in traces:
+        letter_id = trace.get('letter_id') if isinstance(trace, dict) else None
+        # bool is an int subclass, but never a letter id
+        if not isinstance(letter_id, int) or isinstance(letter_id, bool):
+            results.append({'error': 'letter_id must be an integer'})
+            continue
+        reference = get_reference('letter', letter_id)
+        if reference is None:
+            results.append({'letter_id': letter_id, 'error': 'Unknown letter or no reference path'})
+            continue
+        try:
+            result = score_trace(reference, trace.get('strokes', []))
+        except (TypeError, ValueError, AttributeError) as e:
+            results.append({'letter_id': letter_id, 'error': str(e)})
+            continue
+        results.append({'letter_id': letter_id, **result})
+        scored.append((letter_id, result))
+
+    if request.user.role == 'child':
+        record_tracing_results(request.user, scored)
+    return JsonResponse({'results': results})
+
+@login_required
+def api_tracing_reference(request, kind, object_id):
+    """Compact reference path of one letter or number for on-device checks"""
+    if kind not in REFERENCE_MODELS:
+        return JsonResponse({'error': 'Unknown reference kind'}, status=404)
+    reference = get_reference(kind, object_id)
+    if reference is None:
+        return JsonResponse({'error': 'No reference path'}, status=404)
+    return JsonResponse({'kind': kind, 'id': object_id, **compact_reference(reference)})
+
 @login_required
+def api_tracing_references(request, kind):
+    """Every compact reference path of a kind, to preload before going offline"""
+    if kind not in REFERENCE_MODELS:
+        return JsonResponse({'error': 'Unknown reference kind'}, status=404)
+    references = {
+        object_id: compact_reference(reference)
+        for object_id, reference in get_references(kind).items()
+    }
+    return JsonResponse({'kind': kind, 'references': references})
+
+@login_required
+@catalog_page
 def number_learning(request):
-    numbers = Number.objects.all().order_by('value')
+    numbers = catalog_items('numbers')
     return render(request, 'learning/number_learning.html', {'numbers': numbers})
 
 @login_required
+@catalog_page
 def number_detail(request, number):
-    number_obj = get_object_or_404(Number, value=number)
+    number_obj = find_number(number)
+    if number_obj is None:
+        raise Http404('No number matches the given query.')
     return render(request, 'learning/number_detail.html', {'number': number_obj})
 
 @login_required
+@catalog_page
 def word_learning(request):
-    categories = Word.CATEGORY_CHOICES
-    return render(request, 'learning/word_learning.html', {'categories': categories})
+    results = search_words(request.GET.get('q', ''), request.GET.get('category'), request.GET.get('page'))
+    context = {
+        'categories': Word.CATEGORY_CHOICES,
+        'page_obj': results.page,
+        'query': request.GET.get('q', ''),
+        'category': results.category,
+    }
+    return render(request, 'learning/word_learning.html', context)
 
 @login_required
+@catalog_page
 def word_detail(request, word_id):
-    word_obj = get_object_or_404(Word, id=word_id)
+    word_obj = find_word(word_id)
+    if word_obj is None:
+        raise Http404('No word matches the given query.')
     return render(request, 'learning/word_detail.html', {'word': word_obj})
 
+@login_required
+@cache_control(private=True, no_cache=True)
+@condition(etag_func=data_etag, last_modified_func=page_last_modified)
+def api_word_search(request):
+    """Prefix and fuzzy word search with category filter and pagination"""
+    results = search_words(request.GET.get('q', ''), request.GET.get('category'), request.GET.get('page'))
+    page = results.page
+    return JsonResponse({
+        'query': results.query,
+        'category': results.category,
+        'page': page.number,
+        'num_pages': page.paginator.num_pages,
+        'count': page.paginator.count,
+        'results': [
+            {'id': word.id, 'text': word.text, 'category': word.category, 'image': word.image.url if word.image else None}
+            for word in page.object_list
+        ],
+    })
+
+@login_required
+@cache_control(private=True, no_cache=True)
+@condition(etag_func=data_etag, last_modified_func=page_last_modified)
+def api_catalog(request):
+    """Letters, numbers and words for the client to cache locally"""
+    return JsonResponse(catalog_data())
+
+def _viewable_children(user):
+    """Child profiles whose learning progress ``user`` may see"""
+    if user.role == 'parent':
+        return user.parent_profile.children.select_related('user')
+    if user.role == 'therapist':
+        return user.therapist_profile.assigned_children.select_related('user')
+    if user.role == 'teacher':
+        return user.teacher_profile.assigned_children.select_related('user')
+    return None
+
 @login_required
 def progress_dashboard(request):
-    return render(request, 'learning/progress_dashboard.html')
+    user = request.user
+    children = None
+    if user.role == 'child':
+        child = user
+    else:
+        children = _viewable_children(user)
+        if children is None:
+            return render(request, 'learning/progress_dashboard.html', {'summary': None})
+        child_id = request.GET.get('child_id')
+        if child_id:
+            child = get_object_or_404(children, id=child_id).user
+        else:
+            first = children.first()
+            child = first.user if first else None
+
+    context = {
+        'child': child,
+        'children': children,
+        'summary': progress_summary(child) if child else None,
+        'achievements': Achievement.objects.filter(child=child).order_by('-achieved_on') if child else [],
+    }
+    return render(request, 'learning/progress_dashboard.html', context)
+
+@csrf_exempt
+@login_required
+@require_POST
+def api_progress_events(request):
+    """Record a batch of learning attempts from the learning pages"""
+    if request.user.role != 'child':
+        return JsonResponse({'error': 'Only children record learning progress'}, status=403)
+
+    try:
+        events = json.loads(request.body).get('events', [])
+    except (TypeError, ValueError, AttributeError):
+        return JsonResponse({'error': 'Invalid JSON'}, status=400)
+    if not isinstance(events, list) or len(events) > MAX_BATCH_EVENTS:
+        return JsonResponse({'error': f'events must be a list of at most {MAX_BATCH_EVENTS} items'}, status=400)
+
+    recorded, rejected = record_progress_events(request.user, events)
+    return JsonResponse({'success': True, 'recorded': recorded, 'rejected': rejected})
 
 def learning_dashboard(request):
     return render(request, 'learning/dashboard.html')
@@ -1,5 +1,5 @@
 from django.contrib import admin
-from .models import Routine, Task, TaskCompletion, RoutineSchedule
+from .models import Routine, Task, TaskCompletion, RoutineSchedule, DailyRoutineCompletion
 
 
 @admin.register(Routine)
@@ -17,7 +17,7 @@ class RoutineAdmin(admin.ModelAdmin):
 
 @admin.register(Task)
 class TaskAdmin(admin.ModelAdmin):
-    list_display = ['title', 'routine', 'order', 'estimated_duration', 'is_required']
+    list_display = ['title', 'routine', 'order', 'slot', 'estimated_duration', 'is_required']
     list_filter = ['is_required', 'routine__is_active', 'created_at']
     search_fields = ['title', 'description', 'routine__title']
     ordering = ['routine', 'order']
@@ -39,3 +39,12 @@ class RoutineScheduleAdmin(admin.ModelAdmin):
     list_filter = ['day_of_week', 'is_active', 'routine__is_active']
     search_fields = ['routine__title', 'child__email']
     ordering = ['day_of_week', 'start_time']
+
+
+@admin.register(DailyRoutineCompletion)
+class DailyRoutineCompletionAdmin(admin.ModelAdmin):
+    list_display = ['routine', 'child', 'date', 'completed_count', 'updated_at']
+    list_filter = ['date', 'routine__is_active']
+    search_fields = ['routine__title', 'child__email']
+    readonly_fields = ['updated_at']
+    date_hierarchy = 'date'
@@ -0,0 +1,170 @@
+"""
+Routine adherence analytics.
+
+Built on the daily completion bitmaps: one grouped query loads every
+(child, day) bitmap of a routine for the range, one grouped query buckets task
+completions by hour, and the rest is integer arithmetic over those rows.
+Results are cached per (routine, range, children) and invalidated by bumping
+a per-routine version whenever completions or tasks change.
+"""
+from datetime import datetime, timedelta
+import hashlib
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.db.models import Count
+from django.db.models.functions import ExtractHour
+from django.utils import timezone
+
+from .models import TaskCompletion, DailyRoutineCompletion
+
+User = get_user_model()
+
+VERSION_KEY = 'routines:analytics_version:{routine_id}'
+RESULT_KEY = 'routines:analytics:{routine_id}:{version}:{start}:{end}:{children_hash}'
+CACHE_TIMEOUT = 60 * 60
+
+
+def _version(routine_id):
+    return cache.get_or_set(VERSION_KEY.format(routine_id=routine_id), 1, None)
+
+
+def invalidate_routine_analytics(routine_id):
+    """Make cached analytics for a routine stale"""
+    key = VERSION_KEY.format(routine_id=routine_id)
+    try:
+        cache.incr(key)
+    except ValueError:
+        cache.set(key, 1, None)
+
+
+def _streaks(full_days, days):
+    """Current and longest run of full days; an unfinished last day does not break the current run"""
+    longest = run = 0
+    for full in full_days:
+        run = run + 1 if full else 0
+        longest = max(longest, run)
+
+    current = 0
+    last = days - 1
+    if last >= 0 and not full_days[last]:
+        last -= 1
+    while last >= 0 and full_days[last]:
+        current += 1
+        last -= 1
+    return current, longest
+
+
+def _day_bounds(start, end):
+    tz = timezone.get_current_timezone()
+    return (
+        timezone.make_aware(datetime.combine(start, datetime.min.time()), tz),
+        timezone.make_aware(datetime.combine(end + timedelta(days=1), datetime.min.time()), tz),
+    )
+
+
+def compute_routine_analytics(routine, child_ids, start, end):
+    """Adherence, streaks and completion-time distributions for ``child_ids``"""
+    days = (end - start).days + 1
+    tasks = list(routine.tasks.values_list('id', 'title', 'slot', 'is_required'))
+    required_mask = 0
+    for task_id, title, slot, is_required in tasks:
+        if is_required:
+            required_mask |= 1 << slot
+    required_count = required_mask.bit_count()
+
+    # Day-by-day bitmaps for every child, zero where nothing was completed
+    grid = {child_id: [0] * days for child_id in child_ids}
+    rows = DailyRoutineCompletion.objects.filter(
+        routine=routine,
+        child_id__in=child_ids,
+        date__range=(start, end)
+    ).values_list('child_id', 'date', 'completed_tasks')
+    for child_id, date, bitmap in rows:
+        grid[child_id][(date - start).days] = bitmap
+
+    names = {
+        user_id: (f"{first_name} {last_name}".strip() or email)
+        for user_id, first_name, last_name, email in User.objects.filter(
+            id__in=child_ids
+        ).values_list('id', 'first_name', 'last_name', 'email')
+    }
+
+    children = []
+    for child_id in child_ids:
+        masked = [bitmap & required_mask for bitmap in grid[child_id]]
+        if required_count:
+            daily = [round(value.bit_count() / required_count, 3) for value in masked]
+        else:
+            daily = [0.0] * days
+        full_days = [bool(required_mask) and value == required_mask for value in masked]
+        current_streak, longest_streak = _streaks(full_days, days)
+        children.append({
+            'child_id': child_id,
+            'name': names.get(child_id, ''),
+            'daily': daily,
+            'adherence': round(sum(full_days) / days * 100, 1) if days else 0.0,
+            'current_streak': current_streak,
+            'longest_streak': longest_streak,
+        })
+
+    # Completion times of day, bucketed by hour for each task
+    range_start, range_end = _day_bounds(start, end)
+    by_hour = {task_id: [0] * 24 for task_id, title, slot, is_required in tasks}
+    buckets = TaskCompletion.objects.filter(
+        task__routine=routine,
+        child_id__in=child_ids,
+        completed_at__gte=range_start,
+        completed_at__lt=range_end
+    ).annotate(
+        hour=ExtractHour('completed_at')
+    ).values_list('task_id', 'hour').annotate(count=Count('id')).order_by()
+    for task_id, hour, count in buckets:
+        if task_id in by_hour:
+            by_hour[task_id][hour] += count
+
+    task_stats = []
+    for task_id, title, slot, is_required in tasks:
+        histogram = by_hour[task_id]
+        total = sum(histogram)
+        median_hour = None
+        seen = 0
+        for hour, count in enumerate(histogram):
+            seen += count
+            if total and seen * 2 >= total:
+                median_hour = hour
+                break
+        task_stats.append({
+            'task_id': task_id,
+            'title': title,
+            'is_required': is_required,
+            'completions': total,
+            'by_hour': histogram,
+            'median_hour': median_hour,
+        })
+
+    return {
+        'routine_id': routine.id,
+        'start': start.isoformat(),
+        'end': end.isoformat(),
+        'dates': [(start + timedelta(days=offset)).isoformat() for offset in range(days)],
+        'children': children,
+        'tasks': task_stats,
+    }
+
+
+def routine_analytics(routine, child_ids, start, end):
+    """Cached ``compute_routine_analytics``"""
+    child_ids = sorted(set(child_ids))
+    key = RESULT_KEY.format(
+        routine_id=routine.id,
+        version=_version(routine.id),
+        start=start.isoformat(),
+        end=end.isoformat(),
+        children_hash=hashlib.md5(','.join(map(str, child_ids)).encode()).hexdigest()
+    )
+    result = cache.get(key)
+    if result is None:
+        result = compute_routine_analytics(routine, child_ids, start, end)
+        cache.set(key, result, CACHE_TIMEOUT)
+    return result
@@ -5,3 +5,6 @@ class RoutinesConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'apps.routines'
     verbose_name = 'Routines'
+
+    def ready(self):
+        from . import signals  # noqa: F401
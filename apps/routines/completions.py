@@ -0,0 +1,118 @@
+"""
+Daily task-completion bitmaps.
+
+Every ``TaskCompletion`` also sets the task's bit in the matching
+``DailyRoutineCompletion`` row, so "what did this child finish today" and
+streak/adherence questions are answered from one row per day instead of
+date-function queries over ``TaskCompletion``.
+"""
+from datetime import timedelta
+
+from django.db.models import F
+from django.utils import timezone
+
+from .models import TaskCompletion, DailyRoutineCompletion
+
+
+def required_mask(routine):
+    """Bitmap with the bits of the routine's required tasks set"""
+    mask = 0
+    for slot in routine.tasks.filter(is_required=True).values_list('slot', flat=True):
+        mask |= 1 << slot
+    return mask
+
+
+def record_completion(task, child_id, date):
+    """Set the task's bit for ``date``, creating the day's row if needed"""
+    row, created = DailyRoutineCompletion.objects.get_or_create(
+        child_id=child_id,
+        routine_id=task.routine_id,
+        date=date,
+        defaults={'completed_tasks': task.bit}
+    )
+    if not created:
+        DailyRoutineCompletion.objects.filter(pk=row.pk).update(
+            completed_tasks=F('completed_tasks').bitor(task.bit),
+            updated_at=timezone.now()
+        )
+
+
+def clear_completion(task, child_id, date):
+    """Clear the task's bit for ``date`` unless another completion remains that day"""
+    still_completed = TaskCompletion.objects.filter(
+        task=task,
+        child_id=child_id,
+        completed_at__date=date
+    ).exists()
+    if not still_completed:
+        DailyRoutineCompletion.objects.filter(
+            child_id=child_id,
+            routine_id=task.routine_id,
+            date=date
+        ).update(
+            completed_tasks=F('completed_tasks').bitand(~task.bit),
+            updated_at=timezone.now()
+        )
+
+
+def completed_bitmap(routine, child_id, date=None):
+    """Bitmap of the tasks a child completed in a routine on ``date`` (default today)"""
+    date = date or timezone.localdate()
+    bitmap = DailyRoutineCompletion.objects.filter(
+        child_id=child_id,
+        routine=routine,
+        date=date
+    ).values_list('completed_tasks', flat=True).first()
+    return bitmap or 0
+
+
+def is_task_completed(task, child_id, date=None):
+    return bool(completed_bitmap(task.routine, child_id, date) & task.bit)
+
+
+def completed_task_ids(routine, tasks, child_id, date=None):
+    """Ids of ``tasks`` completed by a child on ``date``"""
+    bitmap = completed_bitmap(routine, child_id, date)
+    return [task.id for task in tasks if bitmap & task.bit]
+
+
+def daily_bitmaps(routine, child_id, start, end):
+    """Map each date in [start, end] with any completion to its bitmap"""
+    return dict(DailyRoutineCompletion.objects.filter(
+        child_id=child_id,
+        routine=routine,
+        date__range=(start, end)
+    ).values_list('date', 'completed_tasks'))
+
+
+def adherence(routine, child_id, start, end):
+    """Share of days in [start, end] on which every required task was completed"""
+    mask = required_mask(routine)
+    days = (end - start).days + 1
+    if days <= 0 or not mask:
+        return 0.0
+    bitmaps = daily_bitmaps(routine, child_id, start, end)
+    full_days = sum(1 for bitmap in bitmaps.values() if bitmap & mask == mask)
+    return round(full_days / days * 100, 1)
+
+
+def current_streak(routine, child_id, end=None, max_days=366):
+    """Consecutive days up to ``end`` on which every required task was completed.
+
+    ``end`` itself only breaks the streak once it is over, so a routine not yet
+    finished today still shows yesterday's streak.
+    """
+    end = end or timezone.localdate()
+    mask = required_mask(routine)
+    if not mask:
+        return 0
+    bitmaps = daily_bitmaps(routine, child_id, end - timedelta(days=max_days), end)
+
+    streak = 0
+    day = end
+    if bitmaps.get(day, 0) & mask != mask:
+        day -= timedelta(days=1)
+    while bitmaps.get(day, 0) & mask == mask:
+        streak += 1
+        day -= timedelta(days=1)
+    return streak
@@ -167,4 +167,33 @@ class TaskReorderForm(forms.Form):
             except Task.DoesNotExist:
                 raise forms.ValidationError("Task not found")
         
-        return cleaned_data 
\ No newline at end of file
+        return cleaned_data 
+
+
+class TaskMoveForm(forms.Form):
+    """Form for moving a single task after another task via AJAX"""
+    task_id = forms.IntegerField()
+    after_task_id = forms.IntegerField(required=False)
+    
+    def clean(self):
+        cleaned_data = super().clean()
+        task_id = cleaned_data.get('task_id')
+        after_task_id = cleaned_data.get('after_task_id')
+        
+        if task_id:
+            try:
+                task = Task.objects.select_related('routine').get(id=task_id)
+                cleaned_data['task'] = task
+            except Task.DoesNotExist:
+                raise forms.ValidationError("Task not found")
+            
+            cleaned_data['after_task'] = None
+            if after_task_id == task_id:
+                raise forms.ValidationError("A task cannot be moved after itself")
+            if after_task_id:
+                try:
+                    cleaned_data['after_task'] = Task.objects.get(id=after_task_id, routine_id=task.routine_id)
+                except Task.DoesNotExist:
+                    raise forms.ValidationError("Task not found")
+        
+        return cleaned_data
@@ -0,0 +1,53 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.utils import timezone
+from apps.routines.models import TaskCompletion, DailyRoutineCompletion
+from apps.routines.analytics import invalidate_routine_analytics
+
+
+class Command(BaseCommand):
+    help = 'Rebuild daily routine completion bitmaps from task completions, replacing the existing ones'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=1000,
+            help='Number of bitmap rows written per query'
+        )
+
+    def handle(self, *args, **options):
+        batch_size = options['batch_size']
+        self.stdout.write('Rebuilding daily completion bitmaps...')
+
+        # One streaming pass over completions, OR-ing each task's bit into its day
+        bitmaps = {}
+        completions = TaskCompletion.objects.values_list(
+            'child_id', 'task__routine_id', 'task__slot', 'completed_at'
+        ).iterator(chunk_size=batch_size)
+        for child_id, routine_id, slot, completed_at in completions:
+            key = (child_id, routine_id, timezone.localdate(completed_at))
+            bitmaps[key] = bitmaps.get(key, 0) | (1 << slot)
+
+        now = timezone.now()
+        rows = [
+            DailyRoutineCompletion(
+                child_id=child_id,
+                routine_id=routine_id,
+                date=date,
+                completed_tasks=bitmap,
+                updated_at=now
+            )
+            for (child_id, routine_id, date), bitmap in bitmaps.items()
+        ]
+
+        # Days whose completions were deleted must lose their bitmaps too, so replace every row
+        with transaction.atomic():
+            routine_ids = set(DailyRoutineCompletion.objects.values_list('routine_id', flat=True).distinct())
+            DailyRoutineCompletion.objects.all().delete()
+            DailyRoutineCompletion.objects.bulk_create(rows, batch_size=batch_size)
+
+        for routine_id in routine_ids | {routine_id for child_id, routine_id, date in bitmaps}:
+            invalidate_routine_analytics(routine_id)
+
+        self.stdout.write(self.style.SUCCESS(f'Rebuilt {len(rows)} daily completion bitmaps'))
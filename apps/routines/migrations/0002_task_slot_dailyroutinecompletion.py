@@ -0,0 +1,71 @@
+# Generated by Django 5.2.4 on 2026-10-19 11:57
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+# Task.MAX_SLOTS when the bitmaps were added: a bitmap is a signed 64-bit integer
+MAX_SLOTS = 63
+
+
+def assign_task_slots(apps, schema_editor):
+    """Number each routine's tasks from 0; routines with more tasks than bitmap bits stop the migration"""
+    Task = apps.get_model('routines', 'Task')
+    too_long = list(
+        Task.objects.values('routine_id').annotate(count=models.Count('id')).filter(
+            count__gt=MAX_SLOTS
+        ).values_list('routine_id', flat=True)
+    )
+    if too_long:
+        raise RuntimeError(
+            f'Routines {too_long} have more than {MAX_SLOTS} tasks, which completion bitmaps cannot hold. '
+            'Split them into smaller routines, then migrate again.'
+        )
+    tasks = list(Task.objects.order_by('routine_id', 'order', 'id'))
+    slots = {}
+    for task in tasks:
+        task.slot = slots.get(task.routine_id, 0)
+        slots[task.routine_id] = task.slot + 1
+    Task.objects.bulk_update(tasks, ['slot'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('routines', '0001_initial'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='task',
+            name='slot',
+            field=models.PositiveSmallIntegerField(editable=False, help_text='Stable bit position of this task in daily completion bitmaps', null=True),
+        ),
+        migrations.RunPython(assign_task_slots, migrations.RunPython.noop),
+        migrations.AlterField(
+            model_name='task',
+            name='slot',
+            field=models.PositiveSmallIntegerField(editable=False, help_text='Stable bit position of this task in daily completion bitmaps'),
+        ),
+        migrations.AlterUniqueTogether(
+            name='task',
+            unique_together={('routine', 'order'), ('routine', 'slot')},
+        ),
+        migrations.CreateModel(
+            name='DailyRoutineCompletion',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('date', models.DateField()),
+                ('completed_tasks', models.BigIntegerField(default=0, help_text='Bit n is set when the task with slot n was completed')),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('child', models.ForeignKey(limit_choices_to={'role': 'child'}, on_delete=django.db.models.deletion.CASCADE, related_name='daily_routine_completions', to=settings.AUTH_USER_MODEL)),
+                ('routine', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='daily_completions', to='routines.routine')),
+            ],
+            options={
+                'ordering': ['-date'],
+                'unique_together': {('child', 'routine', 'date')},
+            },
+        ),
+    ]
@@ -1,4 +1,5 @@
-from django.db import models
+from django.db import models, transaction
+from django.db.models import Max
 from django.conf import settings
 from django.utils.translation import gettext_lazy as _
 
@@ -26,10 +27,84 @@ class Routine(models.Model):
     
     def __str__(self):
         return self.title
+    
+    def next_task_order(self):
+        """Order value for a task appended to the end of this routine"""
+        max_order = self.tasks.aggregate(max_order=Max('order'))['max_order']
+        return (max_order or 0) + Task.ORDER_GAP
+    
+    def reorder_tasks(self, task_ids):
+        """Apply a complete new task ordering with a single bulk update.
+        
+        ``task_ids`` must list every task of the routine exactly once.
+        Orders are spaced ``Task.ORDER_GAP`` apart so later moves usually
+        only need to touch one row (see ``move_task``).
+        """
+        task_ids = [int(task_id) for task_id in task_ids]
+        
+        with transaction.atomic():
+            tasks = {task.id: task for task in self.tasks.select_for_update()}
+            if len(task_ids) != len(set(task_ids)) or set(task_ids) != set(tasks):
+                raise ValueError("The new ordering must contain every task of the routine exactly once.")
+            
+            # Rows are checked against the (routine, order) unique constraint one
+            # at a time, so the new values must not clash with any current value.
+            order_owners = {task.order: task.id for task in tasks.values()}
+            start = Task.ORDER_GAP
+            if any(order_owners.get(start + i * Task.ORDER_GAP, task_id) != task_id
+                   for i, task_id in enumerate(task_ids)):
+                start = max(order_owners) + Task.ORDER_GAP
+            
+            changed = []
+            for i, task_id in enumerate(task_ids):
+                task = tasks[task_id]
+                new_order = start + i * Task.ORDER_GAP
+                if task.order != new_order:
+                    task.order = new_order
+                    changed.append(task)
+            
+            if changed:
+                Task.objects.bulk_update(changed, ['order'])
+            return len(changed)
+    
+    def move_task(self, task, after_task=None):
+        """Move ``task`` directly after ``after_task`` (or to the front when None).
+        
+        The task takes the midpoint between its new neighbours, so only one
+        row is written; when the neighbours are adjacent the whole routine is
+        respaced with ``reorder_tasks``. The routine's task rows are locked
+        first, so concurrent moves into the same gap cannot pick the same order.
+        """
+        with transaction.atomic():
+            rows = self.tasks.select_for_update().order_by('order').values_list('id', 'order')
+            others = [(task_id, order) for task_id, order in rows if task_id != task.id]
+            ordered_ids = [task_id for task_id, order in others]
+            
+            position = ordered_ids.index(after_task.id) + 1 if after_task else 0
+            prev_order = others[position - 1][1] if position > 0 else 0
+            if position < len(others):
+                next_order = others[position][1]
+            else:
+                next_order = prev_order + 2 * Task.ORDER_GAP
+            
+            if next_order - prev_order > 1:
+                task.order = (prev_order + next_order) // 2
+                task.save(update_fields=['order'])
+                return 1
+            
+            ordered_ids.insert(position, task.id)
+            changed = self.reorder_tasks(ordered_ids)
+        task.refresh_from_db(fields=['order'])
+        return changed
 
 
 class Task(models.Model):
     """Individual task within a routine"""
+    # Spacing between consecutive task orders, leaving room to insert between them
+    ORDER_GAP = 1024
+    # Each task owns one bit of DailyRoutineCompletion.completed_tasks
+    MAX_SLOTS = 63
+    
     routine = models.ForeignKey(
         Routine,
         on_delete=models.CASCADE,
@@ -44,6 +119,10 @@ class Task(models.Model):
         help_text=_('Visual representation of the task')
     )
     order = models.PositiveIntegerField(default=0)
+    slot = models.PositiveSmallIntegerField(
+        editable=False,
+        help_text=_('Stable bit position of this task in daily completion bitmaps')
+    )
     estimated_duration = models.PositiveIntegerField(
         default=5,
         help_text=_('Estimated duration in minutes')
@@ -53,10 +132,24 @@ class Task(models.Model):
     
     class Meta:
         ordering = ['order']
-        unique_together = ['routine', 'order']
+        unique_together = [['routine', 'order'], ['routine', 'slot']]
     
     def __str__(self):
         return f"{self.routine.title} - {self.title}"
+    
+    def save(self, *args, **kwargs):
+        # Take the lowest bitmap slot not used by another task of the routine
+        if self.slot is None:
+            used_slots = set(Task.objects.filter(routine_id=self.routine_id).values_list('slot', flat=True))
+            free_slots = [slot for slot in range(self.MAX_SLOTS) if slot not in used_slots]
+            if not free_slots:
+                raise ValueError(f"A routine can have at most {self.MAX_SLOTS} tasks.")
+            self.slot = free_slots[0]
+        super().save(*args, **kwargs)
+    
+    @property
+    def bit(self):
+        return 1 << self.slot
 
 
 class TaskCompletion(models.Model):
@@ -90,6 +183,41 @@ class TaskCompletion(models.Model):
         return f"{self.child.get_full_name()} completed {self.task.title}"
 
 
+class DailyRoutineCompletion(models.Model):
+    """Bitmap of the tasks a child completed in a routine on one day"""
+    child = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.CASCADE,
+        related_name='daily_routine_completions',
+        limit_choices_to={'role': 'child'}
+    )
+    routine = models.ForeignKey(
+        Routine,
+        on_delete=models.CASCADE,
+        related_name='daily_completions'
+    )
+    date = models.DateField()
+    completed_tasks = models.BigIntegerField(
+        default=0,
+        help_text=_('Bit n is set when the task with slot n was completed')
+    )
+    updated_at = models.DateTimeField(auto_now=True)
+    
+    class Meta:
+        unique_together = ['child', 'routine', 'date']
+        ordering = ['-date']
+    
+    def __str__(self):
+        return f"{self.child.get_full_name()} - {self.routine.title} - {self.date}"
+    
+    def is_completed(self, task):
+        return bool(self.completed_tasks & task.bit)
+    
+    @property
+    def completed_count(self):
+        return self.completed_tasks.bit_count()
+
+
 class RoutineSchedule(models.Model):
     """Schedule when routines should be performed"""
     routine = models.ForeignKey(
@@ -0,0 +1,150 @@
+"""
+Routine scheduling engine.
+
+Weekly ``RoutineSchedule`` rows are expanded into a sorted interval index per
+child, measured in minutes since Monday 00:00. The week is repeated three
+times so occurrences that wrap past Sunday midnight, and look-ahead windows
+that run into next week, need no special cases. Lookups are a bisect into the
+index, which is kept in the cache and dropped for a single child whenever one
+of their schedules (or a scheduled routine) changes.
+"""
+import bisect
+from collections import namedtuple
+from datetime import datetime, timedelta
+
+from django.core.cache import cache
+from django.db.models import Sum
+from django.utils import timezone
+
+from .models import RoutineSchedule
+
+MINUTES_PER_DAY = 24 * 60
+MINUTES_PER_WEEK = 7 * MINUTES_PER_DAY
+
+# Used when a schedule has no end time and its routine has no tasks yet
+DEFAULT_DURATION_MINUTES = 30
+
+CACHE_KEY = 'routines:schedule_index:{child_id}'
+CACHE_TIMEOUT = 24 * 60 * 60
+
+ScheduleEntry = namedtuple('ScheduleEntry', ['start', 'end', 'schedule_id', 'routine_id', 'routine_title'])
+Occurrence = namedtuple('Occurrence', ['schedule_id', 'routine_id', 'routine_title', 'starts_at', 'ends_at'])
+
+
+def _minute_of_week(day_of_week, value):
+    return day_of_week * MINUTES_PER_DAY + value.hour * 60 + value.minute
+
+
+class ScheduleIndex:
+    """Sorted weekly intervals for one child"""
+
+    def __init__(self, entries):
+        self.entries = sorted(entries)
+        self.starts = [entry.start for entry in self.entries]
+        self.longest = max((entry.end - entry.start for entry in self.entries), default=0)
+
+    def current(self, minute):
+        """Entries whose interval contains ``minute``"""
+        position = bisect.bisect_right(self.starts, minute)
+        result = []
+        # Only entries starting within the longest duration can still be running
+        while position > 0 and self.starts[position - 1] > minute - self.longest:
+            position -= 1
+            if self.entries[position].end > minute:
+                result.append(self.entries[position])
+        result.reverse()
+        return result
+
+    def upcoming(self, minute, within, limit=None):
+        """Entries starting after ``minute`` and no later than ``minute + within``"""
+        first = bisect.bisect_right(self.starts, minute)
+        last = bisect.bisect_right(self.starts, minute + within)
+        if limit is not None:
+            last = min(last, first + limit)
+        return self.entries[first:last]
+
+
+def build_schedule_index(child_id):
+    """Build the interval index for one child from the database"""
+    schedules = RoutineSchedule.objects.filter(
+        child_id=child_id,
+        is_active=True,
+        routine__is_active=True
+    ).annotate(
+        task_minutes=Sum('routine__tasks__estimated_duration')
+    ).values_list(
+        'id', 'routine_id', 'routine__title', 'day_of_week', 'start_time', 'end_time', 'task_minutes'
+    )
+
+    entries = []
+    for schedule_id, routine_id, title, day_of_week, start_time, end_time, task_minutes in schedules:
+        start = _minute_of_week(day_of_week, start_time)
+        if end_time:
+            end = _minute_of_week(day_of_week, end_time)
+            if end <= start:
+                end += MINUTES_PER_DAY  # runs past midnight
+        else:
+            end = start + (task_minutes or DEFAULT_DURATION_MINUTES)
+
+        for week in range(3):
+            offset = week * MINUTES_PER_WEEK
+            entries.append(ScheduleEntry(start + offset, end + offset, schedule_id, routine_id, title))
+
+    return ScheduleIndex(entries)
+
+
+def get_schedule_index(child_id):
+    """Return the cached interval index for a child, building it on a miss"""
+    key = CACHE_KEY.format(child_id=child_id)
+    index = cache.get(key)
+    if index is None:
+        index = build_schedule_index(child_id)
+        cache.set(key, index, CACHE_TIMEOUT)
+    return index
+
+
+def invalidate_schedule_index(child_id):
+    """Drop a child's cached index so the next lookup rebuilds it"""
+    cache.delete(CACHE_KEY.format(child_id=child_id))
+
+
+def _week_start(now):
+    local_now = timezone.localtime(now)
+    monday = local_now.date() - timedelta(days=local_now.weekday())
+    return timezone.make_aware(datetime.combine(monday, datetime.min.time()), local_now.tzinfo)
+
+
+def _to_occurrences(entries, week_start):
+    # Index minutes are offset by one week so that "now" always sits in the middle copy
+    origin = week_start - timedelta(minutes=MINUTES_PER_WEEK)
+    return [
+        Occurrence(
+            schedule_id=entry.schedule_id,
+            routine_id=entry.routine_id,
+            routine_title=entry.routine_title,
+            starts_at=origin + timedelta(minutes=entry.start),
+            ends_at=origin + timedelta(minutes=entry.end)
+        )
+        for entry in entries
+    ]
+
+
+def _minute_now(now, week_start):
+    return MINUTES_PER_WEEK + int((now - week_start).total_seconds() // 60)
+
+
+def current_routines(child_id, now=None):
+    """Routines a child should be doing right now"""
+    now = now or timezone.now()
+    week_start = _week_start(now)
+    entries = get_schedule_index(child_id).current(_minute_now(now, week_start))
+    return _to_occurrences(entries, week_start)
+
+
+def upcoming_routines(child_id, now=None, within=timedelta(days=1), limit=None):
+    """Routines starting for a child within the next ``within`` (at most 7 days)"""
+    now = now or timezone.now()
+    week_start = _week_start(now)
+    within_minutes = min(int(within.total_seconds() // 60), MINUTES_PER_WEEK)
+    entries = get_schedule_index(child_id).upcoming(_minute_now(now, week_start), within_minutes, limit)
+    return _to_occurrences(entries, week_start)
@@ -0,0 +1,81 @@
+from django.db.models import F
+from django.db.models.signals import post_save, post_delete, pre_save
+from django.dispatch import receiver
+from django.utils import timezone
+
+from .models import Routine, Task, TaskCompletion, RoutineSchedule, DailyRoutineCompletion
+from .scheduling import invalidate_schedule_index
+from .completions import record_completion, clear_completion, current_streak
+from .analytics import invalidate_routine_analytics
+from apps.learning.achievements import handle_event, ROUTINE_STREAK
+
+
+def _invalidate_routine_children(routine_id):
+    child_ids = RoutineSchedule.objects.filter(routine_id=routine_id).values_list('child_id', flat=True)
+    for child_id in set(child_ids):
+        invalidate_schedule_index(child_id)
+
+
+@receiver(pre_save, sender=RoutineSchedule)
+def remember_previous_child(sender, instance, **kwargs):
+    """Keep the old child so moving a schedule refreshes both children"""
+    if instance.pk:
+        instance._previous_child_id = RoutineSchedule.objects.filter(
+            pk=instance.pk
+        ).values_list('child_id', flat=True).first()
+
+
+@receiver(post_save, sender=RoutineSchedule)
+@receiver(post_delete, sender=RoutineSchedule)
+def refresh_schedule_index(sender, instance, **kwargs):
+    """Rebuild only the affected child's schedule index"""
+    invalidate_schedule_index(instance.child_id)
+    previous_child_id = getattr(instance, '_previous_child_id', None)
+    if previous_child_id and previous_child_id != instance.child_id:
+        invalidate_schedule_index(previous_child_id)
+
+
+@receiver(post_save, sender=Routine)
+def refresh_routine_schedules(sender, instance, created, **kwargs):
+    """Routine title or active flag changed"""
+    if not created:
+        _invalidate_routine_children(instance.pk)
+
+
+@receiver(post_save, sender=Task)
+@receiver(post_delete, sender=Task)
+def refresh_task_durations(sender, instance, **kwargs):
+    """Task durations determine when open-ended schedules finish"""
+    _invalidate_routine_children(instance.routine_id)
+    invalidate_routine_analytics(instance.routine_id)
+
+
+@receiver(post_save, sender=TaskCompletion)
+def set_completion_bit(sender, instance, created, **kwargs):
+    """Keep the daily completion bitmap in step with new completions"""
+    if created:
+        record_completion(instance.task, instance.child_id, timezone.localdate(instance.completed_at))
+        invalidate_routine_analytics(instance.task.routine_id)
+        if instance.task.is_required:
+            routine = instance.task.routine
+            handle_event(
+                instance.child_id,
+                ROUTINE_STREAK,
+                value=lambda: current_streak(routine, instance.child_id)
+            )
+
+
+@receiver(post_delete, sender=TaskCompletion)
+def unset_completion_bit(sender, instance, **kwargs):
+    task = Task.objects.filter(pk=instance.task_id).first()
+    if task:
+        clear_completion(task, instance.child_id, timezone.localdate(instance.completed_at))
+        invalidate_routine_analytics(task.routine_id)
+
+
+@receiver(post_delete, sender=Task)
+def release_task_slot(sender, instance, **kwargs):
+    """Clear the deleted task's bit so a new task can reuse its slot"""
+    DailyRoutineCompletion.objects.filter(routine_id=instance.routine_id).update(
+        completed_tasks=F('completed_tasks').bitand(~instance.bit)
+    )
@@ -1,3 +1,484 @@
-from django.test import TestCase
+from django.test import TestCase, Client
+from django.contrib.auth import get_user_model
+from django.urls import reverse
+from django.core.cache import cache
+from django.utils import timezone
+from django.core.management import call_command
+from .models import Routine, Task, TaskCompletion, RoutineSchedule, DailyRoutineCompletion
+from .scheduling import current_routines, upcoming_routines, get_schedule_index
+from .completions import completed_bitmap, record_completion, adherence, current_streak
+from .analytics import routine_analytics
+from io import StringIO
+import time as clock
+from datetime import datetime, time, timedelta
+import json
 
-# Create your tests here.
+User = get_user_model()
+
+
+class TaskOrderingTest(TestCase):
+    def setUp(self):
+        self.client = Client()
+
+        self.therapist_user = User.objects.create_user(
+            email='therapist@test.com',
+            username='therapisttest',
+            password='testpass123',
+            role='therapist',
+            first_name='Test',
+            last_name='Therapist'
+        )
+
+        self.routine = Routine.objects.create(
+            title="Morning Routine",
+            created_by=self.therapist_user
+        )
+        self.tasks = []
+        for i in range(20):
+            self.tasks.append(Task.objects.create(
+                routine=self.routine,
+                title=f"Step {i}",
+                order=self.routine.next_task_order()
+            ))
+
+    def ordered_ids(self):
+        return list(self.routine.tasks.values_list('id', flat=True))
+
+    def test_next_task_order_is_spaced(self):
+        """Test that appended tasks are spaced apart"""
+        orders = [task.order for task in self.tasks]
+        self.assertEqual(orders, [(i + 1) * Task.ORDER_GAP for i in range(20)])
+
+    def test_reorder_tasks(self):
+        """Test applying a full new ordering with a single update"""
+        new_ids = [task.id for task in reversed(self.tasks)]
+
+        with self.assertNumQueries(4):
+            self.routine.reorder_tasks(new_ids)
+
+        self.assertEqual(self.ordered_ids(), new_ids)
+
+    def test_reorder_tasks_requires_every_task(self):
+        """Test that a partial ordering is rejected"""
+        with self.assertRaises(ValueError):
+            self.routine.reorder_tasks([task.id for task in self.tasks[:-1]])
+
+        with self.assertRaises(ValueError):
+            self.routine.reorder_tasks([self.tasks[0].id] * 20)
+
+    def test_move_task_touches_one_row(self):
+        """Test that moving a task between two others only writes that task"""
+        moved = self.tasks[15]
+
+        updated = self.routine.move_task(moved, after_task=self.tasks[2])
+
+        self.assertEqual(updated, 1)
+        expected = [task.id for task in self.tasks[:3]] + [moved.id] + \
+            [task.id for task in self.tasks[3:] if task != moved]
+        self.assertEqual(self.ordered_ids(), expected)
+
+    def test_move_task_to_front_and_back(self):
+        """Test moving a task to either end of the routine"""
+        self.routine.move_task(self.tasks[5])
+        self.assertEqual(self.ordered_ids()[0], self.tasks[5].id)
+
+        self.routine.move_task(self.tasks[0], after_task=self.tasks[19])
+        self.assertEqual(self.ordered_ids()[-1], self.tasks[0].id)
+
+    def test_move_task_respaces_when_gap_is_exhausted(self):
+        """Test that repeated moves into the same gap eventually respace the routine"""
+        first, second = self.tasks[0], self.tasks[1]
+        for task in self.tasks[2:]:
+            self.routine.move_task(task, after_task=first)
+
+        ids = self.ordered_ids()
+        self.assertEqual(ids[0], first.id)
+        self.assertEqual(ids[-1], second.id)
+        self.assertEqual(len(set(self.routine.tasks.values_list('order', flat=True))), 20)
+
+    def test_task_bulk_reorder_view(self):
+        """Test the full reorder endpoint"""
+        self.client.login(email='therapist@test.com', password='testpass123')
+        new_ids = [task.id for task in reversed(self.tasks)]
+
+        response = self.client.post(
+            reverse('routines:task_bulk_reorder', args=[self.routine.id]),
+            data=json.dumps({'task_ids': new_ids}),
+            content_type='application/json'
+        )
+
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(json.loads(response.content)['success'])
+        self.assertEqual(self.ordered_ids(), new_ids)
+
+    def test_task_bulk_reorder_view_rejects_partial_ordering(self):
+        """Test that the full reorder endpoint rejects missing tasks"""
+        self.client.login(email='therapist@test.com', password='testpass123')
+
+        response = self.client.post(
+            reverse('routines:task_bulk_reorder', args=[self.routine.id]),
+            data=json.dumps({'task_ids': [self.tasks[0].id]}),
+            content_type='application/json'
+        )
+
+        self.assertEqual(response.status_code, 400)
+
+    def test_task_move_view(self):
+        """Test the single task move endpoint"""
+        self.client.login(email='therapist@test.com', password='testpass123')
+
+        response = self.client.post(reverse('routines:task_move'), {
+            'task_id': self.tasks[10].id,
+            'after_task_id': '',
+        })
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(self.ordered_ids()[0], self.tasks[10].id)
+
+    def test_task_reorder_view_moves_to_position(self):
+        """Test that the older reorder endpoint moves through move_task instead of writing raw orders"""
+        self.client.login(email='therapist@test.com', password='testpass123')
+
+        response = self.client.post(reverse('routines:task_reorder'), {
+            'task_id': self.tasks[10].id,
+            'new_order': 3,
+        })
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(self.ordered_ids()[2], self.tasks[10].id)
+        self.assertEqual(len(set(self.routine.tasks.values_list('order', flat=True))), 20)
+
+        # Positions past the end move the task last
+        self.client.post(reverse('routines:task_reorder'), {'task_id': self.tasks[0].id, 'new_order': 99})
+        self.assertEqual(self.ordered_ids()[-1], self.tasks[0].id)
+
+
+class ScheduleEngineTest(TestCase):
+    def setUp(self):
+        cache.clear()
+
+        self.therapist_user = User.objects.create_user(
+            email='therapist@test.com',
+            username='therapisttest',
+            password='testpass123',
+            role='therapist'
+        )
+        self.child_user = User.objects.create_user(
+            email='child@test.com',
+            username='childtest',
+            password='testpass123',
+            role='child'
+        )
+
+        self.morning = Routine.objects.create(title="Morning Routine", created_by=self.therapist_user)
+        self.bedtime = Routine.objects.create(title="Bedtime Routine", created_by=self.therapist_user)
+        Task.objects.create(routine=self.bedtime, title="Brush teeth", order=1, estimated_duration=20)
+        Task.objects.create(routine=self.bedtime, title="Story", order=2, estimated_duration=25)
+
+        # Monday 08:00-08:30 and Sunday 23:30 (open-ended, runs past midnight)
+        self.morning_schedule = RoutineSchedule.objects.create(
+            routine=self.morning, child=self.child_user, day_of_week=0,
+            start_time=time(8, 0), end_time=time(8, 30)
+        )
+        RoutineSchedule.objects.create(
+            routine=self.bedtime, child=self.child_user, day_of_week=6,
+            start_time=time(23, 30)
+        )
+
+    def at(self, year, month, day, hour, minute):
+        return timezone.make_aware(datetime(year, month, day, hour, minute))
+
+    def test_current_routines(self):
+        """Test finding the routine that is running now"""
+        monday = self.at(2026, 10, 19, 8, 15)
+
+        current = current_routines(self.child_user.id, monday)
+
+        self.assertEqual([o.routine_id for o in current], [self.morning.id])
+        self.assertEqual(current[0].starts_at, self.at(2026, 10, 19, 8, 0))
+        self.assertEqual(current[0].ends_at, self.at(2026, 10, 19, 8, 30))
+        self.assertEqual(current_routines(self.child_user.id, self.at(2026, 10, 19, 9, 0)), [])
+
+    def test_current_routine_wrapping_past_sunday(self):
+        """Test that a Sunday night routine is still current early on Monday"""
+        current = current_routines(self.child_user.id, self.at(2026, 10, 19, 0, 10))
+
+        self.assertEqual([o.routine_id for o in current], [self.bedtime.id])
+        self.assertEqual(current[0].starts_at, self.at(2026, 10, 18, 23, 30))
+        # No end time, so the task durations (20 + 25 minutes) are used
+        self.assertEqual(current[0].ends_at, self.at(2026, 10, 19, 0, 15))
+
+    def test_upcoming_routines(self):
+        """Test listing upcoming routines across the end of the week"""
+        saturday = self.at(2026, 10, 24, 12, 0)
+
+        upcoming = upcoming_routines(self.child_user.id, saturday, within=timedelta(days=3))
+
+        self.assertEqual([o.routine_id for o in upcoming], [self.bedtime.id, self.morning.id])
+        self.assertEqual(upcoming[1].starts_at, self.at(2026, 10, 26, 8, 0))
+        self.assertEqual(upcoming_routines(self.child_user.id, saturday, within=timedelta(hours=1)), [])
+
+    def test_index_is_cached(self):
+        """Test that lookups after the first one do not query the database"""
+        get_schedule_index(self.child_user.id)
+
+        with self.assertNumQueries(0):
+            current_routines(self.child_user.id, self.at(2026, 10, 19, 8, 15))
+            upcoming_routines(self.child_user.id, self.at(2026, 10, 19, 8, 15))
+
+    def test_index_refreshes_when_schedule_changes(self):
+        """Test that changing a schedule is reflected in the next lookup"""
+        monday = self.at(2026, 10, 19, 8, 15)
+        self.assertEqual(len(current_routines(self.child_user.id, monday)), 1)
+
+        self.morning_schedule.start_time = time(10, 0)
+        self.morning_schedule.end_time = time(10, 30)
+        self.morning_schedule.save()
+        self.assertEqual(current_routines(self.child_user.id, monday), [])
+
+        self.morning.is_active = False
+        self.morning.save()
+        self.assertEqual(current_routines(self.child_user.id, self.at(2026, 10, 19, 10, 15)), [])
+
+    def test_schedule_now_view(self):
+        """Test the JSON endpoint for a child"""
+        self.client.login(email='child@test.com', password='testpass123')
+
+        response = self.client.get(reverse('routines:routine_schedule_now'), {'hours': 24 * 7})
+
+        self.assertEqual(response.status_code, 200)
+        data = json.loads(response.content)
+        self.assertEqual({o['routine_id'] for o in data['upcoming']}, {self.morning.id, self.bedtime.id})
+
+
+class CompletionBitmapTest(TestCase):
+    def setUp(self):
+        self.client = Client()
+
+        self.therapist_user = User.objects.create_user(
+            email='therapist@test.com',
+            username='therapisttest',
+            password='testpass123',
+            role='therapist'
+        )
+        self.child_user = User.objects.create_user(
+            email='child@test.com',
+            username='childtest',
+            password='testpass123',
+            role='child'
+        )
+
+        self.routine = Routine.objects.create(title="Morning Routine", created_by=self.therapist_user)
+        self.routine.assigned_to.add(self.child_user)
+        self.wake_up = Task.objects.create(routine=self.routine, title="Wake up", order=1)
+        self.dress = Task.objects.create(routine=self.routine, title="Get dressed", order=2)
+        self.stretch = Task.objects.create(routine=self.routine, title="Stretch", order=3, is_required=False)
+        self.today = timezone.localdate()
+
+    def complete_day(self, date, tasks):
+        for task in tasks:
+            record_completion(task, self.child_user.id, date)
+
+    def test_slots_are_assigned_and_reused(self):
+        """Test that tasks get the lowest free slot"""
+        self.assertEqual([self.wake_up.slot, self.dress.slot, self.stretch.slot], [0, 1, 2])
+
+        self.dress.delete()
+        brush = Task.objects.create(routine=self.routine, title="Brush teeth", order=4)
+        self.assertEqual(brush.slot, 1)
+
+    def test_task_completion_sets_bit(self):
+        """Test that creating a TaskCompletion updates today's bitmap"""
+        TaskCompletion.objects.create(task=self.dress, child=self.child_user)
+
+        self.assertEqual(completed_bitmap(self.routine, self.child_user.id), self.dress.bit)
+
+        TaskCompletion.objects.create(task=self.wake_up, child=self.child_user)
+        row = DailyRoutineCompletion.objects.get(child=self.child_user, routine=self.routine, date=self.today)
+        self.assertTrue(row.is_completed(self.wake_up))
+        self.assertTrue(row.is_completed(self.dress))
+        self.assertFalse(row.is_completed(self.stretch))
+        self.assertEqual(row.completed_count, 2)
+
+    def test_deleting_completion_clears_bit(self):
+        """Test that removing the only completion of a task clears its bit"""
+        completion = TaskCompletion.objects.create(task=self.dress, child=self.child_user)
+        completion.delete()
+
+        self.assertEqual(completed_bitmap(self.routine, self.child_user.id), 0)
+
+    def test_deleting_task_clears_bit(self):
+        """Test that a reused slot does not inherit old completions"""
+        self.complete_day(self.today, [self.stretch])
+        self.stretch.delete()
+
+        new_task = Task.objects.create(routine=self.routine, title="Breakfast", order=5)
+        self.assertEqual(new_task.slot, 2)
+        self.assertEqual(completed_bitmap(self.routine, self.child_user.id), 0)
+
+    def test_task_complete_view_uses_bitmap(self):
+        """Test that completing a task twice on one day is refused"""
+        self.client.login(email='child@test.com', password='testpass123')
+        url = reverse('routines:task_complete', args=[self.dress.id])
+
+        self.client.post(url)
+        self.client.post(url)
+
+        self.assertEqual(TaskCompletion.objects.filter(task=self.dress).count(), 1)
+        response = self.client.get(reverse('routines:routine_detail', args=[self.routine.id]))
+        self.assertEqual(list(response.context['task_completions']), [self.dress.id])
+
+    def test_adherence(self):
+        """Test adherence counts days where every required task was completed"""
+        start = self.today - timedelta(days=9)
+        for offset in range(0, 10, 2):
+            self.complete_day(start + timedelta(days=offset), [self.wake_up, self.dress])
+        # Optional task alone does not count
+        self.complete_day(start + timedelta(days=1), [self.stretch])
+
+        self.assertEqual(adherence(self.routine, self.child_user.id, start, self.today), 50.0)
+
+    def test_current_streak(self):
+        """Test streaks count back from today, tolerating an unfinished today"""
+        for offset in range(1, 4):
+            self.complete_day(self.today - timedelta(days=offset), [self.wake_up, self.dress])
+        self.complete_day(self.today - timedelta(days=5), [self.wake_up, self.dress])
+
+        self.assertEqual(current_streak(self.routine, self.child_user.id), 3)
+
+        self.complete_day(self.today, [self.wake_up, self.dress])
+        self.assertEqual(current_streak(self.routine, self.child_user.id), 4)
+
+    def test_backfill_command(self):
+        """Test rebuilding bitmaps from existing completions"""
+        TaskCompletion.objects.create(task=self.wake_up, child=self.child_user)
+        TaskCompletion.objects.create(task=self.stretch, child=self.child_user)
+        DailyRoutineCompletion.objects.all().delete()
+
+        call_command('backfill_completion_bitmaps', stdout=StringIO())
+
+        self.assertEqual(
+            completed_bitmap(self.routine, self.child_user.id),
+            self.wake_up.bit | self.stretch.bit
+        )
+
+    def test_backfill_removes_stale_days(self):
+        """Test that bitmaps for days without completions are deleted by the rebuild"""
+        self.complete_day(self.today - timedelta(days=2), [self.wake_up, self.dress])
+        TaskCompletion.objects.all().delete()
+
+        call_command('backfill_completion_bitmaps', stdout=StringIO())
+
+        self.assertFalse(DailyRoutineCompletion.objects.exists())
+
+
+class RoutineAnalyticsTest(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.client = Client()
+
+        self.therapist_user = User.objects.create_user(
+            email='therapist@test.com',
+            username='therapisttest',
+            password='testpass123',
+            role='therapist'
+        )
+        User.objects.bulk_create([
+            User(email=f'child{i}@test.com', username=f'child{i}', role='child')
+            for i in range(30)
+        ])
+        self.children = list(User.objects.filter(role='child').order_by('id'))
+
+        self.routine = Routine.objects.create(title="Morning Routine", created_by=self.therapist_user)
+        self.routine.assigned_to.add(*self.children)
+        self.wake_up = Task.objects.create(routine=self.routine, title="Wake up", order=1)
+        self.dress = Task.objects.create(routine=self.routine, title="Get dressed", order=2)
+        self.stretch = Task.objects.create(routine=self.routine, title="Stretch", order=3, is_required=False)
+
+        self.end = timezone.localdate()
+        self.start = self.end - timedelta(days=89)
+
+        # Even children complete everything every day; odd children only wake up
+        full = self.wake_up.bit | self.dress.bit
+        DailyRoutineCompletion.objects.bulk_create([
+            DailyRoutineCompletion(
+                child=child,
+                routine=self.routine,
+                date=self.start + timedelta(days=offset),
+                completed_tasks=full if i % 2 == 0 else self.wake_up.bit
+            )
+            for i, child in enumerate(self.children)
+            for offset in range(90)
+        ])
+
+    def child_ids(self):
+        return [child.id for child in self.children]
+
+    def test_classroom_heatmap(self):
+        """Test a 90-day heatmap for a classroom of 30 children"""
+        start_time = clock.perf_counter()
+        result = routine_analytics(self.routine, self.child_ids(), self.start, self.end)
+        elapsed = clock.perf_counter() - start_time
+
+        self.assertLess(elapsed, 1.0)
+        self.assertEqual(len(result['dates']), 90)
+        self.assertEqual(len(result['children']), 30)
+
+        diligent, partial = result['children'][0], result['children'][1]
+        self.assertEqual(diligent['daily'], [1.0] * 90)
+        self.assertEqual(diligent['adherence'], 100.0)
+        self.assertEqual(diligent['current_streak'], 90)
+        self.assertEqual(diligent['longest_streak'], 90)
+        self.assertEqual(partial['daily'], [0.5] * 90)
+        self.assertEqual(partial['adherence'], 0.0)
+        self.assertEqual(partial['longest_streak'], 0)
+
+    def test_streaks(self):
+        """Test current and longest streaks with a gap in the range"""
+        child = self.children[0]
+        DailyRoutineCompletion.objects.filter(
+            child=child,
+            date__in=[self.end - timedelta(days=10), self.end]
+        ).update(completed_tasks=0)
+
+        result = routine_analytics(self.routine, [child.id], self.start, self.end)
+
+        # Today is unfinished, so the streak counts back from yesterday
+        self.assertEqual(result['children'][0]['current_streak'], 9)
+        self.assertEqual(result['children'][0]['longest_streak'], 79)
+
+    def test_completion_time_distribution(self):
+        """Test completions are bucketed by hour of day per task"""
+        child = self.children[0]
+        completion = TaskCompletion.objects.create(task=self.dress, child=child)
+        hour = timezone.localtime(completion.completed_at).hour
+
+        result = routine_analytics(self.routine, [child.id], self.start, self.end)
+
+        dress_stats = next(task for task in result['tasks'] if task['task_id'] == self.dress.id)
+        self.assertEqual(dress_stats['completions'], 1)
+        self.assertEqual(dress_stats['by_hour'][hour], 1)
+        self.assertEqual(dress_stats['median_hour'], hour)
+
+    def test_results_are_cached_until_completions_change(self):
+        """Test repeated requests are served from the cache"""
+        routine_analytics(self.routine, self.child_ids(), self.start, self.end)
+
+        with self.assertNumQueries(0):
+            routine_analytics(self.routine, self.child_ids(), self.start, self.end)
+
+        TaskCompletion.objects.create(task=self.stretch, child=self.children[1])
+        result = routine_analytics(self.routine, self.child_ids(), self.start, self.end)
+        stretch_stats = next(task for task in result['tasks'] if task['task_id'] == self.stretch.id)
+        self.assertEqual(stretch_stats['completions'], 1)
+
+    def test_analytics_view(self):
+        """Test the JSON endpoint for the routine's therapist"""
+        self.client.login(email='therapist@test.com', password='testpass123')
+
+        response = self.client.get(reverse('routines:routine_analytics', args=[self.routine.id]), {'days': 90})
+
+        self.assertEqual(response.status_code, 200)
+        data = json.loads(response.content)
+        self.assertEqual(len(data['children']), 30)
+        self.assertEqual(data['start'], self.start.isoformat())
@@ -10,11 +10,15 @@ urlpatterns = [
     path('<int:routine_id>/', views.routine_detail, name='routine_detail'),
     path('<int:routine_id>/edit/', views.routine_edit, name='routine_edit'),
     path('<int:routine_id>/progress/', views.routine_progress, name='routine_progress'),
+    path('<int:routine_id>/analytics/', views.routine_analytics_data, name='routine_analytics'),
     path('<int:routine_id>/schedule/', views.routine_schedule, name='routine_schedule'),
+    path('schedule/now/', views.routine_schedule_now, name='routine_schedule_now'),
     
     # Task management
     path('<int:routine_id>/tasks/create/', views.task_create, name='task_create'),
     path('tasks/<int:task_id>/edit/', views.task_edit, name='task_edit'),
     path('tasks/<int:task_id>/complete/', views.task_complete, name='task_complete'),
     path('tasks/reorder/', views.task_reorder, name='task_reorder'),
+    path('tasks/move/', views.task_move, name='task_move'),
+    path('<int:routine_id>/tasks/reorder/', views.task_bulk_reorder, name='task_bulk_reorder'),
 ] 
\ No newline at end of file
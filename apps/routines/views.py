@@ -7,12 +7,17 @@ from django.views.decorators.csrf import csrf_exempt
 from django.db.models import Q
 from django.utils import timezone
 from datetime import datetime, timedelta
+import json
 
-from .models import Routine, Task, TaskCompletion, RoutineSchedule
+from .models import Routine, Task, TaskCompletion, RoutineSchedule, DailyRoutineCompletion
+from .scheduling import current_routines, upcoming_routines
+from .completions import is_task_completed, completed_task_ids
+from .analytics import routine_analytics
 from .forms import (
     RoutineForm, TaskForm, TaskCompletionForm, 
-    RoutineScheduleForm, TaskReorderForm
+    RoutineScheduleForm, TaskReorderForm, TaskMoveForm
 )
+from apps.sync.idempotency import idempotent
 
 
 @login_required
@@ -69,19 +74,21 @@ def routine_detail(request, routine_id):
     
     tasks = routine.tasks.all()
     
-    # Get completion status for children
+    # Get today's completion status for children
     if user.role == 'child':
-        task_completions = TaskCompletion.objects.filter(
-            task__routine=routine,
-            child=user
-        ).values_list('task_id', flat=True)
+        task_completions = completed_task_ids(routine, tasks, user.id)
     elif user.role == 'parent':
-        children = user.parent_profile.children.all()
-        child_users = [child.user for child in children]
-        task_completions = TaskCompletion.objects.filter(
-            task__routine=routine,
-            child__in=child_users
-        ).values_list('task_id', 'child_id')
+        child_user_ids = user.parent_profile.children.values_list('user_id', flat=True)
+        task_completions = [
+            (task.id, row.child_id)
+            for row in DailyRoutineCompletion.objects.filter(
+                routine=routine,
+                child_id__in=child_user_ids,
+                date=timezone.localdate()
+            )
+            for task in tasks
+            if row.is_completed(task)
+        ]
     else:
         task_completions = []
     
@@ -160,7 +167,12 @@ def task_create(request, routine_id):
         if form.is_valid():
             task = form.save(commit=False)
             task.routine = routine
-            task.save()
+            task.order = routine.next_task_order()
+            try:
+                task.save()
+            except ValueError as e:
+                messages.error(request, str(e))
+                return redirect('routines:routine_detail', routine_id=routine.id)
             messages.success(request, f"Task '{task.title}' added successfully!")
             return redirect('routines:routine_detail', routine_id=routine.id)
     else:
@@ -203,6 +215,7 @@ def task_edit(request, task_id):
 
 @login_required
 @require_POST
+@idempotent
 def task_complete(request, task_id):
     """Mark a task as completed"""
     task = get_object_or_404(Task, id=task_id)
@@ -236,14 +249,7 @@ def task_complete(request, task_id):
         child = child_profile.user
     
     # Check if already completed today
-    today = timezone.now().date()
-    existing_completion = TaskCompletion.objects.filter(
-        task=task,
-        child=child,
-        completed_at__date=today
-    ).first()
-    
-    if existing_completion:
+    if is_task_completed(task, child.id):
         messages.warning(request, "This task was already completed today.")
         return redirect('routines:routine_detail', routine_id=task.routine.id)
     
@@ -262,7 +268,7 @@ def task_complete(request, task_id):
 @csrf_exempt
 @require_POST
 def task_reorder(request):
-    """Reorder tasks via AJAX"""
+    """Move a task to a 1-based position in its routine via AJAX"""
     if request.user.role not in ['therapist', 'teacher']:
         return JsonResponse({'error': 'Permission denied'}, status=403)
     
@@ -274,11 +280,57 @@ def task_reorder(request):
         if task.routine.created_by != request.user:
             return JsonResponse({'error': 'Permission denied'}, status=403)
         
-        # Update task order
-        task.order = new_order
-        task.save()
+        # new_order is a position, not a raw order value, so the move keeps the gap spacing
+        others = list(task.routine.tasks.exclude(id=task.id).order_by('order'))
+        position = min(max(new_order, 1), len(others) + 1) - 1
+        task.routine.move_task(task, after_task=others[position - 1] if position > 0 else None)
+        
+        return JsonResponse({'success': True, 'order': task.order})
+    
+    return JsonResponse({'error': 'Invalid data'}, status=400)
+
+
+@login_required
+@csrf_exempt
+@require_POST
+def task_bulk_reorder(request, routine_id):
+    """Apply the full new task ordering of a routine via AJAX"""
+    routine = get_object_or_404(Routine, id=routine_id)
+    
+    if request.user.role not in ['therapist', 'teacher'] or routine.created_by != request.user:
+        return JsonResponse({'error': 'Permission denied'}, status=403)
+    
+    try:
+        data = json.loads(request.body)
+        updated = routine.reorder_tasks(data.get('task_ids', []))
+    except (TypeError, ValueError, AttributeError):
+        return JsonResponse({'error': 'Invalid data'}, status=400)
+    
+    return JsonResponse({
+        'success': True,
+        'updated': updated,
+        'orders': dict(routine.tasks.values_list('id', 'order'))
+    })
+
+
+@login_required
+@csrf_exempt
+@require_POST
+def task_move(request):
+    """Move a task after another task via AJAX, usually writing a single row"""
+    if request.user.role not in ['therapist', 'teacher']:
+        return JsonResponse({'error': 'Permission denied'}, status=403)
+    
+    form = TaskMoveForm(request.POST)
+    if form.is_valid():
+        task = form.cleaned_data['task']
+        
+        if task.routine.created_by != request.user:
+            return JsonResponse({'error': 'Permission denied'}, status=403)
+        
+        updated = task.routine.move_task(task, after_task=form.cleaned_data['after_task'])
         
-        return JsonResponse({'success': True})
+        return JsonResponse({'success': True, 'updated': updated, 'order': task.order})
     
     return JsonResponse({'error': 'Invalid data'}, status=400)
 
@@ -367,3 +419,74 @@ def routine_progress(request, routine_id):
         'user_role': user.role
     }
     return render(request, 'routines/routine_progress.html', context)
+
+
+@login_required
+def routine_analytics_data(request, routine_id):
+    """Adherence heatmap, streaks and completion times for a routine via AJAX"""
+    routine = get_object_or_404(Routine, id=routine_id)
+    user = request.user
+    
+    if user.role == 'child':
+        child_ids = [user.id] if routine.assigned_to.filter(id=user.id).exists() else []
+    elif user.role == 'parent':
+        child_ids = list(routine.assigned_to.filter(
+            child_profile__in=user.parent_profile.children.all()
+        ).values_list('id', flat=True))
+    elif user.role in ['therapist', 'teacher'] and routine.created_by == user:
+        child_ids = list(routine.assigned_to.values_list('id', flat=True))
+    else:
+        child_ids = []
+    
+    if not child_ids:
+        return JsonResponse({'error': 'Permission denied'}, status=403)
+    
+    try:
+        end = datetime.strptime(request.GET['end'], '%Y-%m-%d').date() if 'end' in request.GET else timezone.localdate()
+        if 'start' in request.GET:
+            start = datetime.strptime(request.GET['start'], '%Y-%m-%d').date()
+        else:
+            start = end - timedelta(days=int(request.GET.get('days', 90)) - 1)
+    except ValueError:
+        return JsonResponse({'error': 'Invalid date range'}, status=400)
+    
+    if start > end or (end - start).days >= 366:
+        return JsonResponse({'error': 'Invalid date range'}, status=400)
+    
+    return JsonResponse(routine_analytics(routine, child_ids, start, end))
+
+
+@login_required
+def routine_schedule_now(request):
+    """Current and upcoming scheduled routines for a child via AJAX"""
+    user = request.user
+    
+    if user.role == 'child':
+        child = user
+    elif user.role == 'parent':
+        child_id = request.GET.get('child_id')
+        if not child_id:
+            return JsonResponse({'error': 'child_id is required'}, status=400)
+        child_profile = get_object_or_404(user.parent_profile.children.all(), id=child_id)
+        child = child_profile.user
+    else:
+        return JsonResponse({'error': 'Permission denied'}, status=403)
+    
+    try:
+        hours = min(int(request.GET.get('hours', 24)), 7 * 24)
+    except ValueError:
+        return JsonResponse({'error': 'Invalid hours'}, status=400)
+    
+    def serialize(occurrence):
+        return {
+            'routine_id': occurrence.routine_id,
+            'title': occurrence.routine_title,
+            'starts_at': occurrence.starts_at.isoformat(),
+            'ends_at': occurrence.ends_at.isoformat(),
+        }
+    
+    now = timezone.now()
+    return JsonResponse({
+        'current': [serialize(o) for o in current_routines(child.id, now)],
+        'upcoming': [serialize(o) for o in upcoming_routines(child.id, now, within=timedelta(hours=hours))],
+    })
@@ -0,0 +1,9 @@
+from django.contrib import admin
+from .models import ClientEvent
+
+@admin.register(ClientEvent)
+class ClientEventAdmin(admin.ModelAdmin):
+    list_display = ['user', 'event_type', 'event_id', 'status_code', 'created_at']
+    list_filter = ['event_type', 'status_code', 'created_at']
+    search_fields = ['event_id', 'user__username']
+    readonly_fields = ['created_at']
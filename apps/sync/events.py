@@ -0,0 +1,77 @@
+"""
+Applying events queued by clients while offline.
+
+Every event carries an id the client generated when it was queued. The id is
+claimed in ``ClientEvent`` in the same transaction that applies the event, so
+an event is applied at most once however often it is resent (after a lost
+response, or by two tabs flushing together) and a resend gets the stored
+result back. Server errors are not stored: they roll back and the client
+keeps the event to try again. Nor are events for another user's objects,
+which the client keeps until their owner signs in.
+"""
+import logging
+
+from django.db import transaction, IntegrityError
+
+from .handlers import HANDLERS
+from .models import ClientEvent
+
+logger = logging.getLogger(__name__)
+
+MAX_SYNC_EVENTS = 100
+MAX_EVENT_ID_LENGTH = 64
+
+
+def _result(event_id, status, body, duplicate=False):
+    return {'id': event_id, 'status': status, 'response': body, 'duplicate': duplicate}
+
+
+def _stored_result(user, event_id):
+    event = ClientEvent.objects.filter(user=user, event_id=event_id).first()
+    if event is None:
+        return None
+    return _result(event_id, event.status_code, event.response, duplicate=True)
+
+
+def apply_event(user, event):
+    """Apply one ``{"id", "type", "payload"}`` event, or return its stored result"""
+    if not isinstance(event, dict):
+        return _result(None, 400, {'error': 'Invalid event'})
+    event_id = event.get('id')
+    if not isinstance(event_id, str) or not 0 < len(event_id) <= MAX_EVENT_ID_LENGTH:
+        return _result(None, 400, {'error': 'Invalid event id'})
+    handler = HANDLERS.get(event.get('type'))
+    payload = event.get('payload')
+    if handler is None or not isinstance(payload, dict):
+        return _result(event_id, 400, {'error': 'Unknown event type or missing payload'})
+
+    stored = _stored_result(user, event_id)
+    if stored:
+        return stored
+    try:
+        with transaction.atomic():
+            record = ClientEvent.objects.create(user=user, event_id=event_id, event_type=event['type'])
+            status, body = handler(user, payload)
+            if body.get('owner_mismatch'):
+                # Not this user's event, so its id stays free for its owner
+                transaction.set_rollback(True)
+                return _result(event_id, status, body)
+            record.status_code = status
+            record.response = body
+            record.save(update_fields=['status_code', 'response'])
+    except IntegrityError:
+        # Another request claimed the id first
+        stored = _stored_result(user, event_id)
+        if stored:
+            return stored
+        logger.exception('Sync event %s failed', event_id)
+        return _result(event_id, 500, {'error': 'Could not apply event'})
+    except Exception:
+        logger.exception('Sync event %s failed', event_id)
+        return _result(event_id, 500, {'error': 'Could not apply event'})
+    return _result(event_id, status, body)
+
+
+def apply_events(user, events):
+    """Apply events in the order they were queued"""
+    return [apply_event(user, event) for event in events]
@@ -0,0 +1,83 @@
+"""
+Handlers for events queued offline.
+
+Each handler applies one event type for a user and returns ``(status, body)``
+like the endpoint the page would otherwise have called. Handlers validate
+before writing anything, so a 4xx result has no side effects and can be
+stored as the event's final answer. The exception is an event for something
+that belongs to another user (queued on a shared tablet before this user
+signed in): its result is marked ``owner_mismatch`` and is not final, so the
+client keeps it for its owner.
+"""
+from apps.drawing.models import Drawing
+from apps.drawing.views import apply_drawing_data
+from apps.games.models import GameSession
+from apps.games.registry import ResultUnavailable
+from apps.games.views import record_game_result
+from apps.therapy.forms import ActivityAttemptForm
+from apps.therapy.models import ActivityAssignment
+from apps.therapy.views import record_activity_attempt
+
+
+OWNER_MISMATCH = {'owner_mismatch': True}
+
+
+def _id(value):
+    """A primary key sent by the client, or None if it cannot be one"""
+    if isinstance(value, str) and value.isdigit():
+        return int(value)
+    return value if isinstance(value, int) and not isinstance(value, bool) else None
+
+
+def save_drawing(user, payload):
+    drawing = Drawing.objects.filter(id=_id(payload.get('drawing_id'))).first()
+    if drawing is not None and drawing.child_id != user.id:
+        return 404, {'error': 'Drawing not found', **OWNER_MISMATCH}
+    if user.role != 'child':
+        return 403, {'error': 'Only children can save drawings'}
+    if drawing is None:
+        return 404, {'error': 'Drawing not found'}
+    apply_drawing_data(drawing, payload)
+    return 200, {'success': True, 'message': 'Drawing saved successfully'}
+
+
+def save_game_result(user, payload):
+    try:
+        session = record_game_result(user, payload)
+    except (GameSession.DoesNotExist, ValueError, TypeError):
+        if GameSession.objects.filter(id=_id(payload.get('session_id'))).exclude(child=user).exists():
+            return 404, {'error': 'Game session not found', **OWNER_MISMATCH}
+        return 404, {'error': 'Game session not found'}
+    except ResultUnavailable as e:
+        return 410, {'error': str(e)}
+    return 200, {'success': True, 'session_id': session.id}
+
+
+def _may_submit(user, assignment):
+    if user.role == 'child':
+        return assignment.child_id == user.id
+    if user.role == 'parent':
+        return user.parent_profile.children.filter(user_id=assignment.child_id).exists()
+    return False
+
+
+def submit_activity(user, payload):
+    assignment = ActivityAssignment.objects.select_related('activity', 'child').filter(
+        id=payload.get('assignment_id')
+    ).first()
+    if assignment is None:
+        return 404, {'error': 'Assignment not found'}
+    if not _may_submit(user, assignment):
+        return 403, {'error': 'Permission denied', **OWNER_MISMATCH}
+    form = ActivityAttemptForm(payload)
+    if not form.is_valid():
+        return 400, {'error': 'Invalid submission data', 'errors': form.errors.get_json_data()}
+    attempt = record_activity_attempt(assignment, form.save(commit=False))
+    return 200, {'success': True, 'attempt_id': attempt.id}
+
+
+HANDLERS = {
+    'drawing.save': save_drawing,
+    'game.result': save_game_result,
+    'activity.submit': submit_activity,
+}
@@ -0,0 +1,141 @@
+"""
+Idempotency keys for write endpoints.
+
+A client may send an ``Idempotency-Key`` header (or an ``idempotency_key``
+form or JSON field) with a POST. The first request with a key claims it in
+``ClientEvent`` and its response is stored; later requests with the same key
+get that response back instead of running the view again, so retrying after
+a timeout never creates a second session or attempt. Keys are kept for
+``CLIENT_EVENT_TTL`` and removed by ``prune_client_events``.
+
+A claimed key is leased to its request for ``IN_PROGRESS_LEASE``. If the
+worker dies mid-request the key is never finished, so once the lease has run
+out the next request with the key takes it over and runs the view.
+"""
+from datetime import timedelta
+from functools import wraps
+import json
+
+from django.db import IntegrityError, transaction
+from django.http import HttpResponse, JsonResponse
+from django.utils import timezone
+
+from .models import ClientEvent
+
+CLIENT_EVENT_TTL = timedelta(days=7)
+KEY_HEADER = 'HTTP_IDEMPOTENCY_KEY'
+KEY_FIELD = 'idempotency_key'
+MAX_KEY_LENGTH = 64
+REPLAY_HEADER = 'Idempotent-Replayed'
+# Claimed keys whose request has not finished yet
+IN_PROGRESS = 0
+# Longer than any request may run before the server times it out
+IN_PROGRESS_LEASE = timedelta(minutes=2)
+
+
+def request_key(request):
+    """The idempotency key sent with ``request``, if any"""
+    key = request.META.get(KEY_HEADER)
+    if not key:
+        if request.content_type == 'application/json':
+            try:
+                data = json.loads(request.body or b'{}')
+            except ValueError:
+                data = None
+            key = data.get(KEY_FIELD) if isinstance(data, dict) else None
+        else:
+            key = request.POST.get(KEY_FIELD)
+    if isinstance(key, str) and 0 < len(key) <= MAX_KEY_LENGTH:
+        return key
+    return None
+
+
+def _claimed(event):
+    """The key's row while this request still holds its lease"""
+    return ClientEvent.objects.filter(id=event.id, status_code=IN_PROGRESS, created_at=event.created_at)
+
+
+def _store(event, response):
+    stored = {
+        'content': response.content.decode(response.charset or 'utf-8'),
+        'content_type': response['Content-Type'],
+    }
+    if response.has_header('Location'):
+        stored['location'] = response['Location']
+    _claimed(event).update(status_code=response.status_code, response=stored)
+
+
+def _take_over(event):
+    """Claim a key whose request outlived its lease; False if it is still running or was taken"""
+    now = timezone.now()
+    if event.status_code != IN_PROGRESS or event.created_at > now - IN_PROGRESS_LEASE:
+        return False
+    if not _claimed(event).update(created_at=now):
+        return False
+    event.created_at = now
+    return True
+
+
+def _replay(event, name):
+    if event.event_type != name:
+        return JsonResponse({'error': 'Idempotency key was used for a different request'}, status=422)
+    if event.status_code == IN_PROGRESS:
+        response = JsonResponse({'error': 'A request with this idempotency key is in progress'}, status=409)
+        response['Retry-After'] = '1'
+        return response
+    response = HttpResponse(
+        event.response.get('content', ''),
+        status=event.status_code,
+        content_type=event.response.get('content_type')
+    )
+    if 'location' in event.response:
+        response['Location'] = event.response['location']
+    response[REPLAY_HEADER] = 'true'
+    return response
+
+
+def idempotent(view):
+    """Replay the stored response for POSTs that repeat an idempotency key.
+
+    Server errors and streaming responses are not stored, so those requests
+    can be retried with the same key.
+    """
+    name = view.__name__
+
+    @wraps(view)
+    def wrapper(request, *args, **kwargs):
+        key = request_key(request) if request.method == 'POST' and request.user.is_authenticated else None
+        if key is None:
+            return view(request, *args, **kwargs)
+
+        event = ClientEvent.objects.filter(user=request.user, event_id=key).first()
+        if event is not None:
+            if event.event_type != name or not _take_over(event):
+                return _replay(event, name)
+            return _run(event, request, *args, **kwargs)
+        try:
+            with transaction.atomic():
+                event = ClientEvent.objects.create(
+                    user=request.user,
+                    event_id=key,
+                    event_type=name,
+                    status_code=IN_PROGRESS
+                )
+        except IntegrityError:
+            # A concurrent request claimed the key first
+            return _replay(ClientEvent.objects.get(user=request.user, event_id=key), name)
+        return _run(event, request, *args, **kwargs)
+
+    def _run(event, request, *args, **kwargs):
+        try:
+            response = view(request, *args, **kwargs)
+        except Exception:
+            _claimed(event).delete()
+            raise
+        if response.status_code >= 500 or response.streaming:
+            _claimed(event).delete()
+        else:
+            _store(event, response)
+        return response
+
+    return wrapper
@@ -0,0 +1,14 @@
+from datetime import timedelta
+
+from django.utils import timezone
+
+from apps.jobs.tasks import task
+
+from .idempotency import CLIENT_EVENT_TTL
+from .models import ClientEvent
+
+
+@task('sync.prune_client_events', every=timedelta(days=1))
+def prune_client_events(days=None):
+    ttl = timedelta(days=days) if days is not None else CLIENT_EVENT_TTL
+    ClientEvent.objects.filter(created_at__lt=timezone.now() - ttl).delete()
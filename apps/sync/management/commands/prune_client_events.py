@@ -0,0 +1,23 @@
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+from apps.sync.idempotency import CLIENT_EVENT_TTL
+from apps.sync.models import ClientEvent
+
+
+class Command(BaseCommand):
+    help = 'Delete stored idempotency keys and sync events older than their time to live'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--days',
+            type=int,
+            default=CLIENT_EVENT_TTL.days,
+            help='Keep events from this many recent days'
+        )
+
+    def handle(self, *args, **options):
+        cutoff = timezone.now() - timedelta(days=options['days'])
+        deleted, _ = ClientEvent.objects.filter(created_at__lt=cutoff).delete()
+        self.stdout.write(self.style.SUCCESS(f'Deleted {deleted} client events'))
@@ -0,0 +1,25 @@
+from django.db import models
+from django.conf import settings
+
+
+class ClientEvent(models.Model):
+    """A write sent by a client under its own id, kept so resends get the first result"""
+    user = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.CASCADE,
+        related_name='client_events'
+    )
+    event_id = models.CharField(max_length=64)
+    event_type = models.CharField(max_length=50)
+    status_code = models.PositiveSmallIntegerField(default=0)
+    response = models.JSONField(default=dict, blank=True)
+    created_at = models.DateTimeField(auto_now_add=True, db_index=True)
+    
+    class Meta:
+        ordering = ['-created_at']
+        constraints = [
+            models.UniqueConstraint(fields=['user', 'event_id'], name='unique_client_event'),
+        ]
+    
+    def __str__(self):
+        return f"{self.user} - {self.event_type} {self.event_id}"
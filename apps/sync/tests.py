@@ -0,0 +1,340 @@
+from django.test import TestCase, Client
+from django.core.management import call_command
+from django.utils import timezone
+from django.contrib.auth import get_user_model
+from django.urls import reverse
+from unittest import mock
+from .models import ClientEvent
+from .handlers import HANDLERS
+from .idempotency import IN_PROGRESS_LEASE
+from apps.drawing.models import Drawing
+from apps.routines.models import Routine, Task, TaskCompletion
+from apps.games.models import Game, GameSession, GameProgress
+from apps.therapy.models import TherapyActivity, ActivityAssignment, ActivityAttempt
+from datetime import timedelta
+import io
+import json
+
+User = get_user_model()
+
+
+class OfflineSyncTest(TestCase):
+    def setUp(self):
+        self.client = Client()
+
+        self.child_user = User.objects.create_user(
+            email='child@test.com',
+            username='childtest',
+            password='testpass123',
+            role='child'
+        )
+        self.other_child = User.objects.create_user(
+            email='other@test.com',
+            username='othertest',
+            password='testpass123',
+            role='child'
+        )
+        self.therapist_user = User.objects.create_user(
+            email='therapist@test.com',
+            username='therapisttest',
+            password='testpass123',
+            role='therapist'
+        )
+
+        self.game = Game.objects.create(name='Color Matching Game', slug='color-matching', description='Match colors')
+        self.session = GameSession.objects.create(child=self.child_user, game=self.game, level=1)
+        self.drawing = Drawing.objects.create(title='My House', child=self.child_user)
+        self.activity = TherapyActivity.objects.create(
+            title="Shape Matching",
+            description="Match the shapes",
+            instructions="Find the matching shapes",
+            created_by=self.therapist_user
+        )
+        self.assignment = ActivityAssignment.objects.create(
+            activity=self.activity,
+            child=self.child_user,
+            assigned_by=self.therapist_user
+        )
+        self.client.login(email='child@test.com', password='testpass123')
+
+    def sync(self, *events):
+        response = self.client.post(
+            reverse('sync:api_sync'),
+            data=json.dumps({'events': list(events)}),
+            content_type='application/json'
+        )
+        return response
+
+    def game_event(self, event_id='evt-1'):
+        return {
+            'id': event_id,
+            'type': 'game.result',
+            'payload': {
+                'session_id': self.session.id,
+                'score': 40,
+                'time_taken': 30,
+                'matches_found': 4,
+                'total_attempts': 5,
+                'completed': True
+            }
+        }
+
+    def test_events_applied_in_order(self):
+        """Test that a batch of queued events is applied"""
+        response = self.sync(
+            self.game_event(),
+            {'id': 'evt-2', 'type': 'drawing.save', 'payload': {'drawing_id': self.drawing.id, 'canvas_data': {'strokes': [1]}, 'strokes_count': 1}},
+            {'id': 'evt-3', 'type': 'activity.submit', 'payload': {'assignment_id': self.assignment.id, 'score': 8, 'max_score': 10, 'time_taken': 60, 'is_successful': True}},
+        )
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual([result['status'] for result in response.json()['results']], [200, 200, 200])
+        self.session.refresh_from_db()
+        self.assertTrue(self.session.completed)
+        self.drawing.refresh_from_db()
+        self.assertEqual(self.drawing.canvas_data, {'strokes': [1]})
+        self.assertEqual(ActivityAttempt.objects.get(assignment=self.assignment).score, 8)
+
+    def test_resent_event_applied_once(self):
+        """Test that resending an event returns the first result without reapplying it"""
+        first = self.sync(self.game_event()).json()['results'][0]
+        second = self.sync(self.game_event()).json()['results'][0]
+
+        self.assertFalse(first['duplicate'])
+        self.assertTrue(second['duplicate'])
+        self.assertEqual(second['response'], first['response'])
+        progress = GameProgress.objects.get(child=self.child_user, game=self.game)
+        self.assertEqual(progress.total_sessions, 1)
+        self.assertEqual(progress.total_score, 40)
+
+    def test_event_ids_are_per_user(self):
+        """Test that another child's event id does not shadow this child's"""
+        ClientEvent.objects.create(user=self.other_child, event_id='evt-1', event_type='game.result', status_code=200)
+
+        result = self.sync(self.game_event()).json()['results'][0]
+        self.assertFalse(result['duplicate'])
+        self.assertEqual(result['status'], 200)
+
+    def test_rejected_events_are_final(self):
+        """Test that permission and validation failures are stored and not retried"""
+        other_session = GameSession.objects.create(child=self.other_child, game=self.game, level=1)
+        event = self.game_event()
+        event['payload']['session_id'] = other_session.id
+        results = self.sync(
+            event,
+            {'id': 'evt-2', 'type': 'drawing.save', 'payload': {'drawing_id': 999999}},
+            {'id': 'evt-3', 'type': 'unknown', 'payload': {}},
+            {'type': 'drawing.save', 'payload': {}},
+        ).json()['results']
+
+        self.assertEqual([result['status'] for result in results], [404, 404, 400, 400])
+        # Only the missing drawing is final; the other child's session is theirs to sync
+        self.assertTrue(results[0]['response']['owner_mismatch'])
+        self.assertNotIn('owner_mismatch', results[1]['response'])
+        self.assertEqual(ClientEvent.objects.filter(user=self.child_user).count(), 1)
+
+    def test_other_users_events_are_kept_for_them(self):
+        """Test that events queued by another child on a shared tablet stay unapplied"""
+        self.client.login(email='other@test.com', password='testpass123')
+        results = self.sync(
+            self.game_event(),
+            {'id': 'evt-2', 'type': 'drawing.save', 'payload': {'drawing_id': self.drawing.id, 'canvas_data': {'strokes': [1]}}},
+        ).json()['results']
+
+        self.assertEqual([result['status'] for result in results], [404, 404])
+        self.assertTrue(all(result['response']['owner_mismatch'] for result in results))
+        self.assertFalse(ClientEvent.objects.exists())
+
+        # The owner still gets them applied later
+        self.client.login(email='child@test.com', password='testpass123')
+        self.assertEqual(self.sync(self.game_event()).json()['results'][0]['status'], 200)
+
+    def test_batch_for_another_user_is_refused(self):
+        """Test that a queue flushed under someone else's session is not applied"""
+        response = self.client.post(
+            reverse('sync:api_sync'),
+            data=json.dumps({'user': self.other_child.id, 'events': [self.game_event()]}),
+            content_type='application/json'
+        )
+
+        self.assertEqual(response.status_code, 409)
+        self.assertFalse(ClientEvent.objects.exists())
+        response = self.client.post(
+            reverse('sync:api_sync'),
+            data=json.dumps({'user': self.child_user.id, 'events': [self.game_event()]}),
+            content_type='application/json'
+        )
+        self.assertEqual(response.json()['results'][0]['status'], 200)
+
+    def test_expired_board_result_is_refused(self):
+        """Test that a queued result for a dealt session whose board is gone is not trusted"""
+        GameSession.objects.filter(id=self.session.id).update(seed=1234)
+        result = self.sync(self.game_event()).json()['results'][0]
+
+        self.assertEqual(result['status'], 410)
+        self.session.refresh_from_db()
+        self.assertFalse(self.session.completed)
+        self.assertFalse(GameProgress.objects.exists())
+
+    def test_server_errors_are_not_stored(self):
+        """Test that a failed event rolls back so the client can retry it"""
+        with mock.patch.dict(HANDLERS, {'game.result': mock.Mock(side_effect=RuntimeError)}), \
+                self.assertLogs('apps.sync.events', 'ERROR'):
+            result = self.sync(self.game_event()).json()['results'][0]
+
+        self.assertEqual(result['status'], 500)
+        self.assertFalse(ClientEvent.objects.exists())
+        self.assertEqual(self.sync(self.game_event()).json()['results'][0]['status'], 200)
+
+    def test_activity_submit_permission(self):
+        """Test that children cannot submit attempts for other children's assignments"""
+        self.client.login(email='other@test.com', password='testpass123')
+        result = self.sync({
+            'id': 'evt-1',
+            'type': 'activity.submit',
+            'payload': {'assignment_id': self.assignment.id, 'score': 8}
+        }).json()['results'][0]
+
+        self.assertEqual(result['status'], 403)
+        self.assertTrue(result['response']['owner_mismatch'])
+        self.assertFalse(ActivityAttempt.objects.exists())
+
+    def test_batch_limits(self):
+        """Test that malformed and oversized batches are rejected"""
+        self.assertEqual(self.sync(*[self.game_event(f'evt-{i}') for i in range(101)]).status_code, 400)
+        response = self.client.post(reverse('sync:api_sync'), data='not json', content_type='application/json')
+        self.assertEqual(response.status_code, 400)
+
+    def test_service_worker(self):
+        """Test that the service worker is served with a site-wide scope"""
+        self.client.logout()
+        response = self.client.get(reverse('sync:service_worker'))
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response['Content-Type'], 'application/javascript')
+        self.assertEqual(response['Service-Worker-Allowed'], '/')
+        self.assertContains(response, "importScripts('/static/js/outbox.js')")
+        # Unhashed static files must be revalidated, not served from the cache forever
+        self.assertContains(response, 'staleWhileRevalidate(STATIC_CACHE, event)')
+
+
+class IdempotencyKeyTest(TestCase):
+    def setUp(self):
+        self.client = Client()
+
+        self.child_user = User.objects.create_user(
+            email='child@test.com',
+            username='childtest',
+            password='testpass123',
+            role='child'
+        )
+        self.therapist_user = User.objects.create_user(
+            email='therapist@test.com',
+            username='therapisttest',
+            password='testpass123',
+            role='therapist'
+        )
+        self.game = Game.objects.create(name='Color Matching Game', slug='color-matching', description='Match colors')
+        self.session = GameSession.objects.create(child=self.child_user, game=self.game, level=1)
+        self.client.login(email='child@test.com', password='testpass123')
+
+    def post_json(self, url, data, key=None):
+        headers = {'HTTP_IDEMPOTENCY_KEY': key} if key else {}
+        return self.client.post(url, data=json.dumps(data), content_type='application/json', **headers)
+
+    def test_game_result_replayed(self):
+        """Test that a retried game result is answered without counting it twice"""
+        data = {'session_id': self.session.id, 'score': 30, 'completed': True}
+        first = self.post_json(reverse('games:save_result'), data, key='retry-1')
+        second = self.post_json(reverse('games:save_result'), data, key='retry-1')
+
+        self.assertEqual(second.status_code, 200)
+        self.assertEqual(second.json(), first.json())
+        self.assertEqual(second['Idempotent-Replayed'], 'true')
+        progress = GameProgress.objects.get(child=self.child_user, game=self.game)
+        self.assertEqual(progress.total_sessions, 1)
+
+    def test_key_in_payload(self):
+        """Test that the key may be sent in the JSON body"""
+        url = reverse('drawing:api_create_drawing')
+        first = self.post_json(url, {'title': 'Sun', 'idempotency_key': 'draw-1'})
+        second = self.post_json(url, {'title': 'Sun', 'idempotency_key': 'draw-1'})
+
+        self.assertEqual(first.json()['drawing_id'], second.json()['drawing_id'])
+        self.assertEqual(Drawing.objects.filter(child=self.child_user).count(), 1)
+
+    def test_without_key(self):
+        """Test that requests without a key are not deduplicated"""
+        url = reverse('drawing:api_create_drawing')
+        self.post_json(url, {'title': 'Sun'})
+        self.post_json(url, {'title': 'Sun'})
+
+        self.assertEqual(Drawing.objects.filter(child=self.child_user).count(), 2)
+        self.assertFalse(ClientEvent.objects.exists())
+
+    def test_form_post_replays_redirect(self):
+        """Test that a resubmitted form gets the original redirect"""
+        routine = Routine.objects.create(title="Morning Routine", created_by=self.therapist_user)
+        routine.assigned_to.add(self.child_user)
+        task = Task.objects.create(routine=routine, title="Wake up", order=1)
+        url = reverse('routines:task_complete', args=[task.id])
+
+        first = self.client.post(url, {'idempotency_key': 'form-1'})
+        second = self.client.post(url, {'idempotency_key': 'form-1'})
+
+        self.assertEqual(second.status_code, 302)
+        self.assertEqual(second['Location'], first['Location'])
+        self.assertEqual(TaskCompletion.objects.filter(task=task).count(), 1)
+
+    def test_key_reused_for_other_endpoint(self):
+        """Test that one key cannot be replayed against a different endpoint"""
+        self.post_json(reverse('games:save_result'), {'session_id': self.session.id}, key='shared')
+        response = self.post_json(reverse('drawing:api_create_drawing'), {'title': 'Sun'}, key='shared')
+
+        self.assertEqual(response.status_code, 422)
+        self.assertFalse(Drawing.objects.exists())
+
+    def test_server_errors_can_be_retried(self):
+        """Test that a failed request releases its key"""
+        response = self.post_json(reverse('games:save_result'), {'session_id': 999999}, key='retry-1')
+        self.assertEqual(response.status_code, 500)
+
+        data = {'session_id': self.session.id, 'score': 30}
+        response = self.post_json(reverse('games:save_result'), data, key='retry-1')
+        self.assertEqual(response.status_code, 200)
+        self.assertNotIn('Idempotent-Replayed', response)
+
+    def test_abandoned_key_is_taken_over_after_lease(self):
+        """Test that a key left in progress by a dead worker is reclaimed once its lease runs out"""
+        ClientEvent.objects.create(user=self.child_user, event_id='stuck', event_type='save_game_result')
+        data = {'session_id': self.session.id, 'score': 30, 'completed': True}
+
+        response = self.post_json(reverse('games:save_result'), data, key='stuck')
+        self.assertEqual(response.status_code, 409)
+
+        ClientEvent.objects.filter(event_id='stuck').update(created_at=timezone.now() - IN_PROGRESS_LEASE - timedelta(seconds=1))
+        response = self.post_json(reverse('games:save_result'), data, key='stuck')
+        self.assertEqual(response.status_code, 200)
+        self.assertNotIn('Idempotent-Replayed', response)
+        self.assertEqual(ClientEvent.objects.get(event_id='stuck').status_code, 200)
+
+        replayed = self.post_json(reverse('games:save_result'), data, key='stuck')
+        self.assertEqual(replayed['Idempotent-Replayed'], 'true')
+
+    def test_prune(self):
+        """Test that keys older than the time to live are deleted"""
+        self.post_json(reverse('games:save_result'), {'session_id': self.session.id}, key='old')
+        self.post_json(reverse('games:save_result'), {'session_id': self.session.id}, key='new')
+        ClientEvent.objects.filter(event_id='old').update(created_at=timezone.now() - timedelta(days=8))
+
+        call_command('prune_client_events', stdout=io.StringIO())
+        self.assertEqual(list(ClientEvent.objects.values_list('event_id', flat=True)), ['new'])
+
+    def test_rendered_forms_carry_keys(self):
+        """Test that the routine page gives each completion form a key"""
+        routine = Routine.objects.create(title="Morning Routine", created_by=self.therapist_user)
+        routine.assigned_to.add(self.child_user)
+        Task.objects.create(routine=routine, title="Wake up", order=1)
+
+        response = self.client.get(reverse('routines:routine_detail', args=[routine.id]))
+        self.assertContains(response, 'name="idempotency_key"')
@@ -0,0 +1,9 @@
+from django.urls import path
+from . import views
+
+app_name = 'sync'
+
+urlpatterns = [
+    path('', views.api_sync, name='api_sync'),
+    path('sw.js', views.service_worker, name='service_worker'),
+]
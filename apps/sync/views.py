@@ -0,0 +1,40 @@
+from django.contrib.auth.decorators import login_required
+from django.http import JsonResponse
+from django.shortcuts import render
+from django.views.decorators.cache import cache_control
+from django.views.decorators.csrf import csrf_exempt
+from django.views.decorators.http import require_POST, require_GET
+import json
+
+from .events import apply_events, MAX_SYNC_EVENTS
+
+
+@login_required
+@csrf_exempt
+@require_POST
+def api_sync(request):
+    """Apply a batch of events queued offline, each at most once"""
+    try:
+        data = json.loads(request.body)
+    except json.JSONDecodeError:
+        return JsonResponse({'error': 'Invalid JSON'}, status=400)
+    
+    events = data.get('events') if isinstance(data, dict) else None
+    if not isinstance(events, list):
+        return JsonResponse({'error': 'Expected a list of events'}, status=400)
+    if len(events) > MAX_SYNC_EVENTS:
+        return JsonResponse({'error': f'At most {MAX_SYNC_EVENTS} events per request'}, status=400)
+    # Clients name the user who queued the events; another user's session must not apply them
+    if data.get('user') is not None and data.get('user') != request.user.id:
+        return JsonResponse({'error': 'Events were queued by another user'}, status=409)
+    
+    return JsonResponse({'results': apply_events(request.user, events)})
+
+
+@require_GET
+@cache_control(no_cache=True)
+def service_worker(request):
+    """Service worker script, allowed to control the whole site"""
+    response = render(request, 'sync/service_worker.js', content_type='application/javascript')
+    response['Service-Worker-Allowed'] = '/'
+    return response
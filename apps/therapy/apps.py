@@ -5,3 +5,6 @@ class TherapyConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'apps.therapy'
     verbose_name = 'Therapy'
+
+    def ready(self):
+        from . import signals  # noqa: F401
@@ -125,6 +125,65 @@ class ActivityAssignmentForm(forms.ModelForm):
                 )
 
 
+class ActivityBulkAssignmentForm(forms.Form):
+    """Form for assigning an activity to many children at once"""
+    children = forms.ModelMultipleChoiceField(
+        queryset=User.objects.none(),
+        required=False,
+        widget=forms.CheckboxSelectMultiple(attrs={
+            'class': 'form-check-input'
+        })
+    )
+    assign_all = forms.BooleanField(
+        required=False,
+        label='Assign to all my children',
+        widget=forms.CheckboxInput(attrs={
+            'class': 'form-check-input'
+        })
+    )
+    due_date = forms.DateField(
+        required=False,
+        widget=forms.DateInput(attrs={
+            'class': 'form-control',
+            'type': 'date'
+        })
+    )
+    notes = forms.CharField(
+        required=False,
+        widget=forms.Textarea(attrs={
+            'class': 'form-control',
+            'rows': 2,
+            'placeholder': 'Add any notes for these assignments'
+        })
+    )
+
+    def __init__(self, *args, **kwargs):
+        user = kwargs.pop('user', None)
+        super().__init__(*args, **kwargs)
+
+        # Only children assigned to this therapist/teacher can be selected
+        if user and user.role == 'therapist':
+            self.fields['children'].queryset = User.objects.filter(
+                role='child',
+                child_profile__therapists=user.therapist_profile
+            )
+        elif user and user.role == 'teacher':
+            self.fields['children'].queryset = User.objects.filter(
+                role='child',
+                child_profile__teachers=user.teacher_profile
+            )
+
+    def clean(self):
+        cleaned_data = super().clean()
+
+        if cleaned_data.get('assign_all'):
+            cleaned_data['children'] = self.fields['children'].queryset
+        elif not cleaned_data.get('children'):
+            raise forms.ValidationError("Select at least one child or assign to all children.")
+
+        return cleaned_data
+
+
 class ActivityAttemptForm(forms.ModelForm):
     """Form for recording activity attempts"""
     
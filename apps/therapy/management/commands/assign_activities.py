@@ -25,22 +25,20 @@ class Command(BaseCommand):
             self.stdout.write(self.style.ERROR('No activities found. Please run create_sample_activities first.'))
             return
         
-        # Assign activities to child
-        assigned_count = 0
-        for activity in activities:
-            assignment, created = ActivityAssignment.objects.get_or_create(
-                activity=activity,
-                child=child,
-                defaults={
-                    'assigned_by': activity.created_by
-                }
-            )
-            
-            if created:
-                self.stdout.write(f'Assigned: {activity.title}')
-                assigned_count += 1
-            else:
-                self.stdout.write(f'Already assigned: {activity.title}')
+        # Assign all activities to child in a single insert
+        already_assigned = ActivityAssignment.objects.filter(child=child).count()
+        ActivityAssignment.objects.bulk_create(
+            [
+                ActivityAssignment(
+                    activity=activity,
+                    child=child,
+                    assigned_by_id=activity.created_by_id
+                )
+                for activity in activities
+            ],
+            ignore_conflicts=True
+        )
+        assigned_count = ActivityAssignment.objects.filter(child=child).count() - already_assigned
         
         self.stdout.write(
             self.style.SUCCESS(f'Successfully assigned {assigned_count} activities to {child.get_full_name()}')
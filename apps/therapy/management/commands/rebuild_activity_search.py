@@ -0,0 +1,14 @@
+from django.core.management.base import BaseCommand
+from apps.therapy.models import TherapyActivity
+from apps.therapy.search import rebuild_index, fts_available
+
+
+class Command(BaseCommand):
+    help = 'Rebuild the full-text search index over therapy activities'
+
+    def handle(self, *args, **options):
+        if not fts_available():
+            self.stdout.write(self.style.WARNING('No FTS5 index on this database; search uses the fallback'))
+            return
+        count = rebuild_index(TherapyActivity.objects.all())
+        self.stdout.write(self.style.SUCCESS(f'Indexed {count} activities'))
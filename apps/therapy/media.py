@@ -0,0 +1,140 @@
+"""
+Media manifests for activities.
+
+Every item records the size and SHA-256 of its image and audio files when it
+is saved, so an activity's manifest is assembled from its item rows without
+touching the files. Asset URLs carry a short hash, which lets clients cache
+them indefinitely. The manifest is embedded in ``activity_play`` and served as
+JSON, and all of an activity's files can be downloaded as one zip bundle, so
+the tablet has everything before a child starts playing.
+"""
+import hashlib
+import json
+import mimetypes
+import tempfile
+import zipfile
+
+MEDIA_FIELDS = ('image', 'audio_file')
+CHUNK_SIZE = 64 * 1024
+
+
+def _asset_entry(field_name, file):
+    digest = hashlib.sha256()
+    size = 0
+    with file.storage.open(file.name, 'rb') as handle:
+        for chunk in iter(lambda: handle.read(CHUNK_SIZE), b''):
+            digest.update(chunk)
+            size += len(chunk)
+    sha256 = digest.hexdigest()
+    return {
+        'field': field_name,
+        'name': file.name,
+        'size': size,
+        'sha256': sha256,
+        'content_type': mimetypes.guess_type(file.name)[0] or 'application/octet-stream',
+    }
+
+
+def item_assets(item):
+    """Asset entries for the item's files; files missing from storage are left out"""
+    assets = []
+    for field_name in MEDIA_FIELDS:
+        file = getattr(item, field_name)
+        if not file:
+            continue
+        try:
+            assets.append(_asset_entry(field_name, file))
+        except OSError:
+            continue
+    return assets
+
+
+def _is_current(item):
+    recorded = {asset['field']: asset['name'] for asset in item.assets}
+    current = {field_name: getattr(item, field_name).name for field_name in MEDIA_FIELDS if getattr(item, field_name)}
+    return recorded == current
+
+
+def refresh_item_assets(item):
+    """Re-hash the item's files if they changed since its assets were recorded"""
+    if _is_current(item):
+        return False
+    item.assets = item_assets(item)
+    # update() rather than save() so the post_save signal does not fire again
+    type(item).objects.filter(pk=item.pk).update(assets=item.assets)
+    return True
+
+
+def _asset_url(item, asset):
+    return f"{getattr(item, asset['field']).url}?v={asset['sha256'][:12]}"
+
+
+def activity_manifest(activity, items=None):
+    """Items and assets of ``activity`` with a version that changes with any file.
+
+    ``items`` may be passed when they are already loaded. Items saved before
+    manifests existed are hashed on first use.
+    """
+    items = list(activity.items.all() if items is None else items)
+    assets = []
+    entries = []
+    for item in items:
+        refresh_item_assets(item)
+        urls = {}
+        for asset in item.assets:
+            url = _asset_url(item, asset)
+            urls[asset['field']] = url
+            assets.append({
+                'url': url,
+                'name': asset['name'],
+                'size': asset['size'],
+                'sha256': asset['sha256'],
+                'content_type': asset['content_type'],
+            })
+        entries.append({
+            'id': item.id,
+            'title': item.title,
+            'order': item.order,
+            'is_correct_answer': item.is_correct_answer,
+            'group_id': item.group_id,
+            'image': urls.get('image'),
+            'audio': urls.get('audio_file'),
+        })
+
+    version = hashlib.sha256(json.dumps(
+        [entries, [asset['sha256'] for asset in assets]],
+        sort_keys=True
+    ).encode()).hexdigest()[:16]
+    return {
+        'activity': activity.id,
+        'version': version,
+        'total_size': sum(asset['size'] for asset in assets),
+        'items': entries,
+        'assets': assets,
+    }
+
+
+def activity_bundle(activity, manifest, items=None):
+    """Zip of the manifest and every asset, as an open temporary file.
+
+    Images and audio are already compressed, so files are stored as they are.
+    """
+    items = list(activity.items.all() if items is None else items)
+    bundle = tempfile.SpooledTemporaryFile(max_size=8 * 1024 * 1024)
+    with zipfile.ZipFile(bundle, 'w', zipfile.ZIP_STORED) as archive:
+        archive.writestr('manifest.json', json.dumps(manifest))
+        written = set()
+        for item in items:
+            for asset in item.assets:
+                if asset['name'] in written:
+                    continue
+                file = getattr(item, asset['field'])
+                try:
+                    with file.storage.open(asset['name'], 'rb') as source, archive.open(asset['name'], 'w') as target:
+                        for chunk in iter(lambda: source.read(CHUNK_SIZE), b''):
+                            target.write(chunk)
+                except OSError:
+                    continue
+                written.add(asset['name'])
+    bundle.seek(0)
+    return bundle
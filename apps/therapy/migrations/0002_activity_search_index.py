@@ -0,0 +1,44 @@
+from django.db import migrations
+
+
+FTS_TABLE = 'therapy_activity_fts'
+
+
+def create_search_index(apps, schema_editor):
+    """FTS5 only exists on SQLite; other backends use the icontains fallback"""
+    if schema_editor.connection.vendor != 'sqlite':
+        return
+    TherapyActivity = apps.get_model('therapy', 'TherapyActivity')
+    ActivityItem = apps.get_model('therapy', 'ActivityItem')
+
+    titles = {}
+    for activity_id, title in ActivityItem.objects.values_list('activity_id', 'title'):
+        titles.setdefault(activity_id, []).append(title)
+
+    schema_editor.execute(
+        f"CREATE VIRTUAL TABLE IF NOT EXISTS {FTS_TABLE} USING fts5("
+        "title, description, instructions, items, tokenize='unicode61 remove_diacritics 2')"
+    )
+    for activity_id, title, description, instructions in TherapyActivity.objects.values_list(
+        'id', 'title', 'description', 'instructions'
+    ):
+        schema_editor.execute(
+            f'INSERT INTO {FTS_TABLE} (rowid, title, description, instructions, items) VALUES (%s, %s, %s, %s, %s)',
+            [activity_id, title, description, instructions, ' '.join(titles.get(activity_id, []))]
+        )
+
+
+def drop_search_index(apps, schema_editor):
+    if schema_editor.connection.vendor == 'sqlite':
+        schema_editor.execute(f'DROP TABLE IF EXISTS {FTS_TABLE}')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('therapy', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_search_index, drop_search_index),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.2.4 on 2026-10-19 12:26
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('therapy', '0002_activity_search_index'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='activityitem',
+            name='assets',
+            field=models.JSONField(blank=True, default=list, editable=False, help_text='Size and hash of the image and audio files, for the media manifest'),
+        ),
+    ]
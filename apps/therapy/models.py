@@ -1,4 +1,4 @@
-from django.db import models
+from django.db import models, transaction
 from django.conf import settings
 from django.utils.translation import gettext_lazy as _
 
@@ -48,6 +48,34 @@ class TherapyActivity(models.Model):
     
     def __str__(self):
         return f"{self.title} ({self.get_activity_type_display()})"
+    
+    def assign_to_children(self, children, assigned_by, due_date=None, notes=None):
+        """Assign this activity to many children in one transaction.
+        
+        Children who already have the activity are skipped by the
+        (activity, child) unique constraint. Returns the number of new assignments.
+        """
+        if isinstance(children, models.QuerySet):
+            child_ids = list(children.values_list('pk', flat=True))
+        else:
+            child_ids = [child.pk for child in children]
+        
+        with transaction.atomic():
+            existing_count = self.assignments.count()
+            ActivityAssignment.objects.bulk_create(
+                [
+                    ActivityAssignment(
+                        activity=self,
+                        child_id=child_id,
+                        assigned_by=assigned_by,
+                        due_date=due_date,
+                        notes=notes
+                    )
+                    for child_id in child_ids
+                ],
+                ignore_conflicts=True
+            )
+            return self.assignments.count() - existing_count
 
 
 class ActivityItem(models.Model):
@@ -76,6 +104,12 @@ class ActivityItem(models.Model):
         null=True,
         help_text=_('For grouping related items together')
     )
+    assets = models.JSONField(
+        default=list,
+        blank=True,
+        editable=False,
+        help_text=_('Size and hash of the image and audio files, for the media manifest')
+    )
     
     class Meta:
         ordering = ['order']
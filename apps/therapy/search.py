@@ -0,0 +1,169 @@
+"""
+Full-text search over therapy activities.
+
+On SQLite every activity has a row in the ``therapy_activity_fts`` FTS5 table
+(title, description, instructions and the titles of its items), kept in step
+by signals. Searches are ranked with bm25 and highlighted by FTS5 itself. On
+other backends, or if the table is missing, search falls back to
+``icontains`` filters with highlighting done in Python.
+"""
+import re
+
+from django.db import connection
+from django.db.models import Q
+from django.utils.html import escape
+from django.utils.safestring import mark_safe
+
+from .models import ActivityItem
+
+FTS_TABLE = 'therapy_activity_fts'
+# Column weights for bm25: title, description, instructions, items
+WEIGHTS = (10.0, 2.0, 1.0, 4.0)
+SNIPPET_TOKENS = 16
+
+# Control characters never found in activity text mark highlighted terms, so
+# the text can be escaped before the markers become <mark> tags
+START, END = '\x02', '\x03'
+
+_fts_available = False
+
+
+def fts_available():
+    """Whether the database is SQLite with the FTS table in place"""
+    global _fts_available
+    if connection.vendor != 'sqlite':
+        return False
+    # Only a positive answer is remembered, so migrating later is picked up
+    if not _fts_available:
+        with connection.cursor() as cursor:
+            cursor.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = %s", [FTS_TABLE])
+            _fts_available = cursor.fetchone() is not None
+    return _fts_available
+
+
+def search_terms(text):
+    return re.findall(r'\w+', text or '')
+
+
+def _match_expression(terms):
+    # Quote every term so user input is never parsed as FTS5 syntax; a trailing
+    # * makes each term a prefix, which suits search-as-you-type
+    return ' '.join('"{}"*'.format(term.replace('"', '')) for term in terms)
+
+
+def _row(activity):
+    titles = ' '.join(activity.items.values_list('title', flat=True))
+    return [activity.id, activity.title, activity.description, activity.instructions, titles]
+
+
+def index_activity(activity):
+    """Replace the activity's FTS row"""
+    if not fts_available():
+        return
+    with connection.cursor() as cursor:
+        cursor.execute(f'DELETE FROM {FTS_TABLE} WHERE rowid = %s', [activity.id])
+        cursor.execute(
+            f'INSERT INTO {FTS_TABLE} (rowid, title, description, instructions, items) VALUES (%s, %s, %s, %s, %s)',
+            _row(activity)
+        )
+
+
+def remove_activity(activity_id):
+    if not fts_available():
+        return
+    with connection.cursor() as cursor:
+        cursor.execute(f'DELETE FROM {FTS_TABLE} WHERE rowid = %s', [activity_id])
+
+
+def rebuild_index(activities):
+    """Refill the FTS table from ``activities`` (a queryset of TherapyActivity)"""
+    if not fts_available():
+        return 0
+    titles = {}
+    for activity_id, title in ActivityItem.objects.filter(
+        activity__in=activities
+    ).values_list('activity_id', 'title'):
+        titles.setdefault(activity_id, []).append(title)
+    rows = [
+        [activity_id, title, description, instructions, ' '.join(titles.get(activity_id, []))]
+        for activity_id, title, description, instructions in activities.values_list(
+            'id', 'title', 'description', 'instructions'
+        ).iterator()
+    ]
+    with connection.cursor() as cursor:
+        cursor.execute(f'DELETE FROM {FTS_TABLE}')
+        cursor.executemany(
+            f'INSERT INTO {FTS_TABLE} (rowid, title, description, instructions, items) VALUES (%s, %s, %s, %s, %s)',
+            rows
+        )
+    return len(rows)
+
+
+def _markup(text):
+    """Escape FTS output and turn the markers into <mark> tags"""
+    return mark_safe(escape(text).replace(START, '<mark>').replace(END, '</mark>'))
+
+
+def _highlight_python(text, terms, limit=None):
+    if limit and len(text) > limit:
+        text = text[:limit].rsplit(' ', 1)[0] + '…'
+    pattern = re.compile(r'\b(' + '|'.join(re.escape(term) for term in terms) + r')', re.IGNORECASE)
+    return mark_safe(pattern.sub(r'<mark>\1</mark>', str(escape(text))))
+
+
+def _search_fts(queryset, terms):
+    scope_sql, scope_params = queryset.order_by().values('id').query.sql_with_params()
+    weights = ', '.join(str(weight) for weight in WEIGHTS)
+    sql = (
+        f"SELECT rowid, bm25({FTS_TABLE}, {weights}), "
+        f"highlight({FTS_TABLE}, 0, '{START}', '{END}'), "
+        f"snippet({FTS_TABLE}, -1, '{START}', '{END}', '…', {SNIPPET_TOKENS}) "
+        f"FROM {FTS_TABLE} WHERE {FTS_TABLE} MATCH %s AND rowid IN ({scope_sql}) "
+        f"ORDER BY 2"
+    )
+    with connection.cursor() as cursor:
+        cursor.execute(sql, [_match_expression(terms), *scope_params])
+        rows = cursor.fetchall()
+
+    activities = queryset.model.objects.select_related('created_by').in_bulk([row[0] for row in rows])
+    results = []
+    for activity_id, rank, title, snippet in rows:
+        activity = activities.get(activity_id)
+        if activity is None:
+            continue
+        activity.search_rank = -rank
+        activity.highlighted_title = _markup(title)
+        activity.search_snippet = _markup(snippet)
+        results.append(activity)
+    return results
+
+
+def _search_fallback(queryset, terms):
+    condition = Q()
+    for term in terms:
+        condition &= (
+            Q(title__icontains=term) | Q(description__icontains=term) |
+            Q(instructions__icontains=term) | Q(items__title__icontains=term)
+        )
+    results = list(queryset.filter(condition).select_related('created_by').distinct())
+    for activity in results:
+        title_hits = sum(term.lower() in activity.title.lower() for term in terms)
+        activity.search_rank = title_hits
+        activity.highlighted_title = _highlight_python(activity.title, terms)
+        activity.search_snippet = _highlight_python(activity.description, terms, limit=200)
+    results.sort(key=lambda activity: (-activity.search_rank, activity.title.lower()))
+    return results
+
+
+def search_activities(queryset, text):
+    """Activities in ``queryset`` matching every word of ``text``, best first.
+
+    Each result carries ``search_rank``, ``highlighted_title`` and
+    ``search_snippet`` (safe HTML with matches in <mark> tags).
+    """
+    terms = search_terms(text)
+    if not terms:
+        return list(queryset)
+    if fts_available():
+        return _search_fts(queryset, terms)
+    return _search_fallback(queryset, terms)
@@ -0,0 +1,30 @@
+from django.db.models.signals import post_save, post_delete
+from django.dispatch import receiver
+
+from .models import TherapyActivity, ActivityItem
+from .media import refresh_item_assets
+from .search import index_activity, remove_activity
+
+
+@receiver(post_save, sender=TherapyActivity)
+def index_saved_activity(sender, instance, **kwargs):
+    index_activity(instance)
+
+
+@receiver(post_delete, sender=TherapyActivity)
+def unindex_deleted_activity(sender, instance, **kwargs):
+    remove_activity(instance.id)
+
+
+@receiver(post_save, sender=ActivityItem)
+@receiver(post_delete, sender=ActivityItem)
+def reindex_item_activity(sender, instance, **kwargs):
+    """Item titles are part of their activity's search row"""
+    activity = TherapyActivity.objects.filter(pk=instance.activity_id).first()
+    if activity:
+        index_activity(activity)
+
+
+@receiver(post_save, sender=ActivityItem)
+def record_item_assets(sender, instance, **kwargs):
+    refresh_item_assets(instance)
@@ -1,3 +1,526 @@
-from django.test import TestCase
+from django.test import TestCase, Client
+from django.contrib.auth import get_user_model
+from django.urls import reverse
+from django.core.cache import cache
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.test import override_settings
+from .models import TherapyActivity, ActivityAssignment, ActivityItem
+from . import search
+from unittest import mock
+from apps.users.models import TeacherProfile, ChildProfile, ParentProfile
+from apps.games.models import Game, ColorMatchingGame, GameSession, GameProgress
+import hashlib
+import io
+import json
+import shutil
+import tempfile
+import time
+import zipfile
 
-# Create your tests here.
+User = get_user_model()
+
+
+class BulkAssignmentTest(TestCase):
+    def setUp(self):
+        self.client = Client()
+
+        self.teacher_user = User.objects.create_user(
+            email='teacher@test.com',
+            username='teachertest',
+            password='testpass123',
+            role='teacher',
+            first_name='Test',
+            last_name='Teacher'
+        )
+        self.teacher_profile = TeacherProfile.objects.create(user=self.teacher_user)
+
+        # Create a classroom of 500 children without hashing 500 passwords
+        User.objects.bulk_create([
+            User(email=f'child{i}@test.com', username=f'child{i}', role='child')
+            for i in range(500)
+        ])
+        self.children = User.objects.filter(role='child')
+        ChildProfile.objects.bulk_create([
+            ChildProfile(user=child, age=6) for child in self.children
+        ])
+        self.teacher_profile.assigned_children.add(*ChildProfile.objects.all())
+
+        self.activity = TherapyActivity.objects.create(
+            title="Shape Matching",
+            description="Match the shapes",
+            instructions="Find the matching shapes",
+            created_by=self.teacher_user
+        )
+
+    def test_assign_to_children(self):
+        """Test assigning an activity to many children in one call"""
+        created_count = self.activity.assign_to_children(self.children, assigned_by=self.teacher_user)
+
+        self.assertEqual(created_count, 500)
+        self.assertEqual(ActivityAssignment.objects.filter(activity=self.activity).count(), 500)
+
+    def test_assign_to_children_skips_existing(self):
+        """Test that existing assignments are left untouched"""
+        first_child = self.children.first()
+        existing = ActivityAssignment.objects.create(
+            activity=self.activity,
+            child=first_child,
+            assigned_by=self.teacher_user,
+            notes="Original"
+        )
+
+        created_count = self.activity.assign_to_children(self.children, assigned_by=self.teacher_user)
+
+        self.assertEqual(created_count, 499)
+        existing.refresh_from_db()
+        self.assertEqual(existing.notes, "Original")
+
+        # Assigning again creates nothing
+        self.assertEqual(self.activity.assign_to_children(self.children, assigned_by=self.teacher_user), 0)
+
+    def test_api_bulk_assign_timing(self):
+        """Test assigning an activity to a whole classroom of 500 children via the API"""
+        self.client.login(email='teacher@test.com', password='testpass123')
+
+        start = time.perf_counter()
+        response = self.client.post(
+            reverse('therapy:api_bulk_assign', args=[self.activity.id]),
+            data=json.dumps({'assign_all': True}),
+            content_type='application/json'
+        )
+        elapsed = time.perf_counter() - start
+
+        self.assertEqual(response.status_code, 200)
+        result = json.loads(response.content)
+        self.assertTrue(result['success'])
+        self.assertEqual(result['created'], 500)
+        self.assertLess(elapsed, 2.0)
+
+    def test_api_bulk_assign_selected_children(self):
+        """Test assigning an activity to selected children via the API"""
+        self.client.login(email='teacher@test.com', password='testpass123')
+        child_ids = list(self.children.values_list('id', flat=True)[:25])
+
+        response = self.client.post(
+            reverse('therapy:api_bulk_assign', args=[self.activity.id]),
+            data=json.dumps({'child_ids': child_ids, 'due_date': '2026-01-31'}),
+            content_type='application/json'
+        )
+
+        self.assertEqual(response.status_code, 200)
+        assignments = ActivityAssignment.objects.filter(activity=self.activity)
+        self.assertEqual(assignments.count(), 25)
+        self.assertEqual(str(assignments.first().due_date), '2026-01-31')
+
+    def test_api_bulk_assign_rejects_other_children(self):
+        """Test that children outside the teacher's classroom cannot be assigned"""
+        outsider = User.objects.create(email='outsider@test.com', username='outsider', role='child')
+        self.client.login(email='teacher@test.com', password='testpass123')
+
+        response = self.client.post(
+            reverse('therapy:api_bulk_assign', args=[self.activity.id]),
+            data=json.dumps({'child_ids': [outsider.id]}),
+            content_type='application/json'
+        )
+
+        self.assertEqual(response.status_code, 400)
+        self.assertFalse(ActivityAssignment.objects.exists())
+
+    def test_bulk_assign_form(self):
+        """Test the bulk assignment form view"""
+        self.client.login(email='teacher@test.com', password='testpass123')
+
+        response = self.client.get(reverse('therapy:activity_bulk_assign', args=[self.activity.id]))
+        self.assertEqual(response.status_code, 200)
+
+        response = self.client.post(
+            reverse('therapy:activity_bulk_assign', args=[self.activity.id]),
+            {'assign_all': 'on'}
+        )
+        self.assertEqual(response.status_code, 302)
+        self.assertEqual(ActivityAssignment.objects.filter(activity=self.activity).count(), 500)
+
+
+class ActivitySearchTest(TestCase):
+    def setUp(self):
+        self.client = Client()
+
+        self.therapist_user = User.objects.create_user(
+            email='therapist@test.com',
+            username='therapisttest',
+            password='testpass123',
+            role='therapist',
+            first_name='Test',
+            last_name='Therapist'
+        )
+        self.other_therapist = User.objects.create_user(
+            email='other@test.com',
+            username='othertest',
+            password='testpass123',
+            role='therapist'
+        )
+
+        self.shapes = TherapyActivity.objects.create(
+            title="Shape Matching",
+            description="Match circles and squares",
+            instructions="Drag each shape to its outline",
+            created_by=self.therapist_user
+        )
+        self.feelings = TherapyActivity.objects.create(
+            title="Feelings Faces",
+            description="Name the emotion <b>shown</b> on each face",
+            instructions="Point at the happy face",
+            created_by=self.therapist_user
+        )
+        self.colors = TherapyActivity.objects.create(
+            title="Color Sorting",
+            description="Sort objects by color, including shapes",
+            instructions="Put red things together",
+            created_by=self.therapist_user
+        )
+        TherapyActivity.objects.create(
+            title="Shape Hunt",
+            description="Someone else's activity",
+            instructions="Find shapes",
+            created_by=self.other_therapist
+        )
+        ActivityItem.objects.create(activity=self.feelings, title="Surprised giraffe", order=1)
+
+    def search(self, text):
+        return search.search_activities(TherapyActivity.objects.filter(created_by=self.therapist_user), text)
+
+    def test_uses_fts_on_sqlite(self):
+        """Test that the migration created the FTS5 table"""
+        self.assertTrue(search.fts_available())
+
+    def test_ranked_results(self):
+        """Test that title matches outrank description matches"""
+        results = self.search('shape')
+
+        self.assertEqual([activity.id for activity in results], [self.shapes.id, self.colors.id])
+
+    def test_prefix_and_item_titles(self):
+        """Test search-as-you-type prefixes and matches on item titles"""
+        self.assertEqual([activity.id for activity in self.search('gira')], [self.feelings.id])
+        self.assertEqual([activity.id for activity in self.search('feel fac')], [self.feelings.id])
+
+    def test_highlighting_escapes_text(self):
+        """Test that matches are marked and activity text stays escaped"""
+        result = self.search('emotion')[0]
+
+        self.assertIn('<mark>emotion</mark>', result.search_snippet)
+        self.assertIn('&lt;b&gt;shown&lt;/b&gt;', result.search_snippet)
+        self.assertEqual(str(self.search('shape')[0].highlighted_title), '<mark>Shape</mark> Matching')
+
+    def test_index_follows_changes(self):
+        """Test that edits, item changes and deletions reach the index"""
+        self.shapes.title = "Triangle Time"
+        self.shapes.save()
+        self.assertEqual([activity.id for activity in self.search('triangle')], [self.shapes.id])
+
+        item = ActivityItem.objects.get(title="Surprised giraffe")
+        item.delete()
+        self.assertEqual(self.search('giraffe'), [])
+
+        self.colors.delete()
+        self.assertEqual(self.search('sort'), [])
+
+    def test_fts_syntax_is_not_interpreted(self):
+        """Test that FTS5 operators in user input are searched as plain words"""
+        self.assertEqual(self.search('shape OR "NEAR('), self.search('shape or near'))
+
+    def test_fallback_without_fts(self):
+        """Test the icontains fallback used on other databases"""
+        with mock.patch.object(search, 'fts_available', return_value=False):
+            results = self.search('shape')
+            self.assertEqual([activity.id for activity in results], [self.shapes.id, self.colors.id])
+            self.assertEqual(str(results[0].highlighted_title), '<mark>Shape</mark> Matching')
+            self.assertEqual([activity.id for activity in self.search('giraffe')], [self.feelings.id])
+
+    def test_activity_list_search(self):
+        """Test that the list view searches only the user's activities"""
+        self.client.login(email='therapist@test.com', password='testpass123')
+        response = self.client.get(reverse('therapy:activity_list'), {'search': 'shape'})
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual([activity.id for activity in response.context['activities']], [self.shapes.id, self.colors.id])
+
+        response = self.client.get(reverse('therapy:api_activity_search'), {'q': 'shape'})
+        self.assertEqual([row['id'] for row in response.json()['results']], [self.shapes.id, self.colors.id])
+
+
+class ActivityDetailTest(TestCase):
+    def setUp(self):
+        self.client = Client()
+
+        self.therapist_user = User.objects.create_user(
+            email='therapist@test.com',
+            username='therapisttest',
+            password='testpass123',
+            role='therapist'
+        )
+        self.parent_user = User.objects.create_user(
+            email='parent@test.com',
+            username='parenttest',
+            password='testpass123',
+            role='parent'
+        )
+        self.child_user = User.objects.create_user(
+            email='child@test.com',
+            username='childtest',
+            password='testpass123',
+            role='child'
+        )
+        self.other_child = User.objects.create_user(
+            email='other@test.com',
+            username='othertest',
+            password='testpass123',
+            role='child'
+        )
+        parent_profile = ParentProfile.objects.create(user=self.parent_user)
+        parent_profile.children.add(ChildProfile.objects.create(user=self.child_user, age=6))
+
+        self.activity = TherapyActivity.objects.create(
+            title="Shape Matching",
+            description="Match the shapes",
+            instructions="Find the matching shapes",
+            created_by=self.therapist_user
+        )
+        ActivityItem.objects.bulk_create([
+            ActivityItem(activity=self.activity, title=f"Shape {i}", order=i) for i in range(5)
+        ])
+        self.assignment = ActivityAssignment.objects.create(
+            activity=self.activity,
+            child=self.child_user,
+            assigned_by=self.therapist_user
+        )
+
+    def add_children(self, count):
+        User.objects.bulk_create([
+            User(email=f'kid{i}@test.com', username=f'kid{i}', role='child')
+            for i in range(count)
+        ])
+        self.activity.assign_to_children(
+            User.objects.filter(username__startswith='kid'),
+            assigned_by=self.therapist_user
+        )
+
+    def get_detail(self):
+        return self.client.get(reverse('therapy:activity_detail', args=[self.activity.id]))
+
+    def test_child_sees_own_assignment(self):
+        """Test that a child gets their assignment and nobody else's"""
+        self.activity.assign_to_children([self.other_child], assigned_by=self.therapist_user)
+        self.client.login(email='child@test.com', password='testpass123')
+        response = self.get_detail()
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.context['assignment'], self.assignment)
+        self.assertEqual(response.context['assignments'], [self.assignment])
+        self.assertEqual(len(response.context['items']), 5)
+
+    def test_parent_sees_child_assignment(self):
+        """Test that a parent gets their child's assignment"""
+        self.client.login(email='parent@test.com', password='testpass123')
+        response = self.get_detail()
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.context['assignment'], self.assignment)
+
+    def test_unassigned_child_is_redirected(self):
+        """Test that children without an assignment cannot view the activity"""
+        self.client.login(email='other@test.com', password='testpass123')
+        response = self.get_detail()
+
+        self.assertRedirects(response, reverse('therapy:activity_list'))
+
+    def test_query_count_is_constant(self):
+        """Test that the therapist view does not query per assignment"""
+        self.client.login(email='therapist@test.com', password='testpass123')
+        self.get_detail()
+
+        with self.assertNumQueries(5) as small:
+            self.get_detail()
+        self.add_children(40)
+        with self.assertNumQueries(len(small.captured_queries)):
+            response = self.get_detail()
+        self.assertEqual(len(response.context['assignments']), 41)
+
+
+class ActivityMediaManifestTest(TestCase):
+    def setUp(self):
+        self.media_root = tempfile.mkdtemp()
+        self.override = override_settings(MEDIA_ROOT=self.media_root)
+        self.override.enable()
+
+        self.client = Client()
+        self.therapist_user = User.objects.create_user(
+            email='therapist@test.com',
+            username='therapisttest',
+            password='testpass123',
+            role='therapist'
+        )
+        self.other_therapist = User.objects.create_user(
+            email='other@test.com',
+            username='othertest',
+            password='testpass123',
+            role='therapist'
+        )
+        self.child_user = User.objects.create_user(
+            email='child@test.com',
+            username='childtest',
+            password='testpass123',
+            role='child'
+        )
+
+        self.activity = TherapyActivity.objects.create(
+            title="Animal Sounds",
+            description="Match animals to their sounds",
+            instructions="Tap the animal you hear",
+            created_by=self.therapist_user
+        )
+        self.image_bytes = b'fake image bytes'
+        self.audio_bytes = b'fake audio bytes, a little longer'
+        self.item = ActivityItem.objects.create(
+            activity=self.activity,
+            title="Cow",
+            image=SimpleUploadedFile('cow.png', self.image_bytes, content_type='image/png'),
+            audio_file=SimpleUploadedFile('moo.mp3', self.audio_bytes, content_type='audio/mpeg'),
+        )
+        ActivityItem.objects.create(activity=self.activity, title="Dog", order=1)
+        self.assignment = ActivityAssignment.objects.create(
+            activity=self.activity,
+            child=self.child_user,
+            assigned_by=self.therapist_user
+        )
+        self.manifest_url = reverse('therapy:api_activity_manifest', args=[self.activity.id])
+
+    def tearDown(self):
+        self.override.disable()
+        shutil.rmtree(self.media_root, ignore_errors=True)
+
+    def test_assets_recorded_on_save(self):
+        """Test that saving an item records the size and hash of its files"""
+        self.item.refresh_from_db()
+        assets = {asset['field']: asset for asset in self.item.assets}
+
+        self.assertEqual(assets['image']['size'], len(self.image_bytes))
+        self.assertEqual(assets['image']['sha256'], hashlib.sha256(self.image_bytes).hexdigest())
+        self.assertEqual(assets['audio_file']['content_type'], 'audio/mpeg')
+
+    def test_manifest(self):
+        """Test the manifest lists every item and versioned asset URL"""
+        self.client.login(email='child@test.com', password='testpass123')
+        response = self.client.get(self.manifest_url)
+
+        self.assertEqual(response.status_code, 200)
+        manifest = response.json()
+        self.assertEqual([item['title'] for item in manifest['items']], ['Cow', 'Dog'])
+        self.assertEqual(len(manifest['assets']), 2)
+        self.assertEqual(manifest['total_size'], len(self.image_bytes) + len(self.audio_bytes))
+        image_hash = hashlib.sha256(self.image_bytes).hexdigest()
+        self.assertTrue(manifest['items'][0]['image'].endswith(f'?v={image_hash[:12]}'))
+        self.assertIsNone(manifest['items'][1]['image'])
+
+    def test_manifest_conditional_get(self):
+        """Test that the manifest revalidates and changes with the files"""
+        self.client.login(email='therapist@test.com', password='testpass123')
+        etag = self.client.get(self.manifest_url)['ETag']
+
+        response = self.client.get(self.manifest_url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+
+        self.item.image = SimpleUploadedFile('calf.png', b'another image', content_type='image/png')
+        self.item.save()
+        response = self.client.get(self.manifest_url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response['ETag'], etag)
+
+    def test_permissions(self):
+        """Test that only the creator and assigned children get the media"""
+        self.client.login(email='other@test.com', password='testpass123')
+        self.assertEqual(self.client.get(self.manifest_url).status_code, 403)
+
+    def test_bundle(self):
+        """Test that the bundle holds the manifest and every file"""
+        self.client.login(email='child@test.com', password='testpass123')
+        response = self.client.get(reverse('therapy:api_activity_bundle', args=[self.activity.id]))
+
+        self.assertEqual(response.status_code, 200)
+        archive = zipfile.ZipFile(io.BytesIO(b''.join(response.streaming_content)))
+        manifest = json.loads(archive.read('manifest.json'))
+        self.assertEqual(len(manifest['assets']), 2)
+        for asset in manifest['assets']:
+            self.assertEqual(hashlib.sha256(archive.read(asset['name'])).hexdigest(), asset['sha256'])
+
+    def test_play_page_embeds_manifest(self):
+        """Test that activity_play ships the manifest for preloading"""
+        self.client.login(email='child@test.com', password='testpass123')
+        response = self.client.get(reverse('therapy:activity_play', args=[self.assignment.id]))
+
+        self.assertEqual(response.status_code, 200)
+        self.assertContains(response, 'id="media-manifest"')
+        self.assertEqual(len(response.context['media_manifest']['assets']), 2)
+
+
+class GameDashboardTest(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.client = Client()
+        self.child = User.objects.create_user(
+            email='child@test.com',
+            username='childtest',
+            password='testpass123',
+            role='child'
+        )
+        self.game = Game.objects.create(name='Color Matching Game', slug='color-matching', description='Match colors')
+        Game.objects.create(name='Shape Sorting', slug='shape-sorting', description='Sort shapes')
+        for level in (1, 2):
+            ColorMatchingGame.objects.create(
+                level=level,
+                name=f'Level {level}',
+                description='Match the colors',
+                time_limit=60,
+                points_per_match=10,
+                required_matches=4
+            )
+        self.client.login(email='child@test.com', password='testpass123')
+
+    def play(self, score, time_taken, matches, attempts, level=1):
+        session = GameSession.objects.create(child=self.child, game=self.game, level=level)
+        self.client.post(
+            reverse('games:save_result'),
+            data=json.dumps({
+                'session_id': session.id, 'score': score, 'time_taken': time_taken,
+                'matches_found': matches, 'total_attempts': attempts, 'completed': True
+            }),
+            content_type='application/json'
+        )
+
+    def test_summary_is_kept_up_to_date(self):
+        """Test that saving results updates play time, best score and recent accuracy"""
+        for attempts in (10, 8, 5, 4):
+            self.play(40, 90, 4, attempts)
+
+        progress = GameProgress.objects.get(child=self.child, game=self.game)
+        self.assertEqual(progress.total_time, 360)
+        self.assertEqual(progress.best_score, 40)
+        self.assertEqual(progress.recent_accuracy, [40.0, 50.0, 80.0, 100.0])
+
+    def test_dashboard_renders_from_summaries(self):
+        """Test that every game is shown from its summary with one query for all games"""
+        for attempts in (10, 8, 5, 4):
+            self.play(40, 90, 4, attempts)
+        self.play(40, 30, 4, 4, level=2)
+        self.client.get(reverse('therapy:game_dashboard'))
+
+        with self.assertNumQueries(3):
+            response = self.client.get(reverse('therapy:game_dashboard'))
+        summaries = {summary.game.slug: summary for summary in response.context['summaries']}
+        self.assertEqual(len(summaries), 2)
+        self.assertEqual(summaries['color-matching'].accuracy_trend, 'up')
+        self.assertEqual(summaries['color-matching'].progress_offset, 0)
+        self.assertEqual(summaries['shape-sorting'].sessions, 0)
+        self.assertEqual(response.context['total_time'], 6.5)
+        self.assertEqual(response.context['completed_activities'], 1)
+        self.assertContains(response, 'Level 2/2')
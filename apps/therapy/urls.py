@@ -10,6 +10,11 @@ urlpatterns = [
     path('<int:activity_id>/', views.activity_detail, name='activity_detail'),
     path('<int:activity_id>/edit/', views.activity_edit, name='activity_edit'),
     path('<int:activity_id>/assign/', views.activity_assign, name='activity_assign'),
+    path('<int:activity_id>/assign/bulk/', views.activity_bulk_assign, name='activity_bulk_assign'),
+    path('api/<int:activity_id>/assign/', views.api_bulk_assign, name='api_bulk_assign'),
+    path('api/search/', views.api_activity_search, name='api_activity_search'),
+    path('api/<int:activity_id>/manifest/', views.api_activity_manifest, name='api_activity_manifest'),
+    path('api/<int:activity_id>/bundle/', views.api_activity_bundle, name='api_activity_bundle'),
     
     # Item management
     path('<int:activity_id>/items/create/', views.item_create, name='item_create'),
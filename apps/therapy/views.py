@@ -1,11 +1,16 @@
 from django.shortcuts import render, get_object_or_404, redirect
 from django.contrib.auth.decorators import login_required
 from django.contrib import messages
-from django.http import JsonResponse
-from django.views.decorators.http import require_POST
-from django.db.models import Q, Avg, Count, Sum, Max
+from django.http import JsonResponse, FileResponse
+from django.urls import reverse
+from django.views.decorators.http import require_POST, require_GET
+from django.views.decorators.cache import cache_control
+from django.utils.cache import get_conditional_response
+from django.views.decorators.csrf import csrf_exempt
+from django.db.models import Q, Avg, Count, Sum, Max, Prefetch
 from django.utils import timezone
 from datetime import datetime, timedelta
+import json
 
 from .models import (
     TherapyActivity, ActivityItem, ActivityAssignment, 
@@ -13,19 +18,19 @@ from .models import (
 )
 from .forms import (
     TherapyActivityForm, ActivityItemForm, ActivityAssignmentForm,
-    ActivityAttemptForm, ActivityFilterForm, ProgressFilterForm
+    ActivityBulkAssignmentForm, ActivityAttemptForm, ActivityFilterForm, ProgressFilterForm
 )
-from apps.games.models import Game, GameProgress
+from .media import activity_manifest, activity_bundle
+from .search import search_activities
+from apps.games.summary import child_summaries
+from apps.sync.idempotency import idempotent
 
 
-@login_required
-def activity_list(request):
-    """Display list of therapy activities based on user role"""
-    user = request.user
-    
+def _visible_activities(user):
+    """Activities a user may list, based on their role"""
     if user.role == 'child':
         # Children see their assigned activities
-        activities = TherapyActivity.objects.filter(
+        return TherapyActivity.objects.filter(
             assignments__child=user,
             assignments__is_completed=False
         ).distinct()
@@ -33,14 +38,20 @@ def activity_list(request):
         # Parents see activities assigned to their children
         children = user.parent_profile.children.all()
         child_users = [child.user for child in children]
-        activities = TherapyActivity.objects.filter(
+        return TherapyActivity.objects.filter(
             assignments__child__in=child_users
         ).distinct()
     elif user.role in ['therapist', 'teacher']:
         # Therapists/Teachers see activities they created
-        activities = TherapyActivity.objects.filter(created_by=user)
-    else:
-        activities = TherapyActivity.objects.none()
+        return TherapyActivity.objects.filter(created_by=user)
+    return TherapyActivity.objects.none()
+
+
+@login_required
+def activity_list(request):
+    """Display list of therapy activities based on user role"""
+    user = request.user
+    activities = _visible_activities(user)
     
     # Apply filters
     filter_form = ActivityFilterForm(request.GET)
@@ -60,11 +71,7 @@ def activity_list(request):
                     is_active=(is_active_value == 'True')
                 )
         if filter_form.cleaned_data.get('search'):
-            search_term = filter_form.cleaned_data['search']
-            activities = activities.filter(
-                Q(title__icontains=search_term) |
-                Q(description__icontains=search_term)
-            )
+            activities = search_activities(activities, filter_form.cleaned_data['search'])
     
     context = {
         'activities': activities,
@@ -74,57 +81,69 @@ def activity_list(request):
     return render(request, 'therapy/activity_list.html', context)
 
 
+@login_required
+def api_activity_search(request):
+    """Ranked, highlighted activity search for search-as-you-type"""
+    try:
+        limit = min(int(request.GET.get('limit', 20)), 100)
+    except ValueError:
+        return JsonResponse({'error': 'Invalid limit'}, status=400)
+    
+    results = search_activities(_visible_activities(request.user), request.GET.get('q', ''))[:limit]
+    return JsonResponse({'results': [
+        {
+            'id': activity.id,
+            'title': activity.title,
+            'highlighted_title': getattr(activity, 'highlighted_title', activity.title),
+            'snippet': getattr(activity, 'search_snippet', ''),
+            'url': reverse('therapy:activity_detail', args=[activity.id]),
+        }
+        for activity in results
+    ]})
+
+
+def _load_activity_detail(activity_id, user):
+    """Activity with its items and the assignments ``user`` may see.
+    
+    Everything is fetched up front in a fixed number of queries: the activity
+    with its creator, its items, and the visible assignments with their child
+    and assigning user. Returns ``(activity, assignments)``.
+    """
+    assignments = ActivityAssignment.objects.select_related('child', 'assigned_by')
+    if user.role == 'child':
+        assignments = assignments.filter(child=user)
+    elif user.role == 'parent':
+        assignments = assignments.filter(child__child_profile__parents__user=user)
+    activity = get_object_or_404(
+        TherapyActivity.objects.select_related('created_by').prefetch_related(
+            'items',
+            Prefetch('assignments', queryset=assignments, to_attr='visible_assignments')
+        ),
+        id=activity_id
+    )
+    return activity, activity.visible_assignments
+
+
 @login_required
 def activity_detail(request, activity_id):
     """Display activity details and items"""
-    activity = get_object_or_404(TherapyActivity, id=activity_id)
     user = request.user
+    activity, assignments = _load_activity_detail(activity_id, user)
     
-    # Check permissions and get assignment
+    # Children and parents need an assignment; it doubles as the one to play
     assignment = None
-    if user.role == 'child':
-        assignment = ActivityAssignment.objects.filter(
-            activity=activity,
-            child=user
-        ).first()
-        if not assignment:
-            messages.error(request, "You don't have permission to view this activity.")
-            return redirect('therapy:activity_list')
-    elif user.role == 'parent':
-        children = user.parent_profile.children.all()
-        child_users = [child.user for child in children]
-        assignment = ActivityAssignment.objects.filter(
-            activity=activity,
-            child__in=child_users
-        ).first()
-        if not assignment:
+    if user.role in ['child', 'parent']:
+        if not assignments:
             messages.error(request, "You don't have permission to view this activity.")
             return redirect('therapy:activity_list')
-    elif user.role in ['therapist', 'teacher'] and activity.created_by != user:
+        assignment = assignments[0]
+    elif user.role in ['therapist', 'teacher'] and activity.created_by_id != user.id:
         messages.error(request, "You don't have permission to view this activity.")
         return redirect('therapy:activity_list')
     
-    items = activity.items.all()
-    
-    # Get assignment info for children
-    if user.role == 'child':
-        assignments = [ActivityAssignment.objects.filter(
-            activity=activity,
-            child=user
-        ).first()]
-    elif user.role == 'parent':
-        children = user.parent_profile.children.all()
-        child_users = [child.user for child in children]
-        assignments = ActivityAssignment.objects.filter(
-            activity=activity,
-            child__in=child_users
-        )
-    else:
-        assignments = ActivityAssignment.objects.filter(activity=activity)
-    
     context = {
         'activity': activity,
-        'items': items,
+        'items': activity.items.all(),
         'assignments': assignments,
         'assignment': assignment,
         'user_role': user.role,
@@ -133,6 +152,58 @@ def activity_detail(request, activity_id):
     return render(request, 'therapy/activity_detail.html', context)
 
 
+def _media_activity(activity_id, user):
+    """Activity whose media ``user`` may download, or None"""
+    activity, assignments = _load_activity_detail(activity_id, user)
+    if user.role in ['child', 'parent']:
+        return activity if assignments else None
+    if user.role in ['therapist', 'teacher'] and activity.created_by_id == user.id:
+        return activity
+    return None
+
+
+@login_required
+@require_GET
+@cache_control(private=True, no_cache=True)
+def api_activity_manifest(request, activity_id):
+    """Items and media files of an activity, with sizes and hashes for preloading"""
+    activity = _media_activity(activity_id, request.user)
+    if activity is None:
+        return JsonResponse({'error': 'Permission denied'}, status=403)
+    
+    manifest = activity_manifest(activity)
+    etag = f'"{manifest["version"]}"'
+    response = get_conditional_response(request, etag=etag)
+    if response is None:
+        response = JsonResponse(manifest)
+    response['ETag'] = etag
+    return response
+
+
+@login_required
+@require_GET
+@cache_control(private=True, no_cache=True)
+def api_activity_bundle(request, activity_id):
+    """Zip of an activity's manifest and media files, downloaded in one request"""
+    activity = _media_activity(activity_id, request.user)
+    if activity is None:
+        return JsonResponse({'error': 'Permission denied'}, status=403)
+    
+    items = activity.items.all()
+    manifest = activity_manifest(activity, items)
+    etag = f'"{manifest["version"]}"'
+    response = get_conditional_response(request, etag=etag)
+    if response is None:
+        response = FileResponse(
+            activity_bundle(activity, manifest, items),
+            as_attachment=True,
+            filename=f'activity-{activity.id}-{manifest["version"]}.zip',
+            content_type='application/zip'
+        )
+    response['ETag'] = etag
+    return response
+
+
 @login_required
 def activity_create(request):
     """Create a new therapy activity"""
@@ -272,6 +343,74 @@ def activity_assign(request, activity_id):
     return render(request, 'therapy/activity_assign.html', context)
 
 
+@login_required
+def activity_bulk_assign(request, activity_id):
+    """Assign an activity to several children (or a whole caseload/classroom) at once"""
+    activity = get_object_or_404(TherapyActivity, id=activity_id)
+    
+    if request.user.role not in ['therapist', 'teacher'] or activity.created_by != request.user:
+        messages.error(request, "You don't have permission to assign this activity.")
+        return redirect('therapy:activity_detail', activity_id=activity.id)
+    
+    if request.method == 'POST':
+        form = ActivityBulkAssignmentForm(request.POST, user=request.user)
+        if form.is_valid():
+            created_count = activity.assign_to_children(
+                form.cleaned_data['children'],
+                assigned_by=request.user,
+                due_date=form.cleaned_data.get('due_date'),
+                notes=form.cleaned_data.get('notes') or None
+            )
+            messages.success(request, f"Activity assigned to {created_count} new child(ren) successfully!")
+            return redirect('therapy:activity_detail', activity_id=activity.id)
+    else:
+        form = ActivityBulkAssignmentForm(user=request.user)
+    
+    context = {
+        'form': form,
+        'activity': activity,
+        'title': f'Assign Activity: {activity.title}'
+    }
+    return render(request, 'therapy/activity_bulk_assign.html', context)
+
+
+@csrf_exempt
+@login_required
+@require_POST
+def api_bulk_assign(request, activity_id):
+    """Assign an activity to many children via JSON POST"""
+    activity = get_object_or_404(TherapyActivity, id=activity_id)
+    
+    if request.user.role not in ['therapist', 'teacher'] or activity.created_by != request.user:
+        return JsonResponse({'error': 'Permission denied'}, status=403)
+    
+    try:
+        data = json.loads(request.body)
+    except (TypeError, ValueError):
+        return JsonResponse({'error': 'Invalid JSON'}, status=400)
+    
+    form = ActivityBulkAssignmentForm({
+        'children': data.get('child_ids', []),
+        'assign_all': data.get('assign_all', False),
+        'due_date': data.get('due_date'),
+        'notes': data.get('notes', ''),
+    }, user=request.user)
+    if not form.is_valid():
+        return JsonResponse({'error': 'Invalid data', 'errors': form.errors}, status=400)
+    
+    created_count = activity.assign_to_children(
+        form.cleaned_data['children'],
+        assigned_by=request.user,
+        due_date=form.cleaned_data.get('due_date'),
+        notes=form.cleaned_data.get('notes') or None
+    )
+    return JsonResponse({
+        'success': True,
+        'created': created_count,
+        'total_assigned': activity.assignments.count()
+    })
+
+
 @login_required
 def activity_play(request, assignment_id):
     """Play/attempt an activity"""
@@ -279,9 +418,10 @@ def activity_play(request, assignment_id):
     user = request.user
     
     # Check permissions
-    if user.role == 'child' and assignment.child != user:
-        messages.error(request, "You don't have permission to play this activity.")
-        return redirect('therapy:activity_list')
+    if user.role == 'child':
+        if assignment.child != user:
+            messages.error(request, "You don't have permission to play this activity.")
+            return redirect('therapy:activity_list')
     elif user.role == 'parent':
         children = user.parent_profile.children.all()
         child_users = [child.user for child in children]
@@ -303,22 +443,68 @@ def activity_play(request, assignment_id):
         'activity': activity,
         'items': items,
         'attempts': attempts,
+        'media_manifest': activity_manifest(activity, items),
         'user_role': user.role
     }
     return render(request, 'therapy/activity_play.html', context)
 
 
+def record_activity_attempt(assignment, attempt):
+    """Save a finished attempt and fold it into the child's progress"""
+    attempt.assignment = assignment
+    if not attempt.completed_at:
+        attempt.completed_at = timezone.now()
+    
+    # Calculate time taken if not provided
+    if not attempt.time_taken:
+        # This would need to be calculated from frontend
+        attempt.time_taken = 0
+    
+    attempt.save()
+    
+    # Update progress
+    progress, created = ActivityProgress.objects.get_or_create(
+        child=assignment.child,
+        activity_type=assignment.activity.activity_type,
+        defaults={
+            'total_attempts': 0,
+            'successful_attempts': 0,
+            'average_score': 0,
+            'best_score': 0
+        }
+    )
+    
+    progress.total_attempts += 1
+    if attempt.is_successful:
+        progress.successful_attempts += 1
+    
+    # Update average score
+    all_attempts = ActivityAttempt.objects.filter(assignment__child=assignment.child)
+    if all_attempts.exists():
+        progress.average_score = all_attempts.aggregate(Avg('score'))['score__avg'] or 0
+    
+    # Update best score
+    if attempt.score and attempt.score > progress.best_score:
+        progress.best_score = attempt.score
+    
+    progress.last_attempt_date = timezone.now()
+    progress.save()
+    return attempt
+
+
 @login_required
 @require_POST
+@idempotent
 def activity_submit(request, assignment_id):
     """Submit activity attempt results"""
     assignment = get_object_or_404(ActivityAssignment, id=assignment_id)
     user = request.user
     
     # Check permissions
-    if user.role == 'child' and assignment.child != user:
-        messages.error(request, "You don't have permission to submit this activity.")
-        return redirect('therapy:activity_list')
+    if user.role == 'child':
+        if assignment.child != user:
+            messages.error(request, "You don't have permission to submit this activity.")
+            return redirect('therapy:activity_list')
     elif user.role == 'parent':
         children = user.parent_profile.children.all()
         child_users = [child.user for child in children]
@@ -332,44 +518,7 @@ def activity_submit(request, assignment_id):
     # Get form data
     form = ActivityAttemptForm(request.POST)
     if form.is_valid():
-        attempt = form.save(commit=False)
-        attempt.assignment = assignment
-        attempt.completed_at = timezone.now()
-        
-        # Calculate time taken if not provided
-        if not attempt.time_taken:
-            # This would need to be calculated from frontend
-            attempt.time_taken = 0
-        
-        attempt.save()
-        
-        # Update progress
-        progress, created = ActivityProgress.objects.get_or_create(
-            child=assignment.child,
-            activity_type=assignment.activity.activity_type,
-            defaults={
-                'total_attempts': 0,
-                'successful_attempts': 0,
-                'average_score': 0,
-                'best_score': 0
-            }
-        )
-        
-        progress.total_attempts += 1
-        if attempt.is_successful:
-            progress.successful_attempts += 1
-        
-        # Update average score
-        all_attempts = ActivityAttempt.objects.filter(assignment__child=assignment.child)
-        if all_attempts.exists():
-            progress.average_score = all_attempts.aggregate(Avg('score'))['score__avg'] or 0
-        
-        # Update best score
-        if attempt.score and attempt.score > progress.best_score:
-            progress.best_score = attempt.score
-        
-        progress.last_attempt_date = timezone.now()
-        progress.save()
+        attempt = record_activity_attempt(assignment, form.save(commit=False))
         
         messages.success(request, f"Activity completed! Score: {attempt.score}/{attempt.max_score}")
         return redirect('therapy:activity_detail', activity_id=assignment.activity.id)
@@ -380,42 +529,25 @@ def activity_submit(request, assignment_id):
 
 @login_required
 def game_dashboard(request):
-    """Game dashboard for children - Color Matching Game only"""
+    """Game dashboard for children, built from their per-game summaries"""
     user = request.user
     
     if user.role != 'child':
         messages.error(request, "This dashboard is only for children.")
         return redirect('therapy:activity_list')
     
-    # Get Color Matching Game from games app
-    color_matching_game = Game.objects.filter(name="Color Matching Game", is_active=True).first()
-    color_matching_progress = None
-    color_matching_progress_value = 0
-    if color_matching_game:
-        color_matching_progress = GameProgress.objects.filter(
-            game=color_matching_game,
-            child=user
-        ).first()
-        if color_matching_progress:
-            # Calculate progress: 157 - (level * 31.4) where 157 is full circle, 31.4 is per level
-            color_matching_progress_value = 157 - (color_matching_progress.highest_level_completed * 31.4)
-        else:
-            color_matching_progress_value = 157  # No progress, full circle
-    
-    # Calculate statistics for Color Matching Game only
-    total_activities = 1 if color_matching_game else 0
-    completed_activities = 1 if color_matching_progress and color_matching_progress.highest_level_completed >= 5 else 0
-    average_score = color_matching_progress.total_score if color_matching_progress else 0
-    total_time = color_matching_progress.total_sessions * 2 if color_matching_progress else 0  # Estimate 2 minutes per session
+    summaries = child_summaries(user)
+    played = [summary for summary in summaries if summary.sessions]
     
     context = {
-        'color_matching_game': color_matching_game,
-        'color_matching_progress': color_matching_progress,
-        'color_matching_progress_value': color_matching_progress_value,
-        'total_activities': total_activities,
-        'completed_activities': completed_activities,
-        'average_score': average_score,
-        'total_time': total_time,  # Already in minutes
+        'summaries': summaries,
+        'total_activities': len(summaries),
+        'completed_activities': sum(
+            1 for summary in summaries
+            if summary.level_count and summary.highest_level_completed >= summary.level_count
+        ),
+        'average_score': sum(summary.average_accuracy for summary in played) / len(played) if played else 0,
+        'total_time': sum(summary.total_time for summary in summaries) / 60,
         'user_role': user.role
     }
     return render(request, 'therapy/game_dashboard.html', context)
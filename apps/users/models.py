@@ -30,6 +30,7 @@ class CustomUser(AbstractUser):
     phone_number = models.CharField(max_length=15, blank=True, null=True)
     date_of_birth = models.DateField(blank=True, null=True)
     profile_picture = models.ImageField(upload_to='profile_pics/', blank=True, null=True)
+    updated_at = models.DateTimeField(auto_now=True)
     
     # Use email as username field
     USERNAME_FIELD = 'email'
@@ -12,6 +12,7 @@ from .forms import (
     TherapistProfileForm, TeacherProfileForm, ChildProfileForm, UserProfileForm
 )
 from .models import CustomUser, ParentProfile, TherapistProfile, TeacherProfile, ChildProfile
+from apps.routines.scheduling import current_routines, upcoming_routines
 
 
 def login_view(request):
@@ -117,6 +118,8 @@ def dashboard_view(request):
             context['profile'] = child_profile
         except ChildProfile.DoesNotExist:
             pass
+        context['current_routines'] = current_routines(user.id)
+        context['upcoming_routines'] = upcoming_routines(user.id, limit=3)
     
     return render(request, f'users/dashboard_{user.role}.html', context)
 
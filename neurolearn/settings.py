@@ -62,6 +62,8 @@ INSTALLED_APPS = [
     'apps.learning',
     'apps.drawing',
     'apps.games',
+    'apps.sync',
+    'apps.jobs',
 ]
 
 MIDDLEWARE = [
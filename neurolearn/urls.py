@@ -30,6 +30,7 @@ urlpatterns = [
     path('games/', include('apps.games.urls')),
     path('learning/', include('apps.learning.urls')),
     path('drawing/', include('apps.drawing.urls')),
+    path('sync/', include('apps.sync.urls')),
     path('drawing', RedirectView.as_view(url='/drawing/', permanent=False)),
 ]
 
@@ -14,3 +14,9 @@ from django.core.wsgi import get_wsgi_application
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'neurolearn.settings')
 
 application = get_wsgi_application()
+
+# Server processes start with tracing references in memory; management
+# commands never import this module, so migrate and friends skip it
+from apps.learning.tracing import warm_references  # noqa: E402
+
+warm_references()
@@ -0,0 +1,46 @@
+// Preloads every image and audio file in an activity's media manifest so
+// playback never waits on the network. Files are kept in Cache Storage when
+// available (asset URLs are versioned by hash) and handed out as blob URLs.
+window.ActivityMedia = (function() {
+  const CACHE_NAME = 'activity-media-v1';
+  const blobUrls = {};
+
+  async function openCache() {
+    if (!window.caches) return null;
+    try {
+      return await caches.open(CACHE_NAME);
+    } catch (e) {
+      return null;
+    }
+  }
+
+  async function fetchAsset(cache, asset) {
+    let response = cache ? await cache.match(asset.url) : null;
+    if (!response) {
+      response = await fetch(asset.url, { credentials: 'same-origin' });
+      if (!response.ok) throw new Error('Failed to load ' + asset.url);
+      if (cache) await cache.put(asset.url, response.clone());
+    }
+    blobUrls[asset.url] = URL.createObjectURL(await response.blob());
+  }
+
+  // Resolves once every asset is local; onProgress(loadedBytes, totalBytes)
+  async function preload(manifest, onProgress) {
+    const cache = await openCache();
+    const total = manifest.total_size || 0;
+    let loaded = 0;
+    if (onProgress) onProgress(loaded, total);
+    await Promise.all(manifest.assets.map(async (asset) => {
+      await fetchAsset(cache, asset);
+      loaded += asset.size;
+      if (onProgress) onProgress(loaded, total);
+    }));
+  }
+
+  // Local URL for an asset URL from the manifest
+  function url(assetUrl) {
+    return assetUrl ? (blobUrls[assetUrl] || assetUrl) : null;
+  }
+
+  return { preload: preload, url: url };
+})();
@@ -184,20 +184,16 @@ function saveDrawing() {
         colors_used: Array.from(new Set(strokes.map(s => s.color))),
         tools_used: Array.from(new Set(strokes.map(s => s.erasing ? 'eraser' : 'brush'))),
     };
-    fetch(`/drawing/save/${drawingId}/`, {
-        method: 'POST',
-        headers: {
-            'Content-Type': 'application/json',
-            'X-CSRFToken': getCSRFToken(),
-        },
-        body: JSON.stringify(data),
-    })
-    .then(res => res.json())
+    // Saves go through the outbox so work done offline is sent on reconnect
+    data.drawing_id = Number(drawingId);
+    Outbox.send('drawing.save', data)
     .then(res => {
-        if (res.success) {
+        if (res.queued) {
+            showSaveMessage('Saved on this device');
+        } else if (res.response && res.response.success) {
             showSaveMessage('Saved!');
         } else {
-            showSaveMessage('Save failed: ' + (res.error || 'Unknown error'));
+            showSaveMessage('Save failed: ' + ((res.response && res.response.error) || 'Unknown error'));
         }
     })
     .catch(() => showSaveMessage('Save failed'));
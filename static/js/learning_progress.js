@@ -0,0 +1,40 @@
+// Queues learning attempts and sends them to the server in batches
+window.LearningProgress = (function() {
+  const script = document.currentScript;
+  const url = script && script.dataset.url;
+  const FLUSH_DELAY = 5000;
+  const MAX_QUEUE = 20;
+  let queue = [];
+  let timer = null;
+
+  function flush(useBeacon) {
+    if (!url || !queue.length) return;
+    const body = JSON.stringify({ events: queue });
+    queue = [];
+    clearTimeout(timer);
+    timer = null;
+    if (useBeacon && navigator.sendBeacon) {
+      navigator.sendBeacon(url, new Blob([body], { type: 'application/json' }));
+      return;
+    }
+    fetch(url, {
+      method: 'POST',
+      headers: { 'Content-Type': 'application/json' },
+      body: body,
+      keepalive: true
+    }).catch(() => {});
+  }
+
+  function record(type, id, completed) {
+    queue.push({ type: type, id: id, completed: !!completed });
+    if (queue.length >= MAX_QUEUE) {
+      flush(false);
+    } else if (!timer) {
+      timer = setTimeout(() => flush(false), FLUSH_DELAY);
+    }
+  }
+
+  window.addEventListener('pagehide', () => flush(true));
+
+  return { record: record, flush: flush };
+})();
@@ -1,8 +1,17 @@
 document.addEventListener('DOMContentLoaded', function() {
   const canvas = document.getElementById('tracing-canvas');
   const ctx = canvas.getContext('2d');
+  const scoreUrl = canvas.dataset.scoreUrl;
+  const batchUrl = canvas.dataset.batchUrl;
+  const letterId = Number(canvas.dataset.letterId);
+  // Per user, so a shared tablet never sends one child's traces as another's
+  const PENDING_KEY = 'neurolearn-traces-' + canvas.dataset.userId;
+  const MAX_PENDING = 100;
   let drawing = false;
   let points = [];
+  let strokes = [];
+  let passed = false;
+  let traceId = Date.now();
 
   function startDraw(e) {
     drawing = true;
@@ -23,10 +32,85 @@ document.addEventListener('DOMContentLoaded', function() {
   }
 
   function endDraw() {
+    if (!drawing) return;
     drawing = false;
-    // Placeholder: always show reward
-    showReward();
-    playSound('/media/sounds/correct.wav');
+    if (points.length) strokes.push(points);
+    if (!passed) scoreTrace(false);
+  }
+
+  function scoreTrace(final) {
+    if (!strokes.length) return Promise.resolve();
+    // Letters without a reference path cannot be scored, so keep rewarding them
+    if (!scoreUrl) {
+      showReward();
+      return Promise.resolve();
+    }
+    const trace = { id: traceId, letter_id: letterId, strokes: strokes.slice(), final: final };
+    return fetch(scoreUrl, {
+      method: 'POST',
+      headers: { 'Content-Type': 'application/json' },
+      body: JSON.stringify({ strokes: trace.strokes, final: final })
+    })
+      .then(response => {
+        if (!response.ok) throw new Error('Trace not scored: ' + response.status);
+        return response.json();
+      })
+      .then(result => {
+        unqueue(trace.id);
+        if (final) return;
+        if (result.passed) {
+          passed = true;
+          showReward();
+          playSound('/media/sounds/correct.wav');
+        } else {
+          showHint();
+        }
+      })
+      .catch(() => {
+        // Not scored: keep the latest strokes of this trace and score them later
+        queue(trace);
+        if (!final) showPending();
+      });
+  }
+
+  function pending() {
+    try {
+      return JSON.parse(localStorage.getItem(PENDING_KEY)) || [];
+    } catch (e) {
+      return [];
+    }
+  }
+
+  function savePending(traces) {
+    try {
+      if (traces.length) localStorage.setItem(PENDING_KEY, JSON.stringify(traces.slice(-MAX_PENDING)));
+      else localStorage.removeItem(PENDING_KEY);
+    } catch (e) {}
+  }
+
+  function queue(trace) {
+    savePending(pending().filter(item => item.id !== trace.id).concat([trace]));
+  }
+
+  function unqueue(id) {
+    savePending(pending().filter(item => item.id !== id));
+  }
+
+  // Sends traces that could not be scored; item errors are final, request errors keep them
+  function flushPending() {
+    const traces = pending();
+    if (!traces.length || !batchUrl) return Promise.resolve();
+    return fetch(batchUrl, {
+      method: 'POST',
+      headers: { 'Content-Type': 'application/json' },
+      body: JSON.stringify({ traces: traces })
+    })
+      .then(response => {
+        if (!response.ok) throw new Error('Traces not scored: ' + response.status);
+        const sent = traces.map(trace => trace.id);
+        savePending(pending().filter(item => !sent.includes(item.id)));
+      })
+      .catch(() => {});
   }
 
   function showReward() {
@@ -35,6 +119,16 @@ document.addEventListener('DOMContentLoaded', function() {
     setTimeout(() => { reward.innerHTML = ''; }, 2000);
   }
 
+  function showHint() {
+    const reward = document.getElementById('reward-area');
+    reward.innerHTML = '<span style="font-size:1.5em;">✏️ Keep tracing!</span>';
+  }
+
+  function showPending() {
+    const reward = document.getElementById('reward-area');
+    reward.innerHTML = '<span style="font-size:1.5em;">✏️ Saved! We will check it soon.</span>';
+  }
+
   function playSound(url) {
     const audio = new Audio(url);
     audio.play();
@@ -62,7 +156,16 @@ document.addEventListener('DOMContentLoaded', function() {
   canvas.addEventListener('touchend', endDraw);
 
   document.getElementById('retry-btn').addEventListener('click', function() {
+    // An abandoned trace still counts as an attempt
+    if (!passed) scoreTrace(true);
     ctx.clearRect(0, 0, canvas.width, canvas.height);
+    document.getElementById('reward-area').innerHTML = '';
     points = [];
+    strokes = [];
+    passed = false;
+    traceId = Date.now();
   });
+
+  window.addEventListener('online', flushPending);
+  flushPending();
 }); 
\ No newline at end of file
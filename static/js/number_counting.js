@@ -3,6 +3,7 @@ document.addEventListener('DOMContentLoaded', function() {
   const reward = document.getElementById('reward-area');
   const retryBtn = document.getElementById('retry-btn');
   const number = parseInt(document.querySelector('h2').textContent.match(/\d+/)[0]);
+  const numberId = parseInt(objectsDiv.dataset.numberId);
   let count = 0;
 
   function showObjects() {
@@ -19,6 +20,7 @@ document.addEventListener('DOMContentLoaded', function() {
           obj.classList.add('tapped');
           count++;
           if (count === number) {
+            LearningProgress.record('number', numberId, true);
             showReward();
             playSound('/media/sounds/correct.wav');
           }
@@ -38,6 +40,10 @@ document.addEventListener('DOMContentLoaded', function() {
     audio.play();
   }
 
-  retryBtn.addEventListener('click', showObjects);
+  retryBtn.addEventListener('click', function() {
+    // Starting over before finishing counts as an attempt
+    if (count > 0 && count < number) LearningProgress.record('number', numberId, false);
+    showObjects();
+  });
   showObjects();
 }); 
\ No newline at end of file
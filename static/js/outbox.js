@@ -0,0 +1,165 @@
+// Queues writes in IndexedDB and sends them to the sync endpoint in batches.
+// Each event gets an id when it is queued, so resending after a lost response
+// never applies it twice. Every user has their own queue, so on a shared
+// tablet one child's work is never sent under another child's session.
+// Loaded by pages and by the service worker.
+(function(scope) {
+  const DB_NAME = 'neurolearn-outbox';
+  const STORE = 'events';
+  const BATCH_SIZE = 50;
+  // Spread a classroom's reconnecting tablets over a few seconds
+  const RECONNECT_JITTER = 5000;
+  const SYNC_TAG = 'outbox';
+
+  const script = scope.document && document.currentScript;
+  const syncUrl = (script && script.dataset.url) || scope.OUTBOX_SYNC_URL || '/sync/';
+  const currentUser = (script && script.dataset.user) || null;
+  const settled = {};
+  const dbPromises = {};
+  const flushing = {};
+
+  // Queue of ``user``; without a user, the shared queue kept before queues were per user
+  function dbName(user) {
+    return user ? DB_NAME + '-' + user : DB_NAME;
+  }
+
+  async function legacyDbExists() {
+    if (!indexedDB.databases) return true;
+    const databases = await indexedDB.databases().catch(() => null);
+    return !databases || databases.some((database) => database.name === DB_NAME);
+  }
+
+  function openDb(user) {
+    if (!scope.indexedDB) return Promise.resolve(null);
+    const name = dbName(user);
+    if (!dbPromises[name]) {
+      dbPromises[name] = new Promise((resolve) => {
+        const request = indexedDB.open(name, 1);
+        request.onupgradeneeded = () => {
+          request.result.createObjectStore(STORE, { keyPath: 'id' }).createIndex('queued_at', 'queued_at');
+        };
+        request.onsuccess = () => resolve(request.result);
+        request.onerror = () => resolve(null);
+      });
+    }
+    return dbPromises[name];
+  }
+
+  function run(user, mode, action) {
+    return openDb(user).then((db) => new Promise((resolve, reject) => {
+      if (!db) return resolve([]);
+      const transaction = db.transaction(STORE, mode);
+      const request = action(transaction.objectStore(STORE));
+      transaction.oncomplete = () => resolve(request && request.result);
+      transaction.onerror = () => reject(transaction.error);
+    }));
+  }
+
+  function newId() {
+    if (scope.crypto && crypto.randomUUID) return crypto.randomUUID();
+    return Date.now().toString(36) + '-' + Math.random().toString(36).slice(2, 12);
+  }
+
+  function queued(user) {
+    return run(user, 'readonly', (store) => store.index('queued_at').getAll());
+  }
+
+  function remove(user, ids) {
+    return run(user, 'readwrite', (store) => { ids.forEach((id) => store.delete(id)); });
+  }
+
+  async function post(user, events) {
+    const response = await fetch(syncUrl, {
+      method: 'POST',
+      credentials: 'same-origin',
+      headers: { 'Content-Type': 'application/json' },
+      body: JSON.stringify({
+        // The server refuses the batch if someone else is signed in now
+        user: user ? Number(user) : null,
+        events: events.map((event) => ({ id: event.id, type: event.type, payload: event.payload }))
+      })
+    });
+    // A login page means the session expired; keep the events for later
+    if (!response.ok || !(response.headers.get('Content-Type') || '').includes('json')) return null;
+    return (await response.json()).results;
+  }
+
+  // Server errors are retried on the next flush; so are events for another
+  // user's drawing or session, which wait for their owner to sign in
+  function isFinal(result) {
+    return result.id && result.status < 500 && !(result.response && result.response.owner_mismatch);
+  }
+
+  // Sends a queue's events oldest first, once each, until the network or server fails
+  async function flushQueue(user) {
+    const events = await queued(user);
+    for (let start = 0; start < events.length; start += BATCH_SIZE) {
+      const batch = events.slice(start, start + BATCH_SIZE);
+      let results;
+      try {
+        results = await post(user, batch);
+      } catch (e) {
+        return;
+      }
+      if (!results) return;
+      const done = results.filter(isFinal);
+      done.forEach((result) => { settled[result.id] = result; });
+      await remove(user, done.map((result) => result.id));
+      if (results.some((result) => result.status >= 500)) return;
+    }
+  }
+
+  function flush(user = currentUser) {
+    const name = dbName(user);
+    if (flushing[name]) return flushing[name];
+    flushing[name] = (async () => {
+      if (user) await flushQueue(user);
+      // Events queued before queues were per user go to whoever is signed in;
+      // the server leaves other users' events unapplied and they stay queued
+      if (scope.indexedDB && await legacyDbExists()) await flushQueue(null);
+    })().finally(() => { delete flushing[name]; });
+    return flushing[name];
+  }
+
+  function registerBackgroundSync() {
+    if (!scope.navigator || !navigator.serviceWorker || !scope.document) return;
+    const tag = currentUser ? SYNC_TAG + ':' + currentUser : SYNC_TAG;
+    navigator.serviceWorker.ready
+      .then((registration) => registration.sync && registration.sync.register(tag))
+      .catch(() => {});
+  }
+
+  // The user a background sync tag was registered for, or null
+  function tagUser(tag) {
+    return tag.startsWith(SYNC_TAG + ':') ? tag.slice(SYNC_TAG.length + 1) : null;
+  }
+
+  // Queues a write and tries to send it at once. Resolves with the server's
+  // result ({id, status, response}) or {id, queued: true} if it is still waiting.
+  async function send(type, payload) {
+    const event = { id: newId(), type: type, payload: payload, queued_at: Date.now() };
+    const db = currentUser ? await openDb(currentUser) : null;
+    if (!db) {
+      // No IndexedDB (e.g. private browsing): send directly
+      const results = await post(currentUser, [event]).catch(() => null);
+      return results ? results[0] : { id: event.id, queued: false, error: true };
+    }
+    await run(currentUser, 'readwrite', (store) => store.put(event));
+    await flush();
+    if (settled[event.id]) {
+      const result = settled[event.id];
+      delete settled[event.id];
+      return result;
+    }
+    registerBackgroundSync();
+    return { id: event.id, queued: true };
+  }
+
+  if (scope.document) {
+    const flushSoon = () => setTimeout(flush, Math.random() * RECONNECT_JITTER);
+    scope.addEventListener('online', flushSoon);
+    flushSoon();
+  }
+
+  scope.Outbox = { send: send, flush: flush, tagUser: tagUser, SYNC_TAG: SYNC_TAG };
+})(self);
@@ -2,12 +2,14 @@ document.addEventListener('DOMContentLoaded', function() {
   const gameDiv = document.getElementById('matching-game');
   const reward = document.getElementById('reward-area');
   const retryBtn = document.getElementById('retry-btn');
+  const wordId = parseInt(gameDiv.dataset.wordId);
   // Placeholder: just show a correct match button
   function showGame() {
     gameDiv.innerHTML = '';
     const btn = document.createElement('button');
     btn.textContent = 'Match!';
     btn.onclick = function() {
+      LearningProgress.record('word', wordId, true);
       showReward();
       playSound('/media/sounds/correct.wav');
     };
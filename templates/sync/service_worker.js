@@ -0,0 +1,85 @@
+{% load static %}// Keeps static files, media and visited pages for offline use, and sends
+// writes queued in the outbox once the tablet is back online.
+self.OUTBOX_SYNC_URL = '{% url "sync:api_sync" %}';
+importScripts('{% static "js/outbox.js" %}');
+
+const STATIC_PREFIX = '{% get_static_prefix %}';
+const MEDIA_PREFIX = '{% get_media_prefix %}';
+// Static files are not hashed, so they are revalidated on every use; the
+// version drops copies cached by the older cache-first worker
+const STATIC_CACHE = 'static-v2';
+// Shared with activity_media.js, which preloads activity files into it
+const MEDIA_CACHE = 'activity-media-v1';
+const PAGE_CACHE = 'pages-v1';
+const CACHES = [STATIC_CACHE, MEDIA_CACHE, PAGE_CACHE];
+// Pages are per user, so they are dropped when anyone signs in or out
+const SESSION_PATHS = ['{% url "users:login" %}', '{% url "users:logout" %}'];
+
+self.addEventListener('install', () => self.skipWaiting());
+
+self.addEventListener('activate', (event) => {
+  event.waitUntil(
+    caches.keys()
+      .then((names) => Promise.all(names.filter((name) => !CACHES.includes(name)).map((name) => caches.delete(name))))
+      .then(() => self.clients.claim())
+  );
+});
+
+// Answers from the cache at once when it can and refreshes the copy in the
+// background, so a deploy reaches the tablet on its next page load
+async function staleWhileRevalidate(cacheName, event) {
+  const cache = await caches.open(cacheName);
+  const cached = await cache.match(event.request);
+  const refresh = fetch(event.request).then((response) => {
+    if (response.ok) return cache.put(event.request, response.clone()).then(() => response);
+    return response;
+  });
+  if (!cached) return refresh;
+  event.waitUntil(refresh.catch(() => {}));
+  return cached;
+}
+
+async function cacheFirst(cacheName, request) {
+  const cache = await caches.open(cacheName);
+  const cached = await cache.match(request);
+  if (cached) return cached;
+  const response = await fetch(request);
+  if (response.ok) cache.put(request, response.clone());
+  return response;
+}
+
+async function networkFirst(request) {
+  const cache = await caches.open(PAGE_CACHE);
+  try {
+    const response = await fetch(request);
+    if (response.ok && !response.redirected) cache.put(request, response.clone());
+    return response;
+  } catch (e) {
+    const cached = await cache.match(request);
+    if (cached) return cached;
+    throw e;
+  }
+}
+
+self.addEventListener('fetch', (event) => {
+  const request = event.request;
+  const url = new URL(request.url);
+  if (request.method !== 'GET' || url.origin !== self.location.origin) return;
+
+  if (url.pathname.startsWith(STATIC_PREFIX)) {
+    event.respondWith(staleWhileRevalidate(STATIC_CACHE, event));
+  } else if (url.pathname.startsWith(MEDIA_PREFIX)) {
+    event.respondWith(cacheFirst(MEDIA_CACHE, request));
+  } else if (request.mode === 'navigate') {
+    if (SESSION_PATHS.includes(url.pathname)) {
+      event.waitUntil(caches.delete(PAGE_CACHE));
+      return;
+    }
+    event.respondWith(networkFirst(request));
+  }
+});
+
+self.addEventListener('sync', (event) => {
+  // Tags name the user who queued the events, as the worker has no session of its own
+  if (event.tag.split(':')[0] === Outbox.SYNC_TAG) event.waitUntil(Outbox.flush(Outbox.tagUser(event.tag)));
+});